@@ -0,0 +1,87 @@
+"""Latency of the compiled forest vs the pickled RandomForest behind TriageProcessor.
+
+Reports p50/p99 per single row and rows/sec per batch, and checks that both paths
+return identical probabilities. Uses the active model bundle (run train_model.py first).
+
+Usage: python benchmarks/bench_inference.py [--rows 2000] [--batch-sizes 1 32 256 2048]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.triage_engine.bundle import get_active_bundle
+from src.triage_engine.processor import MODEL_FEATURES
+
+
+def sklearn_predict_proba(model, encoder, patients):
+    """The pre-compiled path: DataFrame, column reorder, LabelEncoder, sklearn predict_proba."""
+    df = pd.DataFrame(patients)[MODEL_FEATURES]
+    df['arrival_mode'] = encoder.transform(df['arrival_mode'])
+    return model.predict_proba(df)
+
+
+def compiled_predict_proba(compiled, patients):
+    return compiled.predict_proba(compiled.encode(patients))
+
+
+def single_row_latency(fn, rows):
+    timings = []
+    for row in rows:
+        start = time.perf_counter()
+        fn([row])
+        timings.append(time.perf_counter() - start)
+    timings = np.asarray(timings) * 1e3
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def batch_throughput(fn, rows, batch_size, repeat=3):
+    batch = rows[:batch_size]
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(batch)
+        best = min(best, time.perf_counter() - start)
+    return len(batch) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/synthetic_medical_triage.csv")
+    parser.add_argument("--rows", type=int, default=500, help="Single-row samples for the latency percentiles")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256, 2048])
+    args = parser.parse_args()
+
+    bundle = get_active_bundle()
+    if bundle is None:
+        sys.exit("No active model bundle; run src/triage_engine/train_model.py first.")
+    model, encoder, compiled = bundle.model, bundle.encoder, bundle.forest
+
+    rows = pd.read_csv(args.data)[MODEL_FEATURES].to_dict('records')
+    identical = np.array_equal(sklearn_predict_proba(model, encoder, rows), compiled_predict_proba(compiled, rows))
+    print(f"{len(rows)} rows, {compiled.n_trees} trees, max depth {compiled.max_depth}, identical probabilities: {identical}")
+
+    paths = {
+        "sklearn": lambda batch: sklearn_predict_proba(model, encoder, batch),
+        "compiled": lambda batch: compiled_predict_proba(compiled, batch),
+    }
+
+    print(f"\n{'path':>10} {'p50 ms/row':>11} {'p99 ms/row':>11}")
+    for name, fn in paths.items():
+        p50, p99 = single_row_latency(fn, rows[:args.rows])
+        print(f"{name:>10} {p50:>11.3f} {p99:>11.3f}")
+
+    print(f"\n{'batch':>10} {'sklearn rows/s':>15} {'compiled rows/s':>16} {'speedup':>8}")
+    for batch_size in args.batch_sizes:
+        slow = batch_throughput(paths["sklearn"], rows, batch_size)
+        fast = batch_throughput(paths["compiled"], rows, batch_size)
+        print(f"{batch_size:>10} {slow:>15.0f} {fast:>16.0f} {fast / slow:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Pages/sec and vitals accuracy: page-by-page OCR vs recognition batched across pages.
+
+Renders dataset rows as single-page referrals and reads them three ways:
+  scanned-pdf   image-only PDF, OCRImageParser(batch_pages=N) for each N in --batch
+  png-mupdf     the previous image path: PNG opened as a document by MuPDF, rendered at 2x
+  png-native    the same PNGs decoded by Pillow and OCR'd at their own resolution
+plus a 204x98 dpi Group 4 TIFF fax of the first pages (multi-frame, one file).
+Accuracy is the share of (temp, SpO2, HR, BP, age) values that match the ground truth;
+"same text" compares each batched read with the batch_pages=1 read page by page.
+
+Usage: python benchmarks/bench_ocr_batch.py [--pages 8] [--batch 1 4 8] [--threads 1]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from synthetic_pdfs import Upload, row_truth, referral_pages, scanned_pdf, png_chart
+from src.ingestion.parsers import OCRImageParser, pymupdf
+
+
+def fax_tiff(pngs):
+    """Multi-page fax: 1-bit frames at 204x98 dpi (rows halved), Group 4 compressed."""
+    frames = []
+    for png in pngs:
+        image = Image.open(io.BytesIO(png)).convert("1")
+        frames.append(image.resize((image.width, round(image.height * 98 / 204))))
+    buffer = io.BytesIO()
+    frames[0].save(buffer, "TIFF", save_all=True, append_images=frames[1:], dpi=(204, 98), compression="group4")
+    return buffer.getvalue()
+
+
+def accuracy(parser, texts, truths):
+    hits = total = 0
+    for text, truth in zip(texts, truths):
+        vitals = parser._parse_vitals(text or "")
+        hits += sum(vitals.get(field) == value for field, value in truth.items())
+        total += len(truth)
+    return hits / total
+
+
+def timed_pages(parser, upload):
+    start = time.perf_counter()
+    texts = [text for _, text, _ in parser.iter_pages(upload)]
+    return texts, len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/synthetic_medical_triage.csv")
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 4, 8], help="batch_pages values to compare")
+    parser.add_argument("--threads", type=int, default=1, help="intra_op_num_threads per engine")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = pd.read_csv(args.data, nrows=args.pages).to_dict("records")
+    pages = [referral_pages(row, random.Random(f"{args.seed}:{i}"))[0] for i, row in enumerate(rows)]
+    truths = [row_truth(row) for row in rows]
+    scanned = Upload(scanned_pdf(pages), "referrals.pdf")
+    pngs = [png_chart([page]) for page in pages]
+
+    print(f"{'input':>12} {'batch':>6} {'pages/sec':>10} {'accuracy':>9}  same text")
+    baseline = {}
+    for batch_pages in args.batch:
+        ocr = OCRImageParser(batch_pages=batch_pages, intra_op_num_threads=args.threads)
+        ocr.warm_up()
+        for name, upload, expected in (("scanned-pdf", scanned, truths),
+                                       ("fax-tiff", Upload(fax_tiff(pngs[:4]), "fax.tif"), truths[:4])):
+            texts, rate = timed_pages(ocr, upload)
+            baseline.setdefault(name, texts)
+            print(f"{name:>12} {batch_pages:>6} {rate:>10.3f} {accuracy(ocr, texts, expected):>9.1%}  "
+                  f"{texts == baseline[name]}")
+
+    ocr = OCRImageParser(intra_op_num_threads=args.threads)
+    start = time.perf_counter()
+    mupdf_texts = []
+    for png in pngs:
+        with pymupdf.open(stream=png, filetype="png") as doc:
+            mupdf_texts.append(ocr.ocr_page_scored(doc[0])[0])
+    mupdf_rate = len(pngs) / (time.perf_counter() - start)
+    native_texts = []
+    start = time.perf_counter()
+    for png in pngs:
+        native_texts.extend(text for _, text, _ in ocr.iter_pages(Upload(png, "referral.png")))
+    native_rate = len(pngs) / (time.perf_counter() - start)
+    print(f"{'png-mupdf':>12} {1:>6} {mupdf_rate:>10.3f} {accuracy(ocr, mupdf_texts, truths):>9.1%}")
+    print(f"{'png-native':>12} {1:>6} {native_rate:>10.3f} {accuracy(ocr, native_texts, truths):>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
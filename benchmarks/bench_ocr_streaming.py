@@ -0,0 +1,71 @@
+"""OCR time on long scanned charts: full read vs streaming with early stop.
+
+Builds image-only PDFs whose first page holds the vitals and whose other pages are
+narrative, then times OCRImageParser reading every page against the streaming read
+that stops once temp, SpO2, HR, BP and age are found, and checks that both reads
+agree on those fields.
+
+Usage: python benchmarks/bench_ocr_streaming.py [--pages 5 20] [--docs 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import pymupdf
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from synthetic_pdfs import Upload, FILLER
+from src.ingestion.parsers import OCRImageParser, EarlyStop
+from src.ingestion.vitals import DEFAULT_REQUIRED_FIELDS
+
+
+def scanned_chart(pages, rng):
+    """Image-only PDF: vitals on page 1, narrative afterwards."""
+    first = (f"ED TRIAGE NOTE\nAge: {rng.randint(18, 95)}\nTemp: {rng.uniform(36.0, 40.0):.1f}\n"
+             f"HR {rng.randint(55, 140)} bpm\nBP: {rng.randint(95, 190)}/{rng.randint(55, 110)}\n"
+             f"SpO2 {rng.randint(86, 100)}%\nHistory of hypertension.")
+    scanned = pymupdf.open()
+    for number in range(pages):
+        text = first if number == 0 else "\n".join(rng.choice(FILLER) for _ in range(12))
+        source = pymupdf.open()
+        page = source.new_page()
+        page.insert_text((72, 72), text, fontsize=12)
+        pix = page.get_pixmap(matrix=pymupdf.Matrix(1.5, 1.5))
+        target = scanned.new_page(width=page.rect.width, height=page.rect.height)
+        target.insert_image(target.rect, stream=pix.tobytes("png"))
+    return Upload(scanned.tobytes(), "chart.pdf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 20])
+    parser.add_argument("--docs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    full = OCRImageParser()
+    streaming = OCRImageParser(early_stop=EarlyStop(min_confidence=0.8))
+    print(f"{'pages':>6} {'full s/doc':>11} {'early s/doc':>12} {'speedup':>8} {'pages read':>11}  same vitals")
+    for pages in args.pages:
+        docs = [scanned_chart(pages, rng) for _ in range(args.docs)]
+        start = time.perf_counter()
+        full_vitals = [full.extract_from_file(doc) for doc in docs]
+        full_seconds = (time.perf_counter() - start) / len(docs)
+
+        start = time.perf_counter()
+        results = [streaming.extract_streaming(doc) for doc in docs]
+        early_seconds = (time.perf_counter() - start) / len(docs)
+
+        same = all(all(a.get(f) == b.get(f) for f in DEFAULT_REQUIRED_FIELDS)
+                   for a, (b, _) in zip(full_vitals, results))
+        pages_read = sum(stats["pages_read"] for _, stats in results) / len(results)
+        print(f"{pages:>6} {full_seconds:>11.2f} {early_seconds:>12.2f} {full_seconds / early_seconds:>7.1f}x "
+              f"{pages_read:>11.1f}  {same}")
+
+
+if __name__ == "__main__":
+    main()
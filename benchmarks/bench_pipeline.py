@@ -0,0 +1,213 @@
+"""End-to-end triage benchmark: per-stage throughput, p50/p95/p99 latency and peak RSS, as JSON.
+
+Builds digital and scanned referral PDFs from rows of the training CSV, then times each
+stage on its own (one warm-up call per stage is not counted):
+  pdf_text      pymupdf open + text layer of a digital PDF            (per document)
+  ocr           RapidOCR on one page of a scanned PDF                  (per page)
+  parse_vitals  VitalsExtractor over a document's text                 (per document)
+  predict       TriageProcessor.process_patient, compiled forest       (per patient)
+  predict_batch TriageProcessor.process_batch on all patients at once  (throughput only)
+  shap          explain_batch for one patient, cold SHAP cache         (per patient)
+  llm           AsyncBioMistralExplainer against the local Ollama stub (per request)
+  end_to_end    TriagePipeline.triage_documents over every digital PDF (throughput only)
+Peak RSS is the process high-water mark when the stage ends, so it never decreases.
+--synthetic draws the rows from the copula in src/synthetic/ instead of the CSV, so
+--docs is not capped at the CSV's size.
+--output writes the results as JSON; --compare checks them against an earlier file and
+exits 1 if any stage is slower than --tolerance allows.
+
+Usage: python benchmarks/bench_pipeline.py [--docs 50] [--ocr-pages 5] [--synthetic] [--output bench.json] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from synthetic_pdfs import Upload, referral_pages, digital_pdf, scanned_pdf
+from src.ingestion.parsers import OCRImageParser, open_document
+from src.ingestion.vitals import VitalsExtractor
+from src.triage_engine.processor import TriageProcessor, MODEL_FEATURES
+from src.explainability.explain import explain_batch
+from src.explainability.async_medgemma import AsyncBioMistralExplainer
+from src.explainability.ollama_stub import start_stub_server
+from src.pipeline.triage_pipeline import TriagePipeline, DEFAULT_SELECTED_FEATURES
+from src.synthetic.generate import load_or_fit, iter_rows
+
+RESULT_FORMAT = 1
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(timings, seconds, count):
+    result = {"count": count, "seconds": round(seconds, 4), "per_sec": round(count / seconds, 2) if seconds else None,
+              "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    if timings:
+        p50, p95, p99 = np.percentile(np.asarray(timings) * 1e3, [50, 95, 99])
+        result.update(p50_ms=round(float(p50), 3), p95_ms=round(float(p95), 3), p99_ms=round(float(p99), 3))
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return result
+
+
+def per_item(fn, items, warmup=1):
+    """Times fn(item) for each item after `warmup` untimed calls."""
+    for item in items[:warmup]:
+        fn(item)
+    timings = []
+    start = time.perf_counter()
+    for item in items:
+        call = time.perf_counter()
+        fn(item)
+        timings.append(time.perf_counter() - call)
+    return summarize(timings, time.perf_counter() - start, len(items))
+
+
+def whole_batch(fn, count):
+    start = time.perf_counter()
+    fn()
+    return summarize([], time.perf_counter() - start, count)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def pdf_text(upload):
+    with open_document(upload) as doc:
+        return " ".join([page.get_text().strip() for page in doc])
+
+
+def load_rows(args):
+    if args.synthetic:
+        return list(iter_rows(load_or_fit(data_path=args.data), args.docs, seed=args.seed))
+    return pd.read_csv(args.data).sample(n=args.docs, random_state=args.seed).to_dict('records')
+
+
+def run_suite(args):
+    rng = random.Random(args.seed)
+    rows = load_rows(args)
+    patients = [{name: row[name] for name in MODEL_FEATURES} for row in rows]
+    page_texts = [referral_pages(row, rng, pages=args.pages) for row in rows]
+    digital = [Upload(digital_pdf(texts), f"referral-{i}.pdf") for i, texts in enumerate(page_texts)]
+    scanned = [Upload(scanned_pdf(texts[:1]), f"scan-{i}.pdf") for i, texts in enumerate(page_texts[:args.ocr_pages])]
+    stages = {}
+
+    # 1. Document stages
+    stages["pdf_text"] = per_item(pdf_text, digital)
+    texts = [pdf_text(upload) for upload in digital]
+    ocr = OCRImageParser()
+    scanned_docs = [open_document(upload) for upload in scanned]
+    scanned_pages = [page for doc in scanned_docs for page in doc]
+    stages["ocr"] = per_item(ocr.ocr_page_scored, scanned_pages)
+    for doc in scanned_docs:
+        doc.close()
+    extractor = VitalsExtractor()
+    stages["parse_vitals"] = per_item(extractor.extract, texts)
+
+    # 2. Model stages
+    processor = TriageProcessor()
+    stages["predict"] = per_item(processor.process_patient, patients)
+    stages["predict_batch"] = whole_batch(lambda: processor.process_batch(patients), len(patients))
+    stages["shap"] = per_item(lambda patient: explain_batch([patient], DEFAULT_SELECTED_FEATURES), patients)
+
+    # 3. LLM against the stub, then everything together
+    stub, url = start_stub_server(token_delay=args.llm_token_delay)
+    try:
+        llm = AsyncBioMistralExplainer(url=url, max_concurrency=args.llm_concurrency)
+        requests = [(1, "heart_rate (pushed toward Level 1)", text[:500]) for text in texts]
+        stages["llm"] = per_item(lambda request: llm.get_explanation_sync(*request), requests)
+
+        pipeline = TriagePipeline(llm=llm, mode="hybrid", max_workers=args.workers)
+        ids = [f"bench-{i}" for i in range(len(digital))]
+        stages["end_to_end"] = whole_batch(lambda: pipeline.triage_documents(digital, ids), len(digital))
+        pipeline.close()
+        llm.close()
+    finally:
+        stub.shutdown()
+
+    return {
+        "format": RESULT_FORMAT,
+        "meta": {
+            "commit": git_commit(), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "stages": stages,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Prints per-stage changes against `baseline`; returns the names of regressed stages."""
+    regressions = []
+    print(f"\n{'stage':>14} {'per_sec':>18} {'p50_ms':>20}")
+    for name, stage in current["stages"].items():
+        old = baseline["stages"].get(name)
+        if old is None:
+            continue
+        cells = []
+        regressed = False
+        for key, higher_is_better in (("per_sec", True), ("p50_ms", False)):
+            if not stage.get(key) or not old.get(key):
+                cells.append("-")
+                continue
+            change = stage[key] / old[key] - 1
+            worse = -change if higher_is_better else change
+            regressed |= worse > tolerance
+            cells.append(f"{old[key]:.2f}->{stage[key]:.2f} ({change:+.0%})")
+        if regressed:
+            regressions.append(name)
+        print(f"{name:>14} {cells[0]:>18} {cells[1]:>20}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/synthetic_medical_triage.csv")
+    parser.add_argument("--docs", type=int, default=50, help="Referrals (and patients) to generate")
+    parser.add_argument("--pages", type=int, default=2, help="Pages per digital referral")
+    parser.add_argument("--ocr-pages", type=int, default=5, help="Scanned pages to OCR (slowest stage)")
+    parser.add_argument("--llm-token-delay", type=float, default=0.0, help="Stub seconds per streamed token")
+    parser.add_argument("--llm-concurrency", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=None, help="Extraction threads for end_to_end")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--synthetic", action="store_true", help="Generate rows from the fitted copula instead of sampling --data")
+    parser.add_argument("--output", default=None, help="Write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Baseline JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown before --compare fails")
+    args = parser.parse_args()
+
+    results = run_suite(args)
+    print(f"{'stage':>14} {'count':>6} {'per_sec':>10} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'peak_rss_mb':>12}")
+    for name, stage in results["stages"].items():
+        cells = [f"{stage[key]:>9.3f}" if stage[key] is not None else f"{'-':>9}" for key in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"{name:>14} {stage['count']:>6} {stage['per_sec']:>10.2f} {' '.join(cells)} {stage['peak_rss_mb']:>12.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(f"Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Cold-start benchmark for the Streamlit app: time to first render and latency of the first triage.
+
+Each run is a fresh interpreter that imports what src/ui/app.py imports (Streamlit
+itself excluded), builds the same cached resources (store, queue, LLM client,
+extraction cache, pipeline) and then triages one manual-intake patient and one
+scanned referral, LLM stage off. Two scenarios:
+  cold     the user clicks right after the first render
+  warmed   the background warm-up (model, SHAP, MuPDF, RapidOCR) ran first
+Also lists which heavy modules were already imported at first render.
+
+Usage: python benchmarks/bench_startup.py [--runs 3] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+HEAVY_MODULES = ("pandas", "pymupdf", "rapidocr_onnxruntime", "onnxruntime", "cv2", "shap", "sklearn", "aiohttp", "requests")
+PATIENT = {"age": 67, "heart_rate": 118, "oxygen_saturation": 91, "body_temperature": 38.6, "pain_level": 7}
+
+
+def child(scenario, scan_path, workdir):
+    """One cold process; prints its timings as JSON."""
+    start = time.perf_counter()
+    from src.ingestion.cache import ExtractionCache
+    from src.explainability.llm_cache import CachedBioMistralExplainer
+    from src.pipeline.triage_pipeline import TriagePipeline
+    from src.storage.cache import TieredCache
+    from src.storage.triage_store import TriageStore
+    from src.triage_engine.triage_queue import TriageQueue
+    from src.triage_engine.registry import get_registry
+    from src.triage_engine.bundle import get_active_bundle
+    from src.monitoring.metrics import REGISTRY
+    from src.runtime.warmup import WarmUp
+    imported = time.perf_counter()
+
+    store = TriageStore(os.path.join(workdir, "store.sqlite"))
+    queue = TriageQueue(store.queue_entries())
+    llm = CachedBioMistralExplainer(cache=TieredCache(max_memory_items=16, name="llm"))
+    pipeline = TriagePipeline(store=store, queue=queue, llm=llm, use_llm=False,
+                              extraction_cache=ExtractionCache(path=os.path.join(workdir, "extraction.sqlite")))
+    get_active_bundle()
+    get_registry().get_stats()
+    REGISTRY.snapshot()
+    rendered = time.perf_counter()
+    loaded_at_render = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    warmup_seconds = None
+    if scenario == "warmed":
+        warmup = WarmUp(pipeline.warmup_steps(ocr=True)).start()
+        warmup.wait()
+        warmup_seconds = time.perf_counter() - rendered
+
+    call = time.perf_counter()
+    pipeline.triage([("P-1", PATIENT)])
+    first_triage = time.perf_counter() - call
+    call = time.perf_counter()
+    pipeline.triage_documents([scan_path], ["P-2"])
+    first_scan = time.perf_counter() - call
+    pipeline.close()
+
+    print(json.dumps({
+        "import_s": imported - start, "render_s": rendered - start, "warmup_s": warmup_seconds,
+        "first_triage_s": first_triage, "first_scan_s": first_scan, "loaded_at_render": loaded_at_render,
+    }))
+
+
+def run_child(scenario, scan_path):
+    with tempfile.TemporaryDirectory() as workdir:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", scenario, scan_path, workdir],
+                             capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/synthetic_medical_triage.csv")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per scenario (medians are reported)")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--child", nargs=3, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    import pandas as pd
+    from synthetic_pdfs import referral_pages, scanned_pdf
+
+    row = pd.read_csv(args.data, nrows=1).iloc[0].to_dict()
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(scanned_pdf(referral_pages(row, random.Random(7))))
+        scan_path = f.name
+    try:
+        results = {}
+        for scenario in ("cold", "warmed"):
+            runs = [run_child(scenario, scan_path) for _ in range(args.runs)]
+            summary = {key: round(statistics.median(run[key] for run in runs), 3)
+                       for key in ("import_s", "render_s", "first_triage_s", "first_scan_s")}
+            summary["warmup_s"] = round(statistics.median(run["warmup_s"] for run in runs), 3) if scenario == "warmed" else None
+            summary["loaded_at_render"] = runs[0]["loaded_at_render"]
+            results[scenario] = summary
+    finally:
+        os.unlink(scan_path)
+
+    print(f"{'scenario':>8} {'import_s':>9} {'render_s':>9} {'warmup_s':>9} {'first_triage_s':>15} {'first_scan_s':>13}")
+    for scenario, summary in results.items():
+        warmup = f"{summary['warmup_s']:>9.3f}" if summary["warmup_s"] is not None else f"{'-':>9}"
+        print(f"{scenario:>8} {summary['import_s']:>9.3f} {summary['render_s']:>9.3f} {warmup} "
+              f"{summary['first_triage_s']:>15.3f} {summary['first_scan_s']:>13.3f}")
+    print(f"Heavy modules imported at first render: {', '.join(results['cold']['loaded_at_render']) or 'none'}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Throughput of the compiled vitals extractor vs the original multi-regex _parse_vitals.
+
+Usage: python benchmarks/bench_vitals.py [--sizes 1024 10240 102400 1048576] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.ingestion.vitals import VitalsExtractor
+
+
+def legacy_parse_vitals(text):
+    """Verbatim copy of the pre-VitalsExtractor BaseClinicalParser._parse_vitals, kept as the reference."""
+    vitals = {}
+    t_matches = re.findall(r'(?:Temperature|Temp)\s*(?:of|to|is|at|:)?\s*(\d{2,3}\.?\d?)', text, re.I)
+    t_deg_matches = re.findall(r'(\d{2,3}\.?\d?)\s*°\s*[FfCc]', text)
+    valid_temps = [round((val - 32) * 5 / 9, 1) if val > 50 else val for val in [float(t) for t in t_matches + t_deg_matches]]
+    valid_temps_c = [t for t in valid_temps if 30.0 <= t <= 45.0]
+    if valid_temps_c:
+        vitals['body_temperature'] = max(valid_temps_c)
+    spo2_matches = re.findall(r'(?:SpO2|Oxygen\s*Saturation|[Oo0]2\s*[Ss]at)\s*(?:of|to|is|at|:)?\s*(\d{2,3})', text, re.I)
+    valid_spo2 = [int(s) for s in spo2_matches if 50 <= int(s) <= 100]
+    if valid_spo2:
+        vitals['oxygen_saturation'] = min(valid_spo2)
+    hr_matches = re.findall(r'(?:Heart\s*Rate|HR|Pulse)\s*(?:of|to|is|at|:)?\s*(\d{2,3})', text, re.I)
+    valid_hr = [int(h) for h in hr_matches if 30 <= int(h) <= 250]
+    if valid_hr:
+        vitals['heart_rate'] = max(valid_hr)
+    sbp_matches = re.findall(r'(?:Blood\s*Pressure|BP)\s*(?:of|to|is|at|:)?\s*(\d{2,3})\s*/', text, re.I)
+    valid_sbp = [int(b) for b in sbp_matches if 50 <= int(b) <= 300]
+    if valid_sbp:
+        vitals['systolic_blood_pressure'] = max(valid_sbp)
+    age_match = re.search(r'(?:Age\s*[:\n\t]+(\d{1,3}))|(\d{1,3})\s*[-]?\s*(?:year[s]?\s*[-]?\s*old|y\.?o\.?)', text, re.I)
+    if age_match:
+        age_val = int(age_match.group(1) or age_match.group(2))
+        if 0 <= age_val <= 120:
+            vitals['age'] = age_val
+    chronic_keywords = ['hypertension', 'asthma', 'diabetes', 'psoriatic arthritis', 'coronary artery disease', 'cad', 'copd', 'cancer', 'heart failure']
+    disease_count = sum(1 for kw in chronic_keywords if re.search(r'\b' + kw + r'\b', text, re.I))
+    if disease_count > 0:
+        vitals['chronic_disease_count'] = disease_count
+    vitals['raw_text'] = text
+    return vitals
+
+
+FILLER = [
+    "Patient was seen and examined at the bedside.", "No acute distress noted overnight.",
+    "Tolerating oral intake, ambulating with assistance.", "Family updated on plan of care.",
+    "Medications reconciled with pharmacy.", "Wound dressing clean, dry and intact.",
+    "Continue current management and reassess in the morning.",
+]
+
+
+def synthetic_note(size, rng):
+    """Discharge-summary style text of roughly `size` bytes with vitals sprinkled through it."""
+    parts = [f"Patient is a {rng.randint(18, 95)} year old presenting for review."]
+    length = len(parts[0])
+    while length < size:
+        roll = rng.random()
+        if roll < 0.04:
+            line = f"Temp: {rng.uniform(36.0, 40.0):.1f}  HR {rng.randint(55, 140)}  BP: {rng.randint(95, 190)}/{rng.randint(55, 110)}"
+        elif roll < 0.06:
+            line = f"SpO2 of {rng.randint(86, 100)}% on room air, temp to {rng.uniform(97.0, 104.0):.1f}°F"
+        elif roll < 0.07:
+            line = rng.choice(["History of hypertension and diabetes.", "Known COPD, prior CAD.", "Asthma since childhood."])
+        else:
+            line = rng.choice(FILLER)
+        parts.append(line)
+        length += len(line) + 1
+    return "\n".join(parts)[:size]
+
+
+def bench(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 10 * 1024, 100 * 1024, 1024 * 1024])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    extractor = VitalsExtractor()
+    print(f"{'size':>10} {'legacy MB/s':>12} {'compiled MB/s':>14} {'speedup':>8}  identical")
+    for size in args.sizes:
+        text = synthetic_note(size, rng)
+        identical = legacy_parse_vitals(text) == extractor.extract(text)
+        legacy = bench(legacy_parse_vitals, text, args.repeat)
+        compiled = bench(extractor.extract, text, args.repeat)
+        mb = len(text.encode()) / 1e6
+        print(f"{size:>10} {mb / legacy:>12.1f} {mb / compiled:>14.1f} {legacy / compiled:>7.2f}x  {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""Synthetic ED referral PDFs for the benchmarks; the generators live in src/synthetic/charts.py."""
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.synthetic.charts import FILLER, CHRONIC, row_truth, referral_pages, digital_pdf, scanned_pdf, png_chart
+
+
+class Upload:
+    """The slice of a Streamlit upload the parsers use: getvalue() and a name."""
+    def __init__(self, data, name):
+        self.data = data
+        self.name = name
+
+    def getvalue(self):
+        return self.data
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import queue
+import threading
+
+from src.explainability.medgemma import (
+    OLLAMA_URL, DEFAULT_MODEL, OFFLINE_RESULT, TIMEOUT_RESULT,
+    build_prompt, build_payload, parse_llm_output, api_error_result, record_llm_outcome
+)
+from src.monitoring.metrics import timer
+from src.runtime.lazy import lazy_import
+
+# The first request pays for the import (~0.2s), not every process that loads the module
+aiohttp = lazy_import("aiohttp")
+
+# Order of the '|||'-delimited answers in the model output
+FIELDS = ("short_synthesis", "recommended_action", "department_routing")
+
+
+class AsyncBioMistralExplainer:
+    """asyncio client for the local Ollama endpoint with a persistent connection pool.
+
+    Tokens are consumed as they stream in, and `on_field(name, value)` fires as soon as
+    each '|||'-delimited answer is complete, so the synthesis can be shown before the
+    model finishes. Concurrency is bounded by `max_concurrency` and every request has
+    its own timeout. Streamlit code can use the *_sync / iter_explanations helpers,
+    which run everything on one background event loop so the pool survives reruns.
+    """
+    def __init__(self, model_name=DEFAULT_MODEL, url=OLLAMA_URL, max_concurrency=2,
+                 timeout=120, connect_timeout=5):
+        self.url = url
+        self.model = model_name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def _generate(self, session, prompt, on_field):
+        payload = build_payload(self.model, prompt, stream=True)
+        async with session.post(self.url, json=payload) as response:
+            if response.status != 200:
+                return api_error_result(response.status)
+
+            raw_output = ""
+            emitted = 0
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                raw_output += chunk.get("response", "")
+
+                # Emit every answer whose closing delimiter has arrived
+                parts = raw_output.split("|||")
+                while on_field is not None and emitted < min(len(parts) - 1, len(FIELDS) - 1):
+                    on_field(FIELDS[emitted], parts[emitted].replace('\n', ' ').strip())
+                    emitted += 1
+                if chunk.get("done"):
+                    break
+
+            result = parse_llm_output(raw_output.strip())
+            if on_field is not None:
+                for name in FIELDS[emitted:]:
+                    on_field(name, result[name])
+            return result
+
+    async def get_explanation(self, triage_level, shap_info, symptoms, on_field=None, timeout=None):
+        """Same contract as BioMistralExplainer.get_explanation, but non-blocking."""
+        prompt = build_prompt(triage_level, shap_info, symptoms)
+        session = await self._get_session()
+        async with self._semaphore:
+            # Timed inside the semaphore, so queueing for a free slot is not counted as model latency
+            with timer("llm"):
+                try:
+                    result = await asyncio.wait_for(
+                        self._generate(session, prompt, on_field),
+                        timeout=timeout or self.timeout
+                    )
+                except asyncio.TimeoutError:
+                    result = dict(TIMEOUT_RESULT)
+                except aiohttp.ClientConnectionError:
+                    result = dict(OFFLINE_RESULT)
+            return record_llm_outcome("async", result)
+
+    async def explain_many(self, requests, on_field=None):
+        """Explains (triage_level, shap_info, symptoms) tuples concurrently; results keep input order.
+
+        `on_field(index, name, value)` receives streamed answers tagged with the request index.
+        """
+        async def one(index, args):
+            callback = None if on_field is None else (lambda name, value: on_field(index, name, value))
+            return await self.get_explanation(*args, on_field=callback)
+
+        return await asyncio.gather(*[one(i, args) for i, args in enumerate(requests)])
+
+    async def aclose(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # --- Synchronous bridge (Streamlit, scripts) ---
+
+    def _background_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True).start()
+            return self._loop
+
+    def submit(self, triage_level, shap_info, symptoms, on_field=None, timeout=None):
+        """Schedules one explanation on the background loop; `.cancel()` on the returned future aborts it."""
+        coro = self.get_explanation(triage_level, shap_info, symptoms, on_field=on_field, timeout=timeout)
+        return asyncio.run_coroutine_threadsafe(coro, self._background_loop())
+
+    def get_explanation_sync(self, triage_level, shap_info, symptoms):
+        return self.submit(triage_level, shap_info, symptoms).result()
+
+    def iter_explanations(self, requests):
+        """Blocking generator of ("field", index, name, value) and ("done", index, result) events.
+
+        Events are produced on the background loop and handed to the caller's thread, so UI
+        placeholders can be filled in as soon as each answer streams in.
+        """
+        events = queue.Queue()
+        futures = []
+        for index, args in enumerate(requests):
+            callback = lambda name, value, index=index: events.put(("field", index, name, value))
+            future = self.submit(*args, on_field=callback)
+            future.add_done_callback(lambda f, index=index: events.put(("done", index, f)))
+            futures.append(future)
+
+        remaining = len(futures)
+        try:
+            while remaining:
+                event = events.get()
+                if event[0] == "done":
+                    remaining -= 1
+                    yield ("done", event[1], event[2].result())
+                else:
+                    yield event
+        finally:
+            # Abandoned generator (e.g. the Streamlit run was stopped): cancel outstanding work
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self.aclose(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
@@ -1,57 +1,77 @@
-import shap
-import pickle
-import pandas as pd
-import os
+from src.triage_engine.processor import MODEL_FEATURES
+from src.triage_engine.compiled_forest import COMPILED_MAX_BATCH
+from src.triage_engine.bundle import resolve_model
+from src.monitoring.metrics import timer
+from src.runtime.lazy import lazy_import
 
-def process_triage_and_shap(patient_features, selected_features):
-    model_path = 'models/risk_model.pkl'
-    encoder_path = 'models/label_encoder.pkl'
-    
-    with open(model_path, 'rb') as f:
-        model = pickle.load(f)
-    with open(encoder_path, 'rb') as f:
-        encoder = pickle.load(f)
-
-    # Base values to prevent crashes if features are unselected
-    base_defaults = {
-        'age': 45.0, 'heart_rate': 80.0, 'systolic_blood_pressure': 120.0,
-        'oxygen_saturation': 98.0, 'body_temperature': 37.0, 'pain_level': 5,
-        'chronic_disease_count': 0, 'previous_er_visits': 0, 'arrival_mode': 'walk_in'
-    }
-
-    final_inputs = base_defaults.copy()
-    for sf in selected_features:
-        if sf in patient_features:
-            final_inputs[sf] = patient_features[sf]
-
-    df = pd.DataFrame([final_inputs])
-    cols = list(base_defaults.keys())
-    df = df[cols]
-    df['arrival_mode'] = encoder.transform(df['arrival_mode'])
-
-    prediction = int(model.predict(df)[0])
-    explainer = shap.TreeExplainer(model)
-    shap_values = explainer.shap_values(df)
-
-    # Multi-class fix: Isolate the SHAP values for the predicted class
-    current_shap = shap_values[prediction][0] if isinstance(shap_values, list) else shap_values[0, :, prediction]
-
-    factors = []
-    for i, feature in enumerate(cols):
-        if feature in selected_features:
-            val = current_shap[i]
+# Only the large-batch fallback builds DataFrames
+pd = lazy_import("pandas")
+
+# Base values to prevent crashes if features are unselected
+BASE_DEFAULTS = {
+    'age': 45.0, 'heart_rate': 80.0, 'systolic_blood_pressure': 120.0,
+    'oxygen_saturation': 98.0, 'body_temperature': 37.0, 'pain_level': 5,
+    'chronic_disease_count': 0, 'previous_er_visits': 0, 'arrival_mode': 'walk_in'
+}
+
+def explain_batch(patients, selected_features):
+    """Risk level and top SHAP drivers for many patients with one predict and one SHAP call per class.
+
+    Results are returned in the same order as `patients`.
+    """
+    if not patients:
+        return []
+
+    # Active bundle (or the loose pickles): loaded once and the SHAP engine built once per model version
+    artifacts = resolve_model()
+    engine = artifacts.shap_engine
+
+    batch_inputs = []
+    for patient_features in patients:
+        final_inputs = BASE_DEFAULTS.copy()
+        for sf in selected_features:
+            if sf in patient_features:
+                final_inputs[sf] = patient_features[sf]
+        batch_inputs.append(final_inputs)
+
+    cols = MODEL_FEATURES
+    compiled = artifacts.forest if len(batch_inputs) <= COMPILED_MAX_BATCH else None
+    with timer("predict"):
+        if compiled is not None:
+            # Same predictions as the pickle without the DataFrame/LabelEncoder round trip
+            df = compiled.encode(batch_inputs)
+            predictions = compiled.predict(df)
+        else:
+            df = pd.DataFrame(batch_inputs)[cols]
+            df['arrival_mode'] = artifacts.encoder.transform(df['arrival_mode'])
+            predictions = artifacts.model.predict(df)
+    # Multi-class fix: only the predicted class is explained, and only selected features are ranked
+    selected = [i for i, feature in enumerate(cols) if feature in selected_features]
+    with timer("shap"):
+        explanations = engine.explain(df, predictions, feature_indices=selected, k=3)
+
+    results = []
+    for row, final_inputs in enumerate(batch_inputs):
+        prediction = int(predictions[row])
+
+        top_factors = []
+        for i, val in explanations[row]:
+            feature = cols[i]
             # CLINICAL FIX: Rewording the direction based on multi-class contribution
             direction = f"pushed toward Level {prediction}" if val > 0 else f"pulled away from Level {prediction}"
-            
-            factors.append({
+
+            top_factors.append({
                 "feature": feature,
                 "value": final_inputs[feature],
                 "direction": direction,
                 "shap_value": round(float(val), 3)
             })
 
-    top_factors = sorted(factors, key=lambda x: abs(x['shap_value']), reverse=True)[:3]
-    return {
-        "triage_level": prediction,
-        "top_factors": top_factors
-    }
\ No newline at end of file
+        results.append({
+            "triage_level": prediction,
+            "top_factors": top_factors
+        })
+    return results
+
+def process_triage_and_shap(patient_features, selected_features):
+    return explain_batch([patient_features], selected_features)[0]
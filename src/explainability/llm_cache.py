@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import re
+
+from src.explainability.async_medgemma import AsyncBioMistralExplainer, FIELDS
+from src.explainability.medgemma import build_prompt
+from src.storage.cache import TieredCache
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Department values the clients use for failures; those answers are never cached
+_ERROR_ROUTES = ("Timeout", "Offline", "Error")
+
+
+def normalize_text(text):
+    return _WHITESPACE.sub(' ', str(text)).strip()
+
+
+def explanation_key(model, triage_level, shap_info, symptoms):
+    """Cache key from the model name and the prompt built from normalized inputs.
+
+    Hashing the rendered prompt means inputs that only differ past the 500-character
+    notes cut-off, or in whitespace, share one generation.
+    """
+    prompt = build_prompt(int(triage_level), normalize_text(shap_info), normalize_text(symptoms))
+    return hashlib.sha256(f"{model}\0{prompt}".encode()).hexdigest()
+
+
+class CachedBioMistralExplainer(AsyncBioMistralExplainer):
+    """AsyncBioMistralExplainer with a persistent answer cache and in-flight deduplication.
+
+    Identical prompts issued while a generation is running wait for that generation
+    instead of starting another. Successful answers go into a TieredCache (TTL + LRU,
+    optionally backed by SQLite), so repeat patients are answered without touching Ollama.
+    """
+    def __init__(self, cache=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache if cache is not None else TieredCache(max_memory_items=1024, ttl=24 * 3600, name="llm")
+        self._inflight = {}
+        self.coalesced = 0
+
+    @staticmethod
+    def _replay(result, on_field):
+        if on_field is not None:
+            for name in FIELDS:
+                on_field(name, result[name])
+
+    async def get_explanation(self, triage_level, shap_info, symptoms, on_field=None, timeout=None):
+        shap_info, symptoms = normalize_text(shap_info), normalize_text(symptoms)
+        key = explanation_key(self.model, triage_level, shap_info, symptoms)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._replay(cached, on_field)
+            return dict(cached)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                result = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                # The leading request was cancelled or failed; this one takes over
+                return await self.get_explanation(triage_level, shap_info, symptoms, on_field, timeout)
+            self._replay(result, on_field)
+            return dict(result)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await super().get_explanation(triage_level, shap_info, symptoms, on_field=on_field, timeout=timeout)
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[key]
+
+        if result.get("department_routing") not in _ERROR_ROUTES:
+            self.cache.set(key, dict(result))
+        future.set_result(result)
+        return result
+
+    def get_stats(self):
+        stats = self.cache.get_stats()
+        stats["coalesced"] = self.coalesced
+        stats["inflight"] = len(self._inflight)
+        return stats
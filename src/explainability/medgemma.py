@@ -1,16 +1,21 @@
-import requests
+import logging
 
-class BioMistralExplainer:
-    def __init__(self, model_name="adrienbrault/biomistral-7b:Q4_K_M"):
-        self.url = "http://127.0.0.1:11434/api/generate"
-        self.model = model_name
+from src.monitoring.metrics import inc, timer
+from src.runtime.lazy import lazy_import
 
-    def get_explanation(self, triage_level, shap_info, symptoms):
-        safe_symptoms = symptoms[:500].replace('\n', ' ') + "..." if len(symptoms) > 500 else symptoms.replace('\n', ' ')
+requests = lazy_import("requests")
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_URL = "http://127.0.0.1:11434/api/generate"
+DEFAULT_MODEL = "adrienbrault/biomistral-7b:Q4_K_M"
+
+def build_prompt(triage_level, shap_info, symptoms):
+    safe_symptoms = symptoms[:500].replace('\n', ' ') + "..." if len(symptoms) > 500 else symptoms.replace('\n', ' ')
 
-        # THE DELIMITER PROMPT: We force it to use '|||' to separate the answers.
-        # This is the most reliable method for 7B models.
-        prompt = f"""[INST] You are an AI Chief Medical Officer. Analyze the patient data and return exactly ONE line of text.
+    # THE DELIMITER PROMPT: We force it to use '|||' to separate the answers.
+    # This is the most reliable method for 7B models.
+    return f"""[INST] You are an AI Chief Medical Officer. Analyze the patient data and return exactly ONE line of text.
 You MUST separate your 3 answers using the '|||' symbol.
 
 Format:
@@ -25,18 +30,71 @@ Patient Data:
 - Notes: {safe_symptoms}
 [/INST]
 """
-        
-        payload = {
-            "model": self.model,
-            "prompt": prompt,
-            "stream": False,
-            "raw": True,
-            "options": {
-                "temperature": 0.1, # Keep it low so it doesn't get creative with the formatting
-                "num_predict": 100, 
-                "num_ctx": 2048
-            }
+
+def build_payload(model, prompt, stream=False):
+    return {
+        "model": model,
+        "prompt": prompt,
+        "stream": stream,
+        "raw": True,
+        "options": {
+            "temperature": 0.1, # Keep it low so it doesn't get creative with the formatting
+            "num_predict": 100, 
+            "num_ctx": 2048
+        }
+    }
+
+def parse_llm_output(raw_output):
+    # Flatten the string just in case the model added accidental line breaks
+    raw_output = raw_output.replace('\n', ' ')
+    
+    # THE FOOLPROOF PARSER: Split the string by the '|||' symbol
+    parts = raw_output.split('|||')
+    
+    if len(parts) >= 3:
+        return {
+            "short_synthesis": parts[0].strip(),
+            "recommended_action": parts[1].strip(),
+            "department_routing": parts[2].strip()
+        }
+    elif len(parts) == 2:
+        return {
+            "short_synthesis": parts[0].strip(),
+            "recommended_action": parts[1].strip(),
+            "department_routing": "General Triage"
+        }
+    else:
+        # If it completely failed the format, just dump whatever it wrote into the synthesis
+        return {
+            "short_synthesis": raw_output[:150],
+            "recommended_action": "Manual Review",
+            "department_routing": "General Triage"
         }
+
+def api_error_result(status_code):
+    return {"short_synthesis": f"API Error {status_code}", "recommended_action": "Error", "department_routing": "Error"}
+
+TIMEOUT_RESULT = {"short_synthesis": "Model Timeout.", "recommended_action": "Retry", "department_routing": "Timeout"}
+OFFLINE_RESULT = {"short_synthesis": "Connection Failed.", "recommended_action": "Start Ollama", "department_routing": "Offline"}
+# Outcome label of `triage_llm_requests_total` for each non-answer result
+_OUTCOMES = {"Error": "api_error", "Timeout": "timeout", "Offline": "offline"}
+
+def record_llm_outcome(client, result):
+    inc("triage_llm_requests_total", client=client, outcome=_OUTCOMES.get(result.get("department_routing"), "ok"))
+    return result
+
+class BioMistralExplainer:
+    def __init__(self, model_name=DEFAULT_MODEL):
+        self.url = OLLAMA_URL
+        self.model = model_name
+
+    def get_explanation(self, triage_level, shap_info, symptoms):
+        with timer("llm"):
+            return record_llm_outcome("sync", self._generate(triage_level, shap_info, symptoms))
+
+    def _generate(self, triage_level, shap_info, symptoms):
+        prompt = build_prompt(triage_level, shap_info, symptoms)
+        payload = build_payload(self.model, prompt)
         
         try:
             response = requests.post(self.url, json=payload, timeout=120)
@@ -44,38 +102,17 @@ Patient Data:
             if response.status_code == 200:
                 raw_output = response.json().get('response', "").strip()
                 
-                # Print to your terminal so you can see exactly what it generated!
-                print(f"\n--- RAW LLM OUTPUT ---\n{raw_output}\n----------------------\n")
-                
-                # Flatten the string just in case the model added accidental line breaks
-                raw_output = raw_output.replace('\n', ' ')
-                
-                # THE FOOLPROOF PARSER: Split the string by the '|||' symbol
-                parts = raw_output.split('|||')
+                # Enable DEBUG on this logger to see exactly what the model generated
+                logger.debug("Raw LLM output: %s", raw_output)
                 
-                if len(parts) >= 3:
-                    return {
-                        "short_synthesis": parts[0].strip(),
-                        "recommended_action": parts[1].strip(),
-                        "department_routing": parts[2].strip()
-                    }
-                elif len(parts) == 2:
-                    return {
-                        "short_synthesis": parts[0].strip(),
-                        "recommended_action": parts[1].strip(),
-                        "department_routing": "General Triage"
-                    }
-                else:
-                    # If it completely failed the format, just dump whatever it wrote into the synthesis
-                    return {
-                        "short_synthesis": raw_output[:150],
-                        "recommended_action": "Manual Review",
-                        "department_routing": "General Triage"
-                    }
+                return parse_llm_output(raw_output)
                     
-            return {"short_synthesis": f"API Error {response.status_code}", "recommended_action": "Error", "department_routing": "Error"}
+            logger.warning("Ollama returned HTTP %s", response.status_code)
+            return api_error_result(response.status_code)
             
         except requests.exceptions.ReadTimeout:
-            return {"short_synthesis": "Model Timeout.", "recommended_action": "Retry", "department_routing": "Timeout"}
+            logger.warning("Ollama timed out after 120s")
+            return dict(TIMEOUT_RESULT)
         except requests.exceptions.ConnectionError:
-            return {"short_synthesis": "Connection Failed.", "recommended_action": "Start Ollama", "department_routing": "Offline"}
\ No newline at end of file
+            logger.warning("Ollama is unreachable at %s", self.url)
+            return dict(OFFLINE_RESULT)
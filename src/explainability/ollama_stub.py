@@ -0,0 +1,90 @@
+"""Minimal stand-in for Ollama's /api/generate, for exercising the explainers without a GPU.
+
+Run standalone with `python -m src.explainability.ollama_stub --port 11435`, or call
+`start_stub_server()` from a test or benchmark to get a background server and its URL.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = (
+    "Patient presents with tachycardia and borderline hypoxia requiring prompt assessment. "
+    "||| Continuous pulse oximetry ||| Emergency Medicine"
+)
+
+
+class OllamaStubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive and reuse them from a pool
+    protocol_version = "HTTP/1.1"
+    # Streamed tokens are tiny writes; without TCP_NODELAY each one can wait ~40 ms for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        payload = json.loads(body or b"{}")
+        server = self.server
+        server.request_count += 1
+        tokens = server.response_text.split(" ")
+
+        if not payload.get("stream", True):
+            time.sleep(server.token_delay * len(tokens))
+            data = json.dumps({"model": payload.get("model"), "response": server.response_text, "done": True}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        # Streaming mode: one NDJSON object per token, sent as HTTP chunks like Ollama does
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, token in enumerate(tokens):
+                time.sleep(server.token_delay)
+                piece = token if i == 0 else " " + token
+                self._write_chunk(json.dumps({"response": piece, "done": False}).encode() + b"\n")
+            self._write_chunk(json.dumps({"response": "", "done": True}).encode() + b"\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client timed out or cancelled mid-stream, exactly what the explainer tests exercise
+            self.close_connection = True
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_stub_server(host="127.0.0.1", port=0, response_text=DEFAULT_RESPONSE, token_delay=0.0):
+    """Starts the stub on a daemon thread and returns (server, generate_url)."""
+    server = ThreadingHTTPServer((host, port), OllamaStubHandler)
+    server.daemon_threads = True
+    server.response_text = response_text
+    server.token_delay = token_delay
+    server.request_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/api/generate"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Ollama generate endpoint.")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between streamed tokens")
+    args = parser.parse_args()
+    server, url = start_stub_server(port=args.port, token_delay=args.token_delay)
+    print(f"Ollama stub listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,109 @@
+import threading
+
+import numpy as np
+
+from src.storage.cache import TieredCache
+
+
+def class_tree_model(forest, class_index):
+    """shap's dictionary model format for one class of a CompiledForest.
+
+    Leaf values are the normalised class probability scaled by 1 / n_trees, exactly what
+    shap.TreeExplainer builds for the full sklearn model, but with a single output so the
+    TreeSHAP recursion only carries the column that will be reported. Everything comes
+    from the forest's node arrays, so a bundle never has to unpickle sklearn to explain.
+    """
+    n_trees = forest.n_trees
+    bounds = list(forest.roots) + [len(forest.feature)]
+    trees = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        nodes = np.arange(start, stop)
+        is_leaf = forest.children[2 * nodes + 1] == nodes
+        trees.append({
+            "children_left": np.where(is_leaf, -1, forest.children[2 * nodes + 1] - start),
+            "children_right": np.where(is_leaf, -1, forest.children[2 * nodes] - start),
+            "children_default": np.where(is_leaf, -1, forest.children[2 * nodes + 1] - start),
+            "features": np.where(is_leaf, -2, forest.feature[start:stop]),
+            "thresholds": np.where(is_leaf, -2.0, forest.threshold[start:stop]),
+            "values": forest.values[start:stop, class_index:class_index + 1] / n_trees,
+            "node_sample_weight": np.asarray(forest.node_weight[start:stop], dtype=np.float64),
+        })
+    return {"trees": trees, "input_dtype": np.float32, "internal_dtype": np.float64, "tree_output": "probability"}
+
+
+class TreeShapEngine:
+    """Exact path-dependent TreeSHAP that only computes the predicted class.
+
+    One single-output explainer per class is built on first use and kept for the life of
+    the engine (one engine per model version, held by the bundle or the registry). Rows are grouped by
+    predicted class so each class is explained with one batched call, and results are
+    memoised per (class, exact feature row): re-rendering the board only pays for patients
+    whose inputs changed.
+    """
+    def __init__(self, forest, cache_size=4096):
+        self.forest = forest
+        self.classes = list(forest.classes_)
+        self._explainers = {}
+        self._build_lock = threading.Lock()
+        self.cache = TieredCache(max_memory_items=cache_size, name="shap")
+
+    def _explainer(self, class_index):
+        explainer = self._explainers.get(class_index)
+        if explainer is None:
+            # A request arriving mid warm-up waits for that build instead of starting its own
+            with self._build_lock:
+                explainer = self._explainers.get(class_index)
+                if explainer is None:
+                    import shap  # Heavy import, only paid by callers that need explanations
+                    explainer = shap.TreeExplainer(class_tree_model(self.forest, class_index))
+                    self._explainers[class_index] = explainer
+        return explainer
+
+    def warm_up(self):
+        """Imports shap and builds every class explainer ahead of the first explanation."""
+        for class_index in range(len(self.classes)):
+            self._explainer(class_index)
+
+    def shap_values(self, X, predictions):
+        """(n_rows, n_features) SHAP values, each row for its own predicted class."""
+        X = np.asarray(X, dtype=np.float32)
+        result = np.empty(X.shape, dtype=np.float64)
+        class_indices = np.asarray([self.classes.index(p) for p in predictions])
+
+        pending = {}
+        for row, class_index in enumerate(class_indices):
+            key = f"{class_index}:{X[row].tobytes().hex()}"
+            cached = self.cache.get(key)
+            if cached is not None:
+                result[row] = cached
+            else:
+                pending.setdefault(class_index, []).append((row, key))
+
+        for class_index, rows in pending.items():
+            indices = [row for row, _ in rows]
+            values = self._explainer(class_index).shap_values(X[indices])
+            for (row, key), row_values in zip(rows, values):
+                result[row] = row_values
+                self.cache.set(key, row_values.copy())
+        return result
+
+    @staticmethod
+    def top_k(values, feature_indices, k=3):
+        """Indices of the k strongest of `feature_indices`, ranked like the board (|value| to 3 dp)."""
+        return sorted(feature_indices, key=lambda i: abs(round(float(values[i]), 3)), reverse=True)[:k]
+
+    def explain(self, X, predictions, feature_indices=None, k=3):
+        """Top-k (feature index, SHAP value) pairs per row, restricted to `feature_indices`."""
+        values = self.shap_values(X, predictions)
+        if feature_indices is None:
+            feature_indices = range(values.shape[1])
+        feature_indices = list(feature_indices)
+        return [
+            [(i, float(row_values[i])) for i in self.top_k(row_values, feature_indices, k)]
+            for row_values in values
+        ]
+
+    def get_stats(self):
+        stats = self.cache.get_stats()
+        stats["class_explainers"] = len(self._explainers)
+        return stats
@@ -0,0 +1,52 @@
+import hashlib
+import json
+
+from src.storage.cache import TieredCache
+
+
+class ExtractionCache(TieredCache):
+    """Content-addressed cache of parser output.
+
+    Keys combine the SHA-256 of the uploaded bytes with the parser version and its
+    extraction settings, so a re-uploaded referral is served without opening pymupdf
+    or RapidOCR, while a settings change (zoom, threshold, OCR engine) misses cleanly.
+    """
+    def __init__(self, name="extraction", **kwargs):
+        super().__init__(name=name, **kwargs)
+
+    def document_key(self, data, parser):
+        digest = hashlib.sha256(data).hexdigest()
+        settings = dict(parser.cache_settings())
+        settings["chronic_keywords"] = parser.vitals_extractor.chronic_keywords
+        settings = json.dumps(settings, sort_keys=True, default=str)
+        settings_digest = hashlib.sha256(f"{parser.PARSER_VERSION}|{settings}".encode()).hexdigest()[:16]
+        return f"{digest}:{settings_digest}"
+
+    def get_vitals(self, key):
+        vitals = self.get(key)
+        # Callers fill defaults into the dict they receive, so never hand out the cached object
+        return dict(vitals) if vitals is not None else None
+
+    def set_vitals(self, key, vitals):
+        self.set(key, dict(vitals))
+
+
+class CachedParser:
+    """Wraps any clinical parser so identical uploads skip extraction entirely."""
+    def __init__(self, parser, cache):
+        self.parser = parser
+        self.cache = cache
+
+    def extract_from_file(self, file_upload):
+        key = self.cache.document_key(file_upload.getvalue(), self.parser)
+        vitals = self.cache.get_vitals(key)
+        if vitals is None:
+            if hasattr(self.parser, "iter_pages"):
+                vitals, stream = self.parser.extract_streaming(file_upload)
+                # A time-budget cut depends on machine load; don't pin it for future uploads
+                if stream["stopped"] != "time_budget":
+                    self.cache.set_vitals(key, vitals)
+            else:
+                vitals = self.parser.extract_from_file(file_upload)
+                self.cache.set_vitals(key, vitals)
+        return vitals
@@ -1,92 +1,491 @@
-import pymupdf
-from rapidocr_onnxruntime import RapidOCR
-import tempfile
+import io
+import itertools
+import numpy as np
 import os
-import re
+import threading
+import time
+
+from src.ingestion.vitals import VitalsExtractor, VitalsAccumulator, DEFAULT_REQUIRED_FIELDS
+from src.monitoring.metrics import STAGE_METRIC, inc, observe, timer, timed
+from src.runtime.lazy import lazy_import
+
+# Imported on first use: together they add ~0.4s (cv2, onnxruntime, MuPDF) to every startup
+pymupdf = lazy_import("pymupdf")
+rapidocr = lazy_import("rapidocr_onnxruntime")
+pil_image = lazy_import("PIL.Image")
+
+IMAGE_FILETYPES = ("png", "jpg", "jpeg", "tif", "tiff")
+# Magic numbers: raw-byte uploads are named "document.pdf" whatever they hold
+_IMAGE_SIGNATURES = ((b"\x89PNG\r\n\x1a\n", "png"), (b"\xff\xd8\xff", "jpeg"),
+                     (b"II*\x00", "tiff"), (b"MM\x00*", "tiff"))
+# RapidOCR internals the batched path drives directly (rapidocr_onnxruntime 1.3/1.4); other
+# versions fall back to one engine call per page
+_BATCH_ENGINE_API = ("load_img", "preprocess", "maybe_add_letterbox", "auto_text_det", "get_crop_img_list",
+                     "text_cls", "text_rec", "_get_origin_points", "use_cls", "text_score")
+
+class EarlyStop:
+    """When a streaming read may stop: required fields found confidently, a page cap or a time budget.
+
+    Pages after the stop are never rendered or OCR'd, so values on them (a worse SpO2 on
+    page 9) are not seen. With `required_fields=()` only the page and time caps apply.
+    """
+    def __init__(self, required_fields=DEFAULT_REQUIRED_FIELDS, min_confidence=0.9, max_pages=None, time_budget=None):
+        self.required_fields = tuple(required_fields or ())
+        self.min_confidence = min_confidence
+        self.max_pages = max_pages
+        self.time_budget = time_budget
+
+    def cache_settings(self):
+        return {"required_fields": list(self.required_fields), "min_confidence": self.min_confidence,
+                "max_pages": self.max_pages, "time_budget": self.time_budget}
+
+    def accumulator(self, extractor, separator="\n\n"):
+        return VitalsAccumulator(extractor, self.required_fields, self.min_confidence, separator)
+
+    def reason(self, accumulator, pages_read, elapsed):
+        """Why reading should stop now, or None to keep going."""
+        if accumulator.complete:
+            return "required_fields"
+        if self.max_pages is not None and pages_read >= self.max_pages:
+            return "max_pages"
+        if self.time_budget is not None and elapsed >= self.time_budget:
+            return "time_budget"
+        return None
 
 class BaseClinicalParser:
     """Holds the shared regex extraction logic so we don't duplicate code."""
+    # Bump whenever extraction output can change so cached results from older code are ignored
+    PARSER_VERSION = "2"
+    vitals_extractor = VitalsExtractor()
+    early_stop = None
+    last_stream = None
+
+    def cache_settings(self):
+        """Everything besides the file bytes that determines this parser's output (extraction-cache key)."""
+        return {"parser": type(self).__name__}
+
     def _parse_vitals(self, text):
-        vitals = {}
-        
-        # 1. Temperature: Explicitly handles filler words like "temp to 104.4" or "temp of"
-        t_matches = re.findall(r'(?:Temperature|Temp)\s*(?:of|to|is|at|:)?\s*(\d{2,3}\.?\d?)', text, re.I)
-        t_deg_matches = re.findall(r'(\d{2,3}\.?\d?)\s*°\s*[FfCc]', text)
-        
-        valid_temps = [round((val - 32) * 5 / 9, 1) if val > 50 else val for val in [float(t) for t in t_matches + t_deg_matches]]
-        valid_temps_c = [t for t in valid_temps if 30.0 <= t <= 45.0]
-        if valid_temps_c: 
-            vitals['body_temperature'] = max(valid_temps_c)
-            
-        # 2. SpO2: Handles the zero/letter-O confusion "[Oo0]2" and filler words
-        spo2_matches = re.findall(r'(?:SpO2|Oxygen\s*Saturation|[Oo0]2\s*[Ss]at)\s*(?:of|to|is|at|:)?\s*(\d{2,3})', text, re.I)
-        valid_spo2 = [int(s) for s in spo2_matches if 50 <= int(s) <= 100]
-        if valid_spo2: 
-            vitals['oxygen_saturation'] = min(valid_spo2)
-            
-        # 3. Heart Rate: Catches "HR of 110" or "Pulse: 110"
-        hr_matches = re.findall(r'(?:Heart\s*Rate|HR|Pulse)\s*(?:of|to|is|at|:)?\s*(\d{2,3})', text, re.I)
-        valid_hr = [int(h) for h in hr_matches if 30 <= int(h) <= 250]
-        if valid_hr: 
-            vitals['heart_rate'] = max(valid_hr)
-            
-        # 4. Blood Pressure: Added leniency for spaces and "of/is"
-        sbp_matches = re.findall(r'(?:Blood\s*Pressure|BP)\s*(?:of|to|is|at|:)?\s*(\d{2,3})\s*/', text, re.I)
-        valid_sbp = [int(b) for b in sbp_matches if 50 <= int(b) <= 300]
-        if valid_sbp: 
-            vitals['systolic_blood_pressure'] = max(valid_sbp)
-
-        # 5. Age
-        age_match = re.search(r'(?:Age\s*[:\n\t]+(\d{1,3}))|(\d{1,3})\s*[-]?\s*(?:year[s]?\s*[-]?\s*old|y\.?o\.?)', text, re.I)
-        if age_match:
-            age_val = int(age_match.group(1) or age_match.group(2))
-            if 0 <= age_val <= 120: 
-                vitals['age'] = age_val
-
-        # 6. Chronic Disease Count
-        chronic_keywords = ['hypertension', 'asthma', 'diabetes', 'psoriatic arthritis', 'coronary artery disease', 'cad', 'copd', 'cancer', 'heart failure']
-        disease_count = sum(1 for kw in chronic_keywords if re.search(r'\b' + kw + r'\b', text, re.I))
-        if disease_count > 0:
-            vitals['chronic_disease_count'] = disease_count
-        
-        vitals['raw_text'] = text 
-        return vitals
+        # Single precompiled scan; swap `vitals_extractor` to change the comorbidity vocabulary
+        return self.vitals_extractor.extract(text)
+
+    def extract_streaming(self, file_upload):
+        """(vitals, stream stats) for parsers that read page by page (`iter_pages`).
+
+        Pages go to a VitalsAccumulator as they are produced; with `early_stop` set the
+        page generator is closed as soon as it says so, and the rest of the document is
+        never rendered. Without it the vitals equal the all-pages result.
+        """
+        pages = self.iter_pages(file_upload)
+        if self.early_stop is not None:
+            accumulator = self.early_stop.accumulator(self.vitals_extractor)
+        else:
+            accumulator = VitalsAccumulator(self.vitals_extractor, required_fields=())
+        start = time.perf_counter()
+        pages_read, stopped = 0, None
+        try:
+            for _, text, confidence in pages:
+                accumulator.add_page(text, confidence)
+                pages_read += 1
+                if self.early_stop is not None:
+                    stopped = self.early_stop.reason(accumulator, pages_read, time.perf_counter() - start)
+                    if stopped is not None:
+                        break
+        finally:
+            pages.close()
+        stats = {"pages_read": pages_read, "stopped": stopped, "missing": accumulator.missing,
+                 "seconds": time.perf_counter() - start}
+        self.last_stream = stats
+        return accumulator.result(), stats
+
+def document_filetype(name, data=None):
+    """Filetype from the leading bytes, else the upload name; anything unrecognised is treated as a PDF."""
+    for signature, filetype in _IMAGE_SIGNATURES:
+        if data is not None and data[:len(signature)] == signature:
+            return filetype
+    ext = os.path.splitext(name or "")[1].lower().lstrip(".")
+    return ext if ext in IMAGE_FILETYPES else "pdf"
+
+def upload_filetype(file_upload):
+    return document_filetype(getattr(file_upload, "name", ""), file_upload.getvalue())
+
+def is_image(filetype):
+    return filetype in IMAGE_FILETYPES
+
+def _output_engine_kwargs(engine_kwargs):
+    """RapidOCR kwargs minus thread counts, which change speed but not the recognised text."""
+    return {k: v for k, v in engine_kwargs.items() if not k.endswith("_num_threads")}
+
+def pixmap_array(pix):
+    """Pixmap samples as the BGR (or grey) array RapidOCR expects; same pixels as a PNG round trip, no codec."""
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    if pix.n == 1:
+        return pixels[:, :, 0]
+    return np.ascontiguousarray(pixels[:, :, 2::-1])
+
+def open_document(file_upload):
+    """Opens an upload straight from its bytes; nothing is written to disk."""
+    return pymupdf.open(stream=file_upload.getvalue(), filetype=upload_filetype(file_upload))
+
+def _frame_array(frame):
+    # Fax modes are often 204x98 dpi: stretch the rows so glyphs get their true aspect ratio
+    # (bilevel frames are stretched before conversion: duplicated rows keep strokes sharp,
+    # which reads better than interpolated grey)
+    dpi = frame.info.get("dpi")
+    if dpi and dpi[0] and dpi[1] and abs(float(dpi[0]) - float(dpi[1])) > 1:
+        frame = frame.resize((frame.width, max(1, round(frame.height * float(dpi[0]) / float(dpi[1])))))
+    if frame.mode in ("1", "L", "LA", "I", "I;16", "F"):
+        return np.asarray(frame.convert("L"))
+    return np.ascontiguousarray(np.asarray(frame.convert("RGB"))[:, :, ::-1])
+
+def image_frame_count(data):
+    with pil_image.open(io.BytesIO(data)) as image:
+        return getattr(image, "n_frames", 1)
+
+def iter_image_frames(data, frame_numbers=None):
+    """Decodes PNG/JPEG/TIFF frames (every page of a multi-page fax) to the BGR or grey arrays
+    RapidOCR takes, one frame at a time and at the file's own resolution: no PDF wrapper, no re-render."""
+    with pil_image.open(io.BytesIO(data)) as image:
+        for n in (range(getattr(image, "n_frames", 1)) if frame_numbers is None else frame_numbers):
+            image.seek(n)
+            yield n, _frame_array(image)
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def _lines_text(lines):
+    """(text, mean confidence) of (top y, text, score) lines read top-to-bottom; (None, 0.0) if none."""
+    if not lines:
+        return None, 0.0
+    lines.sort(key=lambda line: line[0])
+    return "\n".join(line[1] for line in lines), sum(line[2] for line in lines) / len(lines)
 
 class DigitalPDFParser(BaseClinicalParser):
     """Ultra-fast parser strictly for native digital PDFs."""
     def extract_from_file(self, file_upload):
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(file_upload.getvalue())
-            tmp_path = tmp.name
-
-        doc = pymupdf.open(tmp_path)
-        full_text = " ".join([page.get_text().strip() for page in doc])
-        doc.close()
-        os.remove(tmp_path)
+        with timer("pdf_text"), open_document(file_upload) as doc:
+            full_text = " ".join([page.get_text().strip() for page in doc])
         
         return self._parse_vitals(full_text)
 
 class OCRImageParser(BaseClinicalParser):
-    """Deep visual parser for Scanned PDFs and Images."""
-    def __init__(self):
-        self.engine = RapidOCR() # Only loads when specifically requested
+    """Deep visual parser for Scanned PDFs and Images.
+
+    PDFs are rendered page by page at 2x; PNG/JPEG/TIFF uploads are decoded frame by
+    frame with Pillow and OCR'd at their own resolution. With `batch_pages` > 1, up to
+    that many pages are read together: detection still runs per page, but the text
+    lines of all of them are classified and recognised as one pool. The recogniser sorts
+    lines by aspect ratio and pads each batch of `rec_batch_num` (6) to its widest line,
+    so pooled batches carry less padding and read slightly differently from page-by-page
+    batches (batch_pages is part of the cache key). Raise `rec_batch_num` together with
+    `intra_op_num_threads` on multi-core hosts; with `early_stop` up to batch_pages - 1
+    pages past the stopping point may be OCR'd.
+    """
+    def __init__(self, early_stop=None, batch_pages=1, **engine_kwargs):
+        # Only loads when specifically requested; kwargs go to RapidOCR (e.g. intra_op_num_threads)
+        self.early_stop = early_stop
+        self.batch_pages = max(1, int(batch_pages))
+        self.engine_kwargs = engine_kwargs
+        self.engine = rapidocr.RapidOCR(**engine_kwargs)
+        self.can_batch = all(hasattr(self.engine, name) for name in _BATCH_ENGINE_API)
+
+    def warm_up(self):
+        """Runs one blank frame so the ONNX sessions are initialised before real pages arrive."""
+        self.engine(np.full((64, 256, 3), 255, dtype=np.uint8))
+
+    def cache_settings(self):
+        settings = {"parser": "OCRImageParser", "zoom": 2.0, "engine": _output_engine_kwargs(self.engine_kwargs)}
+        if self.early_stop is not None:
+            settings["early_stop"] = self.early_stop.cache_settings()
+        if self.batch_pages > 1:
+            settings["batch_pages"] = self.batch_pages
+        return settings
+
+    def ocr_image_scored(self, image):
+        """(text, mean line confidence) for one BGR/grey array, lines top-to-bottom; (None, 0.0) if blank."""
+        result, _ = self.engine(image)
+        return _lines_text([(box[0][1], text, float(score)) for box, text, score in result or ()])
+
+    def ocr_images_scored(self, images):
+        """ocr_image_scored for several images, with classification and recognition batched across them."""
+        images = list(images)
+        if self.batch_pages <= 1 or len(images) < 2 or not self.can_batch:
+            return [self.ocr_image_scored(image) for image in images]
+        # The same steps RapidOCR.__call__ takes, except that every image's line crops are
+        # recognised together instead of image by image
+        engine = self.engine
+        crops, boxes = [], []
+        for image in images:
+            img = engine.load_img(image)
+            raw_h, raw_w = img.shape[:2]
+            img, ratio_h, ratio_w = engine.preprocess(img)
+            img, op_record = engine.maybe_add_letterbox(img, {"preprocess": {"ratio_h": ratio_h, "ratio_w": ratio_w}})
+            dt_boxes, _ = engine.auto_text_det(img)
+            if dt_boxes is None:
+                boxes.append([])
+                continue
+            crops.extend(engine.get_crop_img_list(img, dt_boxes))
+            boxes.append(engine._get_origin_points(dt_boxes, op_record, raw_h, raw_w))
+        if crops and engine.use_cls:
+            crops, _, _ = engine.text_cls(crops)
+        recognised = iter(engine.text_rec(crops)[0] if crops else ())
+        results = []
+        for image_boxes in boxes:
+            lines = []
+            for box, (text, score, *_) in zip(image_boxes, recognised):
+                if float(score) >= engine.text_score:
+                    lines.append((float(box[0][1]), text, float(score)))
+            results.append(_lines_text(lines))
+        return results
+
+    def _render(self, page, clip=None):
+        return pixmap_array(page.get_pixmap(matrix=pymupdf.Matrix(2.0, 2.0), clip=clip))
+
+    @timed("ocr_page")
+    def ocr_page_scored(self, page, clip=None):
+        """(text, mean line confidence) for one page or `clip` rect rendered at 2.0x; (None, 0.0) if blank."""
+        return self.ocr_image_scored(self._render(page, clip))
+
+    def ocr_pages_scored(self, pages):
+        """ocr_page_scored for several pages; one shared recognition pass when batching."""
+        if self.batch_pages <= 1 or len(pages) < 2:
+            return [self.ocr_page_scored(page) for page in pages]
+        return self._timed_batch(self.ocr_images_scored, [self._render(page) for page in pages])
+
+    def ocr_frames_scored(self, frames):
+        """(text, confidence) per decoded image frame."""
+        if self.batch_pages <= 1 or len(frames) < 2:
+            return self._timed_batch(lambda images: [self.ocr_image_scored(image) for image in images], frames)
+        return self._timed_batch(self.ocr_images_scored, frames)
+
+    def _timed_batch(self, ocr, items):
+        # A batch has no per-page timing; each page is booked at its share of the batch
+        start = time.perf_counter()
+        results = ocr(items)
+        elapsed = (time.perf_counter() - start) / max(len(items), 1)
+        for _ in items:
+            observe(STAGE_METRIC, elapsed, stage="ocr_page")
+        return results
+
+    def ocr_page(self, page, clip=None):
+        """Renders one page (or just the `clip` rect) at 2.0x and returns its OCR lines top-to-bottom, or None if blank."""
+        return self.ocr_page_scored(page, clip)[0]
+
+    def iter_pages(self, file_upload):
+        """Yields (page_number, text, confidence), rendering or decoding pages only when asked for
+        (`batch_pages` at a time when batching)."""
+        if is_image(upload_filetype(file_upload)):
+            for group in batched(iter_image_frames(file_upload.getvalue()), self.batch_pages):
+                numbers, frames = zip(*group)
+                for number, (text, confidence) in zip(numbers, self.ocr_frames_scored(list(frames))):
+                    inc("triage_ocr_pages_total")
+                    yield number, text, confidence
+            return
+        with open_document(file_upload) as doc:
+            for group in batched(doc, self.batch_pages):
+                for page, (text, confidence) in zip(group, self.ocr_pages_scored(group)):
+                    inc("triage_ocr_pages_total")
+                    yield page.number, text, confidence
+
+    def extract_from_file(self, file_upload):
+        return self.extract_streaming(file_upload)[0]
+
+# Top 40% of the page, where our ED intake forms print the vitals block
+VITALS_HEADER_ROI = ((0.0, 0.0, 1.0, 0.4),)
+ADAPTIVE_OCR_DEFAULTS = {
+    "base_zoom": 1.25, "zoom": 2.0, "min_text_height": 12.0, "min_score": 0.9, "digits_only": True, "roi": None
+}
+
+def adaptive_ocr_settings(options=None, early_stop=None, engine_kwargs=None):
+    """Extraction-cache settings of an AdaptiveOCRParser built with `options`, without loading RapidOCR."""
+    unknown = set(options or {}) - set(ADAPTIVE_OCR_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown adaptive OCR options: {sorted(unknown)}")
+    settings = {"parser": "AdaptiveOCRParser", "engine": _output_engine_kwargs(engine_kwargs or {})}
+    settings.update(ADAPTIVE_OCR_DEFAULTS)
+    settings.update(options or {})
+    if early_stop is not None:
+        settings["early_stop"] = early_stop.cache_settings()
+    return settings
+
+class AdaptiveOCRParser(OCRImageParser):
+    """OCR at low resolution first, re-rendering at `zoom` only the lines that need it.
+
+    Pages are rendered at `base_zoom` and OCR'd. Lines whose box is shorter than
+    `min_text_height` points, or score below `min_score`, are re-rendered at `zoom` with
+    a small margin and re-recognised on their own (no detection pass); the sharper
+    reading replaces the original when it scores higher. With `digits_only=True` only lines
+    carrying a digit are refined, since the extractor only reads labelled numbers.
+    `roi` restricts OCR to fractional page rectangles (x0, y0, x1, y1), e.g.
+    VITALS_HEADER_ROI; None reads the whole page. Options and defaults are in
+    ADAPTIVE_OCR_DEFAULTS.
+    """
+    def __init__(self, options=None, early_stop=None, **engine_kwargs):
+        self.settings = adaptive_ocr_settings(options, early_stop, engine_kwargs)
+        # Refinement re-renders single pages, so PDF pages are read one at a time; image
+        # frames (already at full resolution) are OCR'd as they are
+        super().__init__(early_stop=early_stop, **engine_kwargs)
+        self.options = {name: self.settings[name] for name in ADAPTIVE_OCR_DEFAULTS}
+        self.base_zoom = self.options["base_zoom"]
+        self.zoom = self.options["zoom"]
+        self.min_text_height = self.options["min_text_height"]
+        self.min_score = self.options["min_score"]
+        self.digits_only = self.options["digits_only"]
+        self.roi = self.options["roi"]
+        self.refined_lines = 0
+
+    def cache_settings(self):
+        return self.settings
+
+    def _regions(self, page, clip):
+        if clip is not None or self.roi is None:
+            return [clip if clip is not None else page.rect]
+        rect = page.rect
+        return [pymupdf.Rect(rect.x0 + x0 * rect.width, rect.y0 + y0 * rect.height,
+                             rect.x0 + x1 * rect.width, rect.y0 + y1 * rect.height) for x0, y0, x1, y1 in self.roi]
+
+    def _needs_refinement(self, text, score, height):
+        if self.digits_only and not any(c.isdigit() for c in text):
+            return False
+        return height < self.min_text_height or score < self.min_score
+
+    def _refine(self, page, rect):
+        # One text line: recognition only, the detector would just find the same box again
+        margin = 2.0
+        clip = pymupdf.Rect(rect.x0 - margin, rect.y0 - margin, rect.x1 + margin, rect.y1 + margin) & page.rect
+        pix = page.get_pixmap(matrix=pymupdf.Matrix(self.zoom, self.zoom), clip=clip)
+        result, _ = self.engine(pixmap_array(pix), use_det=False, use_cls=False)
+        if not result:
+            return None
+        return result[0][0], float(result[0][1])
+
+    def ocr_pages_scored(self, pages):
+        return [self.ocr_page_scored(page) for page in pages]
+
+    @timed("ocr_page")
+    def ocr_page_scored(self, page, clip=None):
+        lines = []  # (top y in page points, text, score)
+        for region in self._regions(page, clip):
+            pix = page.get_pixmap(matrix=pymupdf.Matrix(self.base_zoom, self.base_zoom), clip=region)
+            result, _ = self.engine(pixmap_array(pix))
+            for box, text, score in result or ():
+                xs = [point[0] / self.base_zoom + region.x0 for point in box]
+                ys = [point[1] / self.base_zoom + region.y0 for point in box]
+                score = float(score)
+                if self._needs_refinement(text, score, max(ys) - min(ys)):
+                    refined = self._refine(page, pymupdf.Rect(min(xs), min(ys), max(xs), max(ys)))
+                    self.refined_lines += 1
+                    if refined is not None and refined[1] >= score:
+                        text, score = refined
+                lines.append((box[0][1] / self.base_zoom + region.y0, text, score))
+        return _lines_text(lines)
+
+class HybridClinicalParser(BaseClinicalParser):
+    """Per-page routing: pages with a usable text layer skip OCR, the rest go through RapidOCR.
+
+    With `image_regions_only=True`, low-text pages only render and OCR their embedded
+    image areas and keep whatever digital text they do have. Text-layer pages count as
+    confidence 1.0 for `early_stop`. `adaptive_ocr` (AdaptiveOCRParser options, {} for
+    the defaults) replaces the fixed 2x render for scanned pages. Image uploads have no
+    text layer and go straight to OCR. With `batch_pages` > 1, runs of consecutive scanned
+    pages are OCR'd together (see OCRImageParser).
+    """
+    def __init__(self, min_text_chars=50, image_regions_only=False, early_stop=None, adaptive_ocr=None,
+                 batch_pages=1, **engine_kwargs):
+        self.min_text_chars = min_text_chars
+        self.image_regions_only = image_regions_only
+        self.early_stop = early_stop
+        self.adaptive_ocr = adaptive_ocr
+        self.batch_pages = max(1, int(batch_pages))
+        self.engine_kwargs = engine_kwargs
+        self._ocr = None
+        self._ocr_lock = threading.Lock()
+        self.last_page_routes = []
+
+    def cache_settings(self):
+        settings = {
+            "parser": "HybridClinicalParser", "zoom": 2.0, "engine": _output_engine_kwargs(self.engine_kwargs),
+            "min_text_chars": self.min_text_chars, "image_regions_only": self.image_regions_only
+        }
+        if self.early_stop is not None:
+            settings["early_stop"] = self.early_stop.cache_settings()
+        if self.adaptive_ocr is not None:
+            settings["adaptive_ocr"] = adaptive_ocr_settings(self.adaptive_ocr)
+        elif self.batch_pages > 1:
+            settings["batch_pages"] = self.batch_pages
+        return settings
+
+    @property
+    def ocr(self):
+        # RapidOCR is only loaded once a page (or a warm-up) actually needs it, and only once
+        with self._ocr_lock:
+            if self._ocr is None:
+                if self.adaptive_ocr is not None:
+                    self._ocr = AdaptiveOCRParser(self.adaptive_ocr, **self.engine_kwargs)
+                else:
+                    self._ocr = OCRImageParser(batch_pages=self.batch_pages, **self.engine_kwargs)
+            return self._ocr
+
+    def _ocr_image_regions(self, page, digital_text):
+        regions = [pymupdf.Rect(info["bbox"]) & page.rect for info in page.get_image_info()]
+        regions = [r for r in regions if not r.is_empty]
+        if not regions:
+            return self.ocr.ocr_page_scored(page)
+
+        parts = [digital_text] if digital_text else []
+        confidences = []
+        for rect in sorted(regions, key=lambda r: (r.y0, r.x0)):
+            region_text, confidence = self.ocr.ocr_page_scored(page, clip=rect)
+            if region_text is not None:
+                parts.append(region_text)
+                confidences.append(confidence)
+        return "\n".join(parts), min(confidences, default=1.0)
+
+    def _ocr_run(self, pages):
+        # Consecutive scanned pages, OCR'd together when batching; yielded in page order
+        for page, (page_text, confidence) in zip(pages, self.ocr.ocr_pages_scored(pages)):
+            inc("triage_ocr_pages_total")
+            yield page.number, page_text, confidence
+
+    def iter_pages(self, file_upload):
+        """Yields (page_number, text, confidence), routing each page as it is reached."""
+        self.last_page_routes = []
+
+        if is_image(upload_filetype(file_upload)):
+            for page in self.ocr.iter_pages(file_upload):
+                self.last_page_routes.append("ocr")
+                yield page
+            return
+
+        with open_document(file_upload) as doc:
+            scanned = []
+            for page in doc:
+                digital_text = page.get_text().strip()
+                # 1. Text Check: enough digital text bypasses OCR for this page only
+                if len(digital_text) > self.min_text_chars:
+                    yield from self._ocr_run(scanned)
+                    scanned = []
+                    self.last_page_routes.append("text")
+                    yield page.number, digital_text, 1.0
+                    continue
+
+                # 2. OCR Fallback for scans
+                if self.image_regions_only:
+                    self.last_page_routes.append("ocr_regions")
+                    page_text, confidence = self._ocr_image_regions(page, digital_text)
+                    inc("triage_ocr_pages_total")
+                    yield page.number, page_text, confidence
+                    continue
+                self.last_page_routes.append("ocr")
+                scanned.append(page)
+                if len(scanned) >= self.batch_pages:
+                    yield from self._ocr_run(scanned)
+                    scanned = []
+            yield from self._ocr_run(scanned)
 
     def extract_from_file(self, file_upload):
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(file_upload.getvalue())
-            tmp_path = tmp.name
-
-        doc = pymupdf.open(tmp_path)
-        full_text = []
-
-        for page in doc:
-            mat = pymupdf.Matrix(2.0, 2.0) 
-            pix = page.get_pixmap(matrix=mat)
-            result, _ = self.engine(pix.tobytes("png"))
-            if result:
-                result.sort(key=lambda x: x[0][0][1])
-                full_text.append("\n".join([line[1] for line in result]))
-
-        doc.close()
-        os.remove(tmp_path)
-        return self._parse_vitals("\n\n".join(full_text))
\ No newline at end of file
+        return self.extract_streaming(file_upload)[0]
@@ -0,0 +1,330 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from src.ingestion.parsers import (
+    BaseClinicalParser, OCRImageParser, AdaptiveOCRParser, adaptive_ocr_settings, document_filetype, pymupdf,
+    image_frame_count, is_image, iter_image_frames, batched
+)
+from src.ingestion.vitals import VitalsAccumulator
+from src.monitoring.metrics import STAGE_METRIC, inc, observe
+
+logger = logging.getLogger(__name__)
+
+# Per-worker state: one RapidOCR ONNX session and the most recently opened document
+_worker_parser = None
+_worker_doc = None
+# Parent side: document keys are (run, index), so a worker never reuses another batch's document
+_run_ids = itertools.count()
+
+
+def _init_worker(mode, ocr_threads, adaptive_ocr=None, batch_pages=1):
+    """Process-pool initializer: builds and warms the OCR engine once per worker."""
+    global _worker_parser
+    if mode == "ocr":
+        engine_kwargs = {"intra_op_num_threads": ocr_threads} if ocr_threads else {}
+        if adaptive_ocr is not None:
+            _worker_parser = AdaptiveOCRParser(adaptive_ocr, **engine_kwargs)
+        else:
+            _worker_parser = OCRImageParser(batch_pages=batch_pages, **engine_kwargs)
+        _worker_parser.warm_up()
+
+
+def _open_cached(doc_key, data, filetype):
+    """Keeps the last document open so consecutive page chunks don't reopen it."""
+    global _worker_doc
+    if _worker_doc is None or _worker_doc[0] != doc_key:
+        if _worker_doc is not None:
+            _worker_doc[1].close()
+            _worker_doc = None  # A document that fails to open must not leave the closed one cached
+        _worker_doc = (doc_key, pymupdf.open(stream=data, filetype=filetype))
+    return _worker_doc[1]
+
+
+def _ocr_pages(doc_key, data, filetype, page_numbers):
+    """Worker task: render (or decode, for image frames) + OCR a chunk of pages, `batch_pages` at a time.
+
+    Returns (page_number, text, confidence) triples and each page's OCR seconds (a batch's
+    pages share its average); the worker's own metrics registry is never scraped, so the
+    parent records the timings.
+    """
+    if is_image(filetype):
+        items = iter_image_frames(data, page_numbers)
+        ocr = _worker_parser.ocr_images_scored
+    else:
+        doc = _open_cached(doc_key, data, filetype)
+        items = ((n, doc[n]) for n in page_numbers)
+        ocr = _worker_parser.ocr_pages_scored
+    pages, seconds = [], []
+    for group in batched(items, _worker_parser.batch_pages):
+        start = time.perf_counter()
+        results = ocr([item for _, item in group])
+        elapsed = (time.perf_counter() - start) / len(group)
+        pages.extend((n, *result) for (n, _), result in zip(group, results))
+        seconds.extend([elapsed] * len(group))
+    return pages, seconds
+
+
+def _extract_digital(doc_key, data, filetype):
+    """Worker task: native text layer of the whole document, joined like DigitalPDFParser."""
+    doc = _open_cached(doc_key, data, filetype)
+    return " ".join([page.get_text().strip() for page in doc])
+
+
+def _read_upload(file_upload):
+    """Accepts Streamlit uploads / BytesIO (getvalue), raw bytes or a filesystem path."""
+    if isinstance(file_upload, (bytes, bytearray)):
+        return bytes(file_upload), document_filetype("", file_upload)
+    if isinstance(file_upload, (str, os.PathLike)):
+        with open(file_upload, 'rb') as f:
+            data = f.read()
+        return data, document_filetype(str(file_upload), data)
+    data = file_upload.getvalue()
+    return data, document_filetype(getattr(file_upload, "name", ""), data)
+
+
+class ExtractionError(Exception):
+    """Yielded in place of a document's vitals when it could not be read; the rest of the batch carries on."""
+    def __init__(self, index, cause):
+        super().__init__(f"Document {index}: {type(cause).__name__}: {cause}")
+        self.index = index
+        self.cause = cause
+
+
+class _PageStream:
+    """Parent-side state of one OCR'd document: pages reach the accumulator strictly in page order."""
+    def __init__(self, extractor, early_stop):
+        self.early_stop = early_stop
+        if early_stop is not None:
+            self.accumulator = early_stop.accumulator(extractor)
+        else:
+            self.accumulator = VitalsAccumulator(extractor, required_fields=())
+        self.received = {}
+        self.next_page = 0
+        self.started = time.perf_counter()
+        self.stopped = None
+
+    def add(self, pages):
+        """Buffers out-of-order chunk results and returns the stop reason once one applies."""
+        for number, text, confidence in pages:
+            self.received[number] = (text, confidence)
+        while self.stopped is None and self.next_page in self.received:
+            self.accumulator.add_page(*self.received.pop(self.next_page))
+            self.next_page += 1
+            if self.early_stop is not None:
+                self.stopped = self.early_stop.reason(self.accumulator, self.next_page, time.perf_counter() - self.started)
+        return self.stopped
+
+
+class ParallelIngestionPipeline(BaseClinicalParser):
+    """Fans documents and pages out across a process pool and streams vitals back in order.
+
+    Workers render and OCR page chunks while the parent counts pages, keeps at most
+    `max_pending` chunks in flight and runs `_parse_vitals` on each document as soon
+    as all of its pages are back. The pool is reused across batches, so each worker
+    loads RapidOCR once. With an ExtractionCache, previously seen documents never
+    reach the pool.
+
+    With `early_stop` (OCR mode), pages are fed to the document's accumulator in page
+    order as chunks return; once it says stop, chunks not yet started are cancelled or
+    never submitted. `page_stats` counts pages read against pages in the documents.
+    A document that cannot be opened, or whose chunk fails in a worker, yields an
+    ExtractionError instead of vitals; its other chunks are cancelled.
+    `adaptive_ocr` (AdaptiveOCRParser options) switches workers to adaptive rendering.
+    With `batch_pages` > 1 each worker recognises that many pages of a chunk together
+    (chunks grow to at least `batch_pages` pages). PNG/JPEG/TIFF uploads are split
+    into chunks of frames and decoded by the workers, never converted to PDF.
+    """
+    def __init__(self, mode="ocr", max_workers=None, pages_per_task=2, max_pending=None,
+                 ocr_threads=1, mp_context="spawn", cache=None, early_stop=None, adaptive_ocr=None,
+                 batch_pages=1):
+        self.mode = mode
+        self.cache = cache
+        self.early_stop = early_stop
+        self.adaptive_ocr = adaptive_ocr
+        self.page_stats = {"pages_total": 0, "pages_read": 0, "stopped_early": 0}
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_pages = max(1, int(batch_pages))
+        self.pages_per_task = max(pages_per_task, self.batch_pages)
+        self.max_pending = max_pending or self.max_workers * 2
+        self.ocr_threads = ocr_threads
+        self.mp_context = mp_context
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.mp_context),
+                initializer=_init_worker,
+                initargs=(self.mode, self.ocr_threads, self.adaptive_ocr, self.batch_pages)
+            )
+        return self._pool
+
+    def cache_settings(self):
+        # Same output as the serial parsers, so cache entries are shared with them
+        if self.mode == "ocr" and self.adaptive_ocr is not None:
+            return adaptive_ocr_settings(self.adaptive_ocr, self.early_stop)
+        if self.mode == "ocr":
+            settings = {"parser": "OCRImageParser", "zoom": 2.0, "engine": {}}
+            if self.early_stop is not None:
+                settings["early_stop"] = self.early_stop.cache_settings()
+            if self.batch_pages > 1:
+                settings["batch_pages"] = self.batch_pages
+            return settings
+        return {"parser": "DigitalPDFParser"}
+
+    def _page_count(self, data, filetype):
+        if is_image(filetype):
+            return image_frame_count(data)
+        with pymupdf.open(stream=data, filetype=filetype) as doc:
+            return doc.page_count
+
+    def _tasks(self, files, chunks_left, cache_keys, cached, streams, failed):
+        """Lazily yields (doc_index, fn, args) so page counting overlaps with worker OCR."""
+        run_id = next(_run_ids)
+        for doc_index, file_upload in enumerate(files):
+            try:
+                data, filetype = _read_upload(file_upload)
+                page_count = self._page_count(data, filetype) if self.mode == "ocr" else None
+            except Exception as e:
+                self._fail(doc_index, e, {}, chunks_left, failed)
+                continue
+            if self.cache is not None:
+                cache_keys[doc_index] = self.cache.document_key(data, self)
+                vitals = self.cache.get_vitals(cache_keys[doc_index])
+                if vitals is not None:
+                    cached[doc_index] = vitals
+                    chunks_left[doc_index] = 0
+                    continue
+
+            if self.mode != "ocr":
+                chunks_left[doc_index] = 1
+                yield doc_index, _extract_digital, ((run_id, doc_index), data, filetype)
+                continue
+
+            self.page_stats["pages_total"] += page_count
+            chunks = [list(range(i, min(i + self.pages_per_task, page_count)))
+                      for i in range(0, page_count, self.pages_per_task)]
+            chunks_left[doc_index] = len(chunks)
+            streams[doc_index] = _PageStream(self.vitals_extractor, self.early_stop)
+            for page_numbers in chunks:
+                if streams[doc_index].stopped is not None or chunks_left[doc_index] == 0:
+                    break
+                yield doc_index, _ocr_pages, ((run_id, doc_index), data, filetype, page_numbers)
+
+    def run(self, files):
+        """Generator of (index, vitals) for `files`, yielded strictly in submission order."""
+        files = list(files)
+        pool = self._get_pool()
+        chunks_left, cache_keys, cached, streams, failed = {}, {}, {}, {}, {}
+        page_texts = {i: [] for i in range(len(files))}
+        tasks = self._tasks(files, chunks_left, cache_keys, cached, streams, failed)
+        pending = {}
+        next_doc = 0
+        exhausted = False
+
+        try:
+            while next_doc < len(files):
+                # Bounded submission window keeps memory flat on very large batches
+                while not exhausted and len(pending) < self.max_pending:
+                    try:
+                        doc_index, fn, args = next(tasks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    try:
+                        pending[pool.submit(fn, *args)] = doc_index
+                    except BrokenProcessPool as e:
+                        self._fail(doc_index, e, pending, chunks_left, failed)
+
+                if pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        doc_index = pending.pop(future)
+                        if chunks_left[doc_index] == 0:
+                            continue  # Chunk was already running when its document stopped or failed
+                        stream = streams.get(doc_index)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            self._fail(doc_index, e, pending, chunks_left, failed)
+                            continue
+                        chunks_left[doc_index] -= 1
+                        if isinstance(result, str):
+                            page_texts[doc_index].append((0, result))
+                            continue
+                        pages, seconds = result
+                        inc("triage_ocr_pages_total", len(pages))
+                        for elapsed in seconds:
+                            observe(STAGE_METRIC, elapsed, stage="ocr_page")
+                        if stream.add(pages) is not None:
+                            self._stop(doc_index, pending)
+                            chunks_left[doc_index] = 0
+
+                # Release every finished document at the head of the line
+                while next_doc < len(files) and chunks_left.get(next_doc) == 0:
+                    pages = page_texts.pop(next_doc)
+                    stream = streams.pop(next_doc, None)
+                    if next_doc in failed:
+                        vitals = failed.pop(next_doc)
+                    elif next_doc in cached:
+                        vitals = cached.pop(next_doc)
+                    else:
+                        if stream is not None:
+                            vitals = stream.accumulator.result()
+                            self.page_stats["pages_read"] += stream.next_page
+                        else:
+                            vitals = self._parse_vitals(self._join(pages))
+                        # A time-budget cut depends on machine load; don't pin it for future uploads
+                        if self.cache is not None and (stream is None or stream.stopped != "time_budget"):
+                            self.cache.set_vitals(cache_keys[next_doc], vitals)
+                    yield next_doc, vitals
+                    next_doc += 1
+        finally:
+            # A closed generator or a dead worker must not leave chunks queued on the shared pool
+            for future in pending:
+                future.cancel()
+            if getattr(self._pool, "_broken", False):
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _fail(self, doc_index, cause, pending, chunks_left, failed):
+        """Replaces a document's vitals with an ExtractionError and drops its queued chunks."""
+        failed[doc_index] = ExtractionError(doc_index, cause)
+        logger.warning("Extraction failed: %s", failed[doc_index])
+        chunks_left[doc_index] = 0
+        for future, index in list(pending.items()):
+            if index == doc_index and future.cancel():
+                del pending[future]
+
+    def _stop(self, doc_index, pending):
+        """Drops a document's queued chunks; ones already running finish and are ignored."""
+        self.page_stats["stopped_early"] += 1
+        for future, index in list(pending.items()):
+            if index == doc_index and future.cancel():
+                del pending[future]
+
+    def _join(self, pages):
+        pages.sort(key=lambda x: x[0])
+        separator = "\n\n" if self.mode == "ocr" else " "
+        return separator.join([text for _, text in pages if text is not None])
+
+    def extract_many(self, files):
+        """Convenience wrapper returning the vitals list in input order."""
+        return [vitals for _, vitals in self.run(files)]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,196 @@
+import re
+
+from src.monitoring.metrics import timed
+
+DEFAULT_CHRONIC_KEYWORDS = (
+    'hypertension', 'asthma', 'diabetes', 'psoriatic arthritis', 'coronary artery disease',
+    'cad', 'copd', 'cancer', 'heart failure'
+)
+
+# Handles filler words like "temp to 104.4", "HR of 110" or "BP is 140/90"
+_FILLER = r'\s*(?:of|to|is|at|:)?\s*'
+
+# All label-anchored vitals in one alternation. Each branch is the exact pattern the
+# parser always used, so every field sees the same matches as its own re.findall would:
+# a label can only start on a letter, and no label, filler or number contains another label.
+# The leading lookahead lets the scanner skip straight to characters a label can start with.
+_LABELLED_VITALS = (
+    r'(?=[tsoh0pb])(?:'
+    r'(?:temperature|temp)' + _FILLER + r'(?P<temp>\d{2,3}\.?\d?)'
+    r'|(?:spo2|oxygen\s*saturation|[o0]2\s*sat)' + _FILLER + r'(?P<spo2>\d{2,3})'
+    r'|(?:heart\s*rate|hr|pulse)' + _FILLER + r'(?P<hr>\d{2,3})'
+    r'|(?:blood\s*pressure|bp)' + _FILLER + r'(?P<sbp>\d{2,3})\s*/'
+    r')'
+)
+
+# The one exception to the rule above: the OCR spelling "02 Sat" starts on a digit, so it
+# can begin inside another field's number ("HR 102 Sat 95"). When that spelling appears,
+# SpO2 is re-scanned on its own to keep the old semantics.
+_SPO2_ALONE = r'(?:spo2|oxygen\s*saturation|[o0]2\s*sat)' + _FILLER + r'(\d{2,3})'
+_ZERO_O2_SAT = r'02\s*sat'
+
+_AGE = r'(?:age\s*[:\n\t]+(\d{1,3}))|(\d{1,3})\s*[-]?\s*(?:year[s]?\s*[-]?\s*old|y\.?o\.?)'
+
+# The case-insensitive patterns above are written in lower case. Text is normally lowered
+# once and scanned case-sensitively, which keeps the regex engine's literal fast paths
+# (re.IGNORECASE disables them). That is only equivalent to re.I when no character folds
+# onto an ASCII letter or changes length when lowered; across all of Unicode that is just
+# these four, and text containing any of them keeps re.I matching.
+_CASE_UNSAFE = re.compile('[\u0130\u0131\u017f\u212a]')
+_LOWERED_PATTERNS = {name: re.compile(src) for name, src in (
+    ("labelled", _LABELLED_VITALS), ("spo2", _SPO2_ALONE), ("zero_o2", _ZERO_O2_SAT), ("age", _AGE))}
+_IGNORECASE_PATTERNS = {name: re.compile(src, re.I) for name, src in (
+    ("labelled", _LABELLED_VITALS), ("spo2", _SPO2_ALONE), ("zero_o2", _ZERO_O2_SAT), ("age", _AGE))}
+
+_DEGREE_TEMP = re.compile(r'(\d{2,3}\.?\d?)\s*°\s*[FfCc]')
+_WORD = re.compile(r'\w+')
+
+
+class VitalsExtractor:
+    """Precompiled vitals and comorbidity extractor behind BaseClinicalParser._parse_vitals.
+
+    Labelled vitals come from one combined scan, and the comorbidity vocabulary is matched
+    with a word-level automaton: a single alternation over each keyword's first word,
+    then a literal check of the remaining words. The output is identical to the original
+    per-pattern regexes (F->C conversion, sanity ranges, max/min risk selection).
+    """
+    def __init__(self, chronic_keywords=DEFAULT_CHRONIC_KEYWORDS):
+        self.chronic_keywords = tuple(kw.lower() for kw in chronic_keywords)
+
+        # first word -> [(keyword index, remaining text after the first word)]
+        self._continuations = {}
+        for index, kw in enumerate(self.chronic_keywords):
+            first = _WORD.match(kw)
+            if first is None or not (kw[0].isalnum() or kw[0] == '_') or not (kw[-1].isalnum() or kw[-1] == '_'):
+                raise ValueError(f"Chronic keyword must start and end with a word character: {kw!r}")
+            self._continuations.setdefault(first.group(0), []).append((index, kw[first.end():]))
+
+        first_words = sorted(self._continuations, key=len, reverse=True)
+        first_word = r'\b(?=[' + re.escape(''.join(sorted({w[0] for w in first_words}))) + r'])(?:' + '|'.join(map(re.escape, first_words)) + r')\b'
+        self._first_word_lowered = re.compile(first_word)
+        self._first_word_ignorecase = re.compile(first_word, re.I)
+
+    def count_chronic(self, text, lowered=False):
+        """Number of distinct vocabulary keywords present. `lowered` marks text already lower-cased for the fast path."""
+        found = set()
+        text_len = len(text)
+        first_word = self._first_word_lowered if lowered else self._first_word_ignorecase
+        for match in first_word.finditer(text):
+            end = match.end()
+            word = match.group(0) if lowered else match.group(0).lower()
+            for index, rest in self._continuations.get(word, ()):
+                if index in found:
+                    continue
+                if rest:
+                    stop = end + len(rest)
+                    segment = text[end:stop]
+                    if (segment if lowered else segment.lower()) != rest:
+                        continue
+                    # Trailing word boundary, as in r'\b' + kw + r'\b'
+                    if stop < text_len and (text[stop].isalnum() or text[stop] == '_'):
+                        continue
+                found.add(index)
+        return len(found)
+
+    @timed("parse_vitals")
+    def extract(self, text):
+        vitals = {}
+        temps, spo2s, hrs, sbps = [], [], [], []
+
+        lowered = text.isascii() or not _CASE_UNSAFE.search(text)
+        scan = text.lower() if lowered else text
+        patterns = _LOWERED_PATTERNS if lowered else _IGNORECASE_PATTERNS
+
+        for match in patterns["labelled"].finditer(scan):
+            kind = match.lastgroup
+            if kind == 'temp':
+                temps.append(float(match.group('temp')))
+            elif kind == 'spo2':
+                spo2s.append(int(match.group('spo2')))
+            elif kind == 'hr':
+                hrs.append(int(match.group('hr')))
+            else:
+                sbps.append(int(match.group('sbp')))
+
+        if patterns["zero_o2"].search(scan):
+            spo2s = [int(s) for s in patterns["spo2"].findall(scan)]
+
+        # 1. Temperature: label and degree-suffixed values, Fahrenheit converted to Celsius
+        if '°' in text:
+            temps.extend(float(t) for t in _DEGREE_TEMP.findall(text))
+        valid_temps = [round((val - 32) * 5 / 9, 1) if val > 50 else val for val in temps]
+        valid_temps_c = [t for t in valid_temps if 30.0 <= t <= 45.0]
+        if valid_temps_c:
+            vitals['body_temperature'] = max(valid_temps_c)
+
+        # 2. SpO2: lowest plausible reading is the risk marker
+        valid_spo2 = [s for s in spo2s if 50 <= s <= 100]
+        if valid_spo2:
+            vitals['oxygen_saturation'] = min(valid_spo2)
+
+        # 3. Heart Rate
+        valid_hr = [h for h in hrs if 30 <= h <= 250]
+        if valid_hr:
+            vitals['heart_rate'] = max(valid_hr)
+
+        # 4. Blood Pressure (systolic)
+        valid_sbp = [b for b in sbps if 50 <= b <= 300]
+        if valid_sbp:
+            vitals['systolic_blood_pressure'] = max(valid_sbp)
+
+        # 5. Age
+        age_match = patterns["age"].search(scan)
+        if age_match:
+            age_val = int(age_match.group(1) or age_match.group(2))
+            if 0 <= age_val <= 120:
+                vitals['age'] = age_val
+
+        # 6. Chronic Disease Count
+        disease_count = self.count_chronic(scan, lowered)
+        if disease_count > 0:
+            vitals['chronic_disease_count'] = disease_count
+
+        vitals['raw_text'] = text
+        return vitals
+
+
+# Fields the model cannot do without; a streaming read may stop once all of them are in hand
+DEFAULT_REQUIRED_FIELDS = ('body_temperature', 'oxygen_saturation', 'heart_rate', 'systolic_blood_pressure', 'age')
+
+
+class VitalsAccumulator:
+    """Incremental vitals for a document read one page at a time.
+
+    Every page is scanned on arrival (regex only, negligible next to OCR) to record which
+    fields it carried and at what OCR confidence. result() runs the extractor over all
+    pages received so far, so a document read to the end yields exactly what the
+    all-at-once path would, while `complete` tells a streaming reader it may stop.
+    """
+    def __init__(self, extractor=None, required_fields=DEFAULT_REQUIRED_FIELDS, min_confidence=0.9, separator="\n\n"):
+        self.extractor = extractor or VitalsExtractor()
+        self.required_fields = tuple(required_fields or ())
+        self.min_confidence = min_confidence
+        self.separator = separator
+        self.pages = []
+        self.confidence = {}  # field -> best confidence of a page that carried it
+
+    def add_page(self, text, confidence=1.0):
+        """Adds one page's text (None for a blank page) with its OCR confidence (1.0 for a text layer)."""
+        if text is None:
+            return
+        self.pages.append(text)
+        if self.required_fields:
+            for field in self.extractor.extract(text):
+                if field != 'raw_text' and confidence > self.confidence.get(field, -1.0):
+                    self.confidence[field] = confidence
+
+    @property
+    def missing(self):
+        return [f for f in self.required_fields if self.confidence.get(f, -1.0) < self.min_confidence]
+
+    @property
+    def complete(self):
+        return bool(self.required_fields) and not self.missing
+
+    def result(self):
+        return self.extractor.extract(self.separator.join(self.pages))
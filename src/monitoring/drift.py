@@ -0,0 +1,323 @@
+"""Streaming input-drift and data-quality monitor for the features the model is fed.
+
+Parsers leave out what they cannot read and the pipeline fills the gaps with defaults
+(pain level 5, walk-in arrival, explain.BASE_DEFAULTS), so a broken OCR model or a new
+referral template skews predictions without raising anything. The monitor keeps
+constant-memory sketches of what actually arrives:
+
+  * per feature: Welford running mean/variance of the values that were present, a
+    histogram over the training deciles (or category table) and how often the value was
+    missing and therefore defaulted;
+  * per extraction source (digital, hybrid, ocr): how often each required vital was
+    missing from a parsed document.
+
+The training reference (`reference_stats`, written into the model bundle's manifest)
+supplies the bin edges and expected proportions. Counts are kept for a tumbling window
+of `window` patients (documents per source) plus the previous full window, and the
+population stability index (PSI) and missing rates are computed over those two windows
+when they roll over or are read, never per patient. Recording is a dict lookup, a
+bisect and a few float operations per field: microseconds per patient.
+"""
+import bisect
+import logging
+import math
+import threading
+
+import numpy as np
+
+from src.ingestion.vitals import DEFAULT_REQUIRED_FIELDS
+from src.monitoring.metrics import REGISTRY
+from src.triage_engine.processor import MODEL_FEATURES
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_FORMAT = 1
+DEFAULT_BINS = 10
+CATEGORICAL_FEATURES = ("arrival_mode",)
+# PSI bands: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 major shift
+PSI_THRESHOLD = 0.25
+MISSING_THRESHOLD = 0.2
+# Proportions are floored so an empty bin on either side keeps the PSI finite
+_PSI_FLOOR = 1e-4
+
+
+def reference_stats(df, bins=DEFAULT_BINS):
+    """Training-time statistics for every feature column: moments, decile edges and proportions."""
+    features = {}
+    for name in df.columns:
+        values = df[name].to_numpy()
+        if name in CATEGORICAL_FEATURES or values.dtype.kind in "OUS":
+            levels, counts = np.unique(values.astype(str), return_counts=True)
+            features[name] = {"kind": "categorical", "count": int(counts.sum()), "levels": levels.tolist(),
+                              "proportions": (counts / counts.sum()).tolist()}
+            continue
+        values = values[~np.isnan(values)]
+        # Edges stay in the column's dtype for the counts, and are saved by their shortest repr so the
+        # float32 training value 91.6 and a charted 91.6 land in the same bin
+        edges = np.unique(np.quantile(values, np.linspace(0.0, 1.0, bins + 1)[1:-1]).astype(values.dtype))
+        # side="left" matches the monitor's bisect_left: a value on an edge falls in the lower bin
+        counts = np.bincount(np.searchsorted(edges, values, side="left"), minlength=len(edges) + 1)
+        low, high = float(str(values.min())), float(str(values.max()))
+        values = values.astype(np.float64)
+        features[name] = {"kind": "numeric", "count": int(len(values)), "mean": float(values.mean()),
+                          "std": float(values.std()), "min": low, "max": high,
+                          "edges": [float(str(edge)) for edge in edges], "proportions": (counts / counts.sum()).tolist()}
+    return {"format": REFERENCE_FORMAT, "rows": int(len(df)), "features": features}
+
+
+def psi(expected, counts):
+    """Population stability index of observed bin `counts` against `expected` proportions."""
+    total = sum(counts)
+    if not total:
+        return None
+    value = 0.0
+    for e, n in zip(expected, counts):
+        e = max(e, _PSI_FLOOR)
+        a = max(n / total, _PSI_FLOOR)
+        value += (a - e) * math.log(a / e)
+    return value
+
+
+class _FeatureSketch:
+    """Moments (lifetime), bin counts and defaulted count (current and previous window) of one feature."""
+    __slots__ = ("reference", "categorical", "edges", "levels", "expected", "count", "mean", "m2",
+                 "bins", "previous_bins", "defaulted", "previous_defaulted")
+
+    def __init__(self, reference=None, categorical=False):
+        self.reference = reference
+        # Known categoricals stay categorical without a reference (loose pickles, older bundles)
+        self.categorical = categorical or (reference is not None and reference["kind"] == "categorical")
+        self.edges = None
+        self.levels = None
+        self.expected = None
+        if self.categorical and reference is not None:
+            self.levels = {level: i for i, level in enumerate(reference["levels"])}
+            # Unseen categories go to an extra bin the training data never filled
+            self.expected = list(reference["proportions"]) + [0.0]
+        elif reference is not None:
+            self.edges = reference["edges"]
+            self.expected = list(reference["proportions"])
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.bins = [0] * len(self.expected) if self.expected else []
+        self.previous_bins = None
+        self.defaulted = 0
+        self.previous_defaulted = 0
+
+    def add(self, value):
+        if self.categorical:
+            # Present: no moments, and bins only against a reference's levels
+            if self.levels is not None:
+                self.bins[self.levels.get(str(value), len(self.levels))] += 1
+            return True
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+        if math.isnan(value):
+            return False
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.edges is not None:
+            self.bins[bisect.bisect_left(self.edges, value)] += 1
+        return True
+
+    def roll(self):
+        self.previous_bins = self.bins
+        self.bins = [0] * len(self.bins)
+        self.previous_defaulted = self.defaulted
+        self.defaulted = 0
+
+    def recent_bins(self):
+        if self.previous_bins is None:
+            return list(self.bins)
+        return [a + b for a, b in zip(self.bins, self.previous_bins)]
+
+
+class _SourceStats:
+    """Documents and missing-field counts of one extraction source (current and previous window)."""
+    __slots__ = ("documents", "missing", "previous_documents", "previous_missing", "total_documents")
+
+    def __init__(self, fields):
+        self.documents = 0
+        self.missing = dict.fromkeys(fields, 0)
+        self.previous_documents = 0
+        self.previous_missing = dict.fromkeys(fields, 0)
+        self.total_documents = 0
+
+    def roll(self):
+        self.previous_documents = self.documents
+        self.previous_missing = self.missing
+        self.documents = 0
+        self.missing = dict.fromkeys(self.missing, 0)
+
+    def recent_rates(self):
+        documents = self.documents + self.previous_documents
+        if not documents:
+            return documents, {}
+        return documents, {field: (n + self.previous_missing[field]) / documents for field, n in self.missing.items()}
+
+
+class DriftMonitor:
+    """Thread-safe sketches of incoming features and extraction gaps, compared with a training reference.
+
+    `use_reference(reference)` (re)binds the sketches to a bundle's statistics; with no
+    reference, moments and missing rates are still kept but there is no PSI. `alerts()`
+    lists features whose recent PSI exceeds `psi_threshold` and extraction sources whose
+    recent missing rate for a required vital exceeds `missing_threshold`, once at least
+    `min_count` recent patients/documents back the figure; new alerts are also logged as
+    warnings when a window rolls over.
+    """
+    def __init__(self, features=MODEL_FEATURES, extracted_fields=DEFAULT_REQUIRED_FIELDS, window=500,
+                 min_count=100, psi_threshold=PSI_THRESHOLD, missing_threshold=MISSING_THRESHOLD):
+        self.features = tuple(features)
+        self.extracted_fields = tuple(extracted_fields)
+        self.window = window
+        self.min_count = min_count
+        self.psi_threshold = psi_threshold
+        self.missing_threshold = missing_threshold
+        self.reference = None
+        self._lock = threading.Lock()
+        self._logged = set()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            references = (self.reference or {}).get("features", {})
+            self._sketches = [(name, _FeatureSketch(references.get(name), name in CATEGORICAL_FEATURES))
+                              for name in self.features]
+            self._sources = {}
+            self._patients = 0
+            self._seen = 0
+            self._previous_seen = 0
+
+    def use_reference(self, reference):
+        """Binds to a bundle's reference statistics; a different reference starts the sketches afresh."""
+        if reference is self.reference:
+            return
+        if reference is not None and reference.get("format") != REFERENCE_FORMAT:
+            logger.warning("Ignoring drift reference in unsupported format %r", reference.get("format"))
+            reference = None
+        self.reference = reference
+        self.reset()
+
+    # --- Recording ---
+
+    def observe_batch(self, patients):
+        """Records the feature dicts as they arrive, before any default is filled in."""
+        rolled = False
+        with self._lock:
+            for features in patients:
+                for name, sketch in self._sketches:
+                    value = features.get(name)
+                    if value is None or not sketch.add(value):
+                        sketch.defaulted += 1
+                self._patients += 1
+                self._seen += 1
+                if self._seen >= self.window:
+                    for _, sketch in self._sketches:
+                        sketch.roll()
+                    self._previous_seen, self._seen = self._seen, 0
+                    rolled = True
+        if rolled:
+            self._log_alerts()
+
+    def observe_extraction(self, source, vitals):
+        """Records which required vitals one parsed document lacked."""
+        rolled = False
+        with self._lock:
+            stats = self._sources.get(source)
+            if stats is None:
+                stats = self._sources[source] = _SourceStats(self.extracted_fields)
+            for field in self.extracted_fields:
+                if field not in vitals:
+                    stats.missing[field] += 1
+            stats.documents += 1
+            stats.total_documents += 1
+            if stats.documents >= self.window:
+                stats.roll()
+                rolled = True
+        if rolled:
+            self._log_alerts()
+
+    # --- Reporting ---
+
+    def snapshot(self):
+        """Per-feature moments, PSI and defaulted rate, per-source missing rates, and the current alerts."""
+        with self._lock:
+            recent = self._seen + self._previous_seen
+            features = {}
+            for name, sketch in self._sketches:
+                reference = sketch.reference or {}
+                bins = sketch.recent_bins()
+                features[name] = {
+                    "count": sketch.count,
+                    "mean": round(sketch.mean, 4) if sketch.count else None,
+                    "std": round(math.sqrt(sketch.m2 / sketch.count), 4) if sketch.count else None,
+                    "reference_mean": reference.get("mean"),
+                    "reference_std": reference.get("std"),
+                    "psi": round(psi(sketch.expected, bins), 4) if sketch.expected and sum(bins) else None,
+                    "recent": sum(bins),
+                    "defaulted_rate": round((sketch.defaulted + sketch.previous_defaulted) / recent, 4) if recent else None,
+                }
+            sources = {}
+            for source, stats in self._sources.items():
+                documents, rates = stats.recent_rates()
+                sources[source] = {"documents": stats.total_documents, "recent": documents,
+                                   "missing_rate": {field: round(rate, 4) for field, rate in rates.items()}}
+            patients = self._patients
+        return {"patients": patients, "recent_patients": recent, "has_reference": self.reference is not None,
+                "features": features, "extraction": sources,
+                "alerts": [message for _, message in self._alerts(features, sources)]}
+
+    def _alerts(self, features, sources):
+        # (key, message); the key identifies the condition, so a persisting alert is logged once
+        alerts = []
+        for name, stats in features.items():
+            if stats["psi"] is not None and stats["recent"] >= self.min_count and stats["psi"] > self.psi_threshold:
+                alerts.append((("psi", name), f"{name}: PSI {stats['psi']:.2f} over the last {stats['recent']} values"))
+        for source, stats in sources.items():
+            if stats["recent"] < self.min_count:
+                continue
+            for field, rate in stats["missing_rate"].items():
+                if rate > self.missing_threshold:
+                    alerts.append((("missing", source, field),
+                                   f"{source}: {field} missing in {rate:.0%} of the last {stats['recent']} documents"))
+        return alerts
+
+    def alerts(self):
+        return self.snapshot()["alerts"]
+
+    def _log_alerts(self):
+        snapshot = self.snapshot()
+        alerts = self._alerts(snapshot["features"], snapshot["extraction"])
+        with self._lock:
+            logged, self._logged = self._logged, {key for key, _ in alerts}
+        for key, message in alerts:
+            if key not in logged:
+                logger.warning("Input drift: %s", message)
+
+    def collect(self):
+        """Gauges for MetricsRegistry.export_prometheus: (name, help, [(labels, value)])."""
+        snapshot = self.snapshot()
+        psi_samples = [({"feature": name}, stats["psi"]) for name, stats in snapshot["features"].items()
+                       if stats["psi"] is not None]
+        defaulted = [({"feature": name}, stats["defaulted_rate"]) for name, stats in snapshot["features"].items()
+                     if stats["defaulted_rate"] is not None]
+        missing = [({"source": source, "field": field}, rate) for source, stats in snapshot["extraction"].items()
+                   for field, rate in stats["missing_rate"].items()]
+        return [
+            ("triage_feature_psi", "Population stability index of recent inputs against the training data.", psi_samples),
+            ("triage_feature_defaulted_ratio", "Share of recent patients whose feature was missing and defaulted.", defaulted),
+            ("triage_extraction_missing_ratio", "Share of recent documents a parser returned without the field.", missing),
+        ]
+
+
+DRIFT = DriftMonitor()
+REGISTRY.register_collector(DRIFT.collect)
+use_reference = DRIFT.use_reference
+observe_batch = DRIFT.observe_batch
+observe_extraction = DRIFT.observe_extraction
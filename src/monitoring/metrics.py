@@ -0,0 +1,195 @@
+"""Process-wide latency histograms and counters, exportable in the Prometheus text format.
+
+Stages are timed with `timer("shap")` (context manager) or `@timed("ocr_page")`
+(decorator) into the `triage_stage_seconds{stage=...}` histogram, and `inc()` bumps
+labelled counters (cache hits, OCR pages, LLM outcomes). Collectors registered with
+`register_collector()` add gauges computed at export time (monitoring.drift). Recording costs two
+perf_counter calls, a bisect and a locked add, so it stays switched on in production.
+Process-pool workers have their own registry; the ingestion pipeline forwards their
+page timings to the parent.
+"""
+import bisect
+import threading
+import time
+from functools import wraps
+
+STAGE_METRIC = "triage_stage_seconds"
+# Upper bounds in seconds: sub-millisecond regex scans up to two-minute LLM generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+HELP = {
+    STAGE_METRIC: "Wall-clock seconds per call of a pipeline stage.",
+    "triage_cache_requests_total": "Cache lookups by cache and result.",
+    "triage_ocr_pages_total": "Pages sent through RapidOCR.",
+    "triage_llm_requests_total": "LLM generations by client and outcome.",
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram; the last slot counts observations above every bound (+Inf)."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate like PromQL's histogram_quantile: linear inside the bucket holding the q-th value."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / n
+            cumulative += n
+        return self.buckets[-1]
+
+
+class _Timer:
+    __slots__ = ("registry", "stage", "start")
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(STAGE_METRIC, time.perf_counter() - self.start, stage=self.stage)
+        return False
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and label set."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def register_collector(self, collect):
+        """`collect()` returns [(name, help, [(labels dict, value)])], exported as gauges."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def timer(self, stage):
+        """Context manager that records the block's duration, including when it raises."""
+        return _Timer(self, stage)
+
+    def timed(self, stage):
+        """Decorator form of `timer`."""
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(STAGE_METRIC, time.perf_counter() - start, stage=stage)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        """Per-stage call counts and latency estimates (ms) plus every counter, for dashboards."""
+        with self._lock:
+            histograms = [(key, h.count, h.sum, [h.quantile(q) for q in (0.5, 0.95, 0.99)])
+                          for key, h in self._histograms.items()]
+            counters = dict(self._counters)
+
+        stages = {}
+        for (name, labels), count, total, quantiles in sorted(histograms):
+            label = dict(labels).get("stage") if name == STAGE_METRIC else f"{name}{_format_labels(labels)}"
+            stages[label] = {
+                "count": count, "mean_ms": round(total / count * 1e3, 3),
+                **{key: round(value * 1e3, 3) for key, value in zip(("p50_ms", "p95_ms", "p99_ms"), quantiles)}
+            }
+        return {
+            "stages": stages,
+            "counters": {f"{name}{_format_labels(labels)}": value for (name, labels), value in sorted(counters.items())}
+        }
+
+    def export_prometheus(self):
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count)) for key, h in self._histograms.items())
+            collectors = list(self._collectors)
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), (counts, total, count) in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for collect in collectors:
+            for name, help_text, samples in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(_label_key(labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+REGISTRY = MetricsRegistry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+timed = REGISTRY.timed
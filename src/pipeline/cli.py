@@ -0,0 +1,288 @@
+"""Headless batch triage: documents or JSONL records in, board entries out as JSONL or Parquet.
+
+    python -m src.pipeline.cli records/ --output results.jsonl
+    python -m src.pipeline.cli backlog.jsonl --output results.parquet --no-llm
+    cat backlog.jsonl | python -m src.pipeline.cli - --no-store > results.jsonl
+
+A directory is scanned for PDFs/images (patient ID = file name without extension).
+JSONL lines may carry a document `path`, a `features` object, flat feature fields and/or
+free text (`raw_text`, `text`, `note` or `body`), which is run through the vitals
+extractor. IDs come from `patient_id`, `id` or `request_id`.
+
+A record that cannot be processed (malformed JSON line, missing or corrupt document,
+a value the model rejects) is logged with its line and patient ID and written as an
+`{"id", "error"}` entry; the run carries on with the rest of the backlog.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.ingestion.parsers import ADAPTIVE_OCR_DEFAULTS, EarlyStop, VITALS_HEADER_ROI
+from src.ingestion.pipeline import ExtractionError
+from src.ingestion.vitals import VitalsExtractor, DEFAULT_REQUIRED_FIELDS
+from src.pipeline.triage_pipeline import TriagePipeline, EXTRACTION_MODES, DEFAULT_SELECTED_FEATURES
+from src.monitoring.drift import DRIFT
+
+DOCUMENT_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff")
+ID_FIELDS = ("patient_id", "id", "request_id")
+TEXT_FIELDS = ("raw_text", "text", "note", "body")
+# triage_level: the label carried by rows from src/synthetic/generate.py
+IGNORED_FIELDS = ("title", "triage_level")
+# Board entry columns; nested values are stored as JSON strings in Parquet
+SCALAR_COLUMNS = ("id", "level", "trend", "news2", "news2_delta", "news2_risk", "shap", "bio_synthesis", "bio_action",
+                  "bio_department", "error")
+INT_COLUMNS = ("level", "news2", "news2_delta")
+NESTED_COLUMNS = ("features", "deltas")
+
+_extractor = VitalsExtractor()
+
+
+def _json_default(value):
+    # NumPy scalars coming out of the model/parsers
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def iter_directory(path):
+    """("document", patient_id, path, source) for every supported file, in name order."""
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith(DOCUMENT_EXTENSIONS):
+            yield "document", os.path.splitext(name)[0], os.path.join(path, name), name
+
+
+def parse_record(record, line_number, base_dir):
+    if not isinstance(record, dict):
+        raise ValueError(f"expected a JSON object, got {type(record).__name__}")
+    patient_id = next((str(record[f]) for f in ID_FIELDS if record.get(f) is not None), f"row-{line_number}")
+    if record.get("path"):
+        return "document", patient_id, os.path.join(base_dir, record["path"])
+
+    features = {}
+    text = next((record[f] for f in TEXT_FIELDS if record.get(f)), None)
+    if text is not None:
+        features.update(_extractor.extract(str(text)))
+    # Explicit fields win over anything read from the text
+    explicit = record.get("features") or {k: v for k, v in record.items() if k not in ID_FIELDS + TEXT_FIELDS + IGNORED_FIELDS}
+    if not isinstance(explicit, dict):
+        raise ValueError(f"record {line_number} ({patient_id}): \"features\" must be an object, "
+                         f"got {type(explicit).__name__}")
+    features.update(explicit)
+    return "features", patient_id, features
+
+
+def iter_jsonl(stream, base_dir):
+    """(kind, patient_id, payload, source) per non-empty line; a line that cannot be parsed is an "error" item."""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield (*parse_record(json.loads(line), line_number, base_dir), f"line {line_number}")
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError
+            yield "error", f"row-{line_number}", f"invalid record: {e}", f"line {line_number}"
+
+
+def iter_inputs(source):
+    if source == "-":
+        yield from iter_jsonl(sys.stdin, os.getcwd())
+    elif os.path.isdir(source):
+        yield from iter_directory(source)
+    else:
+        with open(source, encoding="utf-8") as stream:
+            yield from iter_jsonl(stream, os.path.dirname(os.path.abspath(source)))
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self._file = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+
+    def write(self, entries):
+        for entry in entries:
+            self._file.write(json.dumps(entry, default=_json_default) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class ParquetWriter:
+    """Appends one row group per batch, so memory stays flat however long the backlog is."""
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self.schema = pa.schema(
+            [(name, pa.int64() if name in INT_COLUMNS else pa.string()) for name in SCALAR_COLUMNS]
+            + [(name, pa.string()) for name in NESTED_COLUMNS]
+        )
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, entries):
+        columns = {name: [entry.get(name) for entry in entries] for name in SCALAR_COLUMNS}
+        for name in INT_COLUMNS:
+            columns[name] = [None if value is None else int(value) for value in columns[name]]
+        for name in NESTED_COLUMNS:
+            columns[name] = [json.dumps(entry.get(name), default=_json_default) for entry in entries]
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_writer(path, output_format=None):
+    output_format = output_format or ("parquet" if str(path).endswith(".parquet") else "jsonl")
+    return ParquetWriter(path) if output_format == "parquet" else JsonlWriter(path)
+
+
+def _error_entry(item, error, log):
+    _, patient_id, _, source = item
+    print(f"Skipped {source} ({patient_id}): {error}", file=log)
+    return {"id": patient_id, "error": f"{source}: {error}"}
+
+
+def _triage_isolated(pipeline, batch, patients, selected_features, log):
+    """{batch index: entry}; if the batch call fails, patients are retried one by one to isolate the bad ones."""
+    indices = list(patients)
+    try:
+        return dict(zip(indices, pipeline.triage([patients[i] for i in indices], selected_features)))
+    except Exception:
+        pass
+    entries = {}
+    for i in indices:
+        try:
+            entries[i] = pipeline.triage([patients[i]], selected_features)[0]
+        except Exception as e:
+            entries[i] = _error_entry(batch[i], f"{type(e).__name__}: {e}", log)
+    return entries
+
+
+def run(pipeline, items, writer, batch_size=256, mode=None, selected_features=None, log=sys.stderr):
+    """Triages `items` batch by batch, writing as it goes; returns (rows written, of which errors)."""
+    rows = errors = 0
+    started = time.perf_counter()
+    for batch in batched(items, batch_size):
+        entries = [None] * len(batch)
+        patients = {}
+        documents = [(i, item) for i, item in enumerate(batch) if item[0] == "document"]
+        for i, item in enumerate(batch):
+            if item[0] == "features":
+                patients[i] = (item[1], item[2])
+            elif item[0] == "error":
+                entries[i] = _error_entry(item, item[2], log)
+        if documents:
+            for doc_index, vitals in pipeline.extract([item[2] for _, item in documents], mode):
+                i, item = documents[doc_index]
+                if isinstance(vitals, ExtractionError):
+                    entries[i] = _error_entry(item, f"{type(vitals.cause).__name__}: {vitals.cause}", log)
+                else:
+                    patients[i] = (item[1], vitals)
+        if patients:
+            for i, entry in _triage_isolated(pipeline, batch, patients, selected_features, log).items():
+                entries[i] = entry
+
+        writer.write(entries)
+        rows += len(entries)
+        errors += sum("error" in entry for entry in entries)
+        elapsed = time.perf_counter() - started
+        print(f"{rows} rows in {elapsed:.1f}s ({rows / elapsed:.1f} rows/sec), {errors} errors", file=log)
+    return rows, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless batch triage (documents or JSONL -> JSONL/Parquet).")
+    parser.add_argument("input", help="Directory of PDFs/images, a .jsonl file, or - for JSONL on stdin")
+    parser.add_argument("--output", "-o", default="-", help="Output path (.jsonl or .parquet); - for stdout")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default=None, help="Overrides the output extension")
+    parser.add_argument("--mode", choices=EXTRACTION_MODES, default="hybrid", help="Document extraction engine")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction workers (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Patients per model/LLM batch")
+    parser.add_argument("--features", nargs="+", default=DEFAULT_SELECTED_FEATURES, help="Active risk features")
+    parser.add_argument("--early-stop", action="store_true",
+                        help="Stop reading a document once temp, SpO2, HR, BP and age are found")
+    parser.add_argument("--max-pages", type=int, default=None, help="Pages read per document at most")
+    parser.add_argument("--page-time-budget", type=float, default=None, help="Seconds of extraction per document at most")
+    parser.add_argument("--adaptive-ocr", action="store_true",
+                        help=f"Render scans at {ADAPTIVE_OCR_DEFAULTS['base_zoom']:g}x and re-render only small or "
+                             f"low-confidence lines at {ADAPTIVE_OCR_DEFAULTS['zoom']:g}x")
+    parser.add_argument("--vitals-roi", action="store_true", help="With --adaptive-ocr, only OCR the page header")
+    parser.add_argument("--ocr-batch", type=int, default=1,
+                        help="Scanned pages or image frames recognised together (reads slightly differently from 1)")
+    parser.add_argument("--ocr-threads", type=int, default=None, help="ONNX threads per OCR engine")
+    parser.add_argument("--no-llm", action="store_true", help="Skip the LLM stage (throughput runs)")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="Concurrent LLM generations")
+    parser.add_argument("--store", default=None, help="TriageStore path (default: the app's data/triage_store.sqlite)")
+    parser.add_argument("--no-store", action="store_true", help="Do not read history or write encounters/queue")
+    parser.add_argument("--extraction-cache", default="cache/extraction_cache.sqlite",
+                        help="Extraction cache shared with the app; empty string disables it")
+    parser.add_argument("--metrics", default=None,
+                        help="Write stage latencies and counters here in Prometheus text format when done")
+    args = parser.parse_args(argv)
+
+    from src.ingestion.cache import ExtractionCache
+    from src.storage.triage_store import TriageStore, DEFAULT_DB_PATH
+
+    store = None if args.no_store else TriageStore(args.store or DEFAULT_DB_PATH)
+    extraction_cache = ExtractionCache(path=args.extraction_cache) if args.extraction_cache else None
+    llm = None
+    if not args.no_llm:
+        from src.explainability.llm_cache import CachedBioMistralExplainer
+        from src.storage.cache import TieredCache
+        llm = CachedBioMistralExplainer(
+            cache=TieredCache(path="cache/llm_cache.sqlite", max_memory_items=1024, ttl=24 * 3600, name="llm"),
+            max_concurrency=args.llm_concurrency
+        )
+
+    early_stop = None
+    if args.early_stop or args.max_pages or args.page_time_budget:
+        early_stop = EarlyStop(required_fields=DEFAULT_REQUIRED_FIELDS if args.early_stop else (),
+                               max_pages=args.max_pages, time_budget=args.page_time_budget)
+    adaptive_ocr = None
+    if args.adaptive_ocr:
+        adaptive_ocr = {"roi": VITALS_HEADER_ROI} if args.vitals_roi else {}
+    pipeline = TriagePipeline(store=store, llm=llm, use_llm=not args.no_llm, selected_features=args.features,
+                              extraction_cache=extraction_cache, mode=args.mode, early_stop=early_stop,
+                              adaptive_ocr=adaptive_ocr, max_workers=args.workers,
+                              ocr_batch=args.ocr_batch, ocr_threads=args.ocr_threads)
+    writer = open_writer(args.output, args.format)
+    try:
+        rows, errors = run(pipeline, iter_inputs(args.input), writer, args.batch_size)
+    finally:
+        writer.close()
+        pipeline.close()
+        if llm is not None:
+            llm.close()
+        if store is not None:
+            store.close()
+
+    stats = pipeline.get_stats()
+    print(f"Done: {rows} rows, {errors} errors. Stage seconds: extract {stats['extract_seconds']:.2f}, ml {stats['ml_seconds']:.2f}, "
+          f"llm {stats['llm_seconds']:.2f}, store {stats['store_seconds']:.2f} ({stats['rows_per_sec']} rows/sec busy)",
+          file=sys.stderr)
+    for alert in DRIFT.alerts():
+        print(f"Input drift: {alert}", file=sys.stderr)
+    if args.metrics:
+        from src.monitoring.metrics import REGISTRY
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(REGISTRY.export_prometheus())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Async HTTP front end for TriagePipeline, for systems that submit patients programmatically.
+
+    python -m src.pipeline.server --port 8080 [--no-llm]
+
+    POST /triage             {"patients": [{"patient_id": "P1", "features": {...}}, ...]} or one patient object;
+                             422 if the model rejects a patient (e.g. an unknown arrival_mode)
+    POST /triage/document    raw PDF/image bytes; ?patient_id=P1&filename=scan.pdf[&mode=ocr]; 422 if unreadable
+    GET  /healthz            "warming" until the model, SHAP and OCR warm-up has finished, then "ok"
+    GET  /stats
+    GET  /metrics            Prometheus text format (stage latency histograms, cache/OCR/LLM counters,
+                             input-drift gauges)
+    GET  /drift              feature moments, PSI against the training data, missing rates per parser, alerts
+    GET  /alerts             ?vital=oxygen_saturation&fall=3&within=3600, ?rise=..., or ?news2=5
+    GET  /patients/{id}/vitals   latest vitals, per-hour slopes and NEWS2 from the longitudinal engine
+
+Patient objects take the same fields as the CLI's JSONL records (minus `path`).
+Concurrent requests are coalesced by a micro-batcher, so many small submissions still
+reach the model and the LLM as one batch; the blocking work runs on a thread pool. If a
+coalesced batch fails, its submissions are retried one by one so only the bad one fails.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.pipeline.cli import parse_record, _json_default
+from src.monitoring.metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+from src.monitoring.drift import DRIFT
+from src.runtime.warmup import WarmUp
+from src.ingestion.parsers import ADAPTIVE_OCR_DEFAULTS, EarlyStop, VITALS_HEADER_ROI
+from src.ingestion.pipeline import ExtractionError
+from src.ingestion.vitals import DEFAULT_REQUIRED_FIELDS
+from src.pipeline.triage_pipeline import TriagePipeline, EXTRACTION_MODES, as_upload
+
+
+class MicroBatcher:
+    """Collects submissions for up to `max_wait` seconds (or `batch_size` patients) per triage call."""
+    def __init__(self, pipeline, executor, batch_size=64, max_wait=0.02):
+        self.pipeline = pipeline
+        self.executor = executor
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, patients):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((patients, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            patients = [patient for submitted, _ in pending for patient in submitted]
+            try:
+                # One triage call at a time: it already fans out over the model batch and the LLM pool
+                entries = await loop.run_in_executor(self.executor, self.pipeline.triage, patients)
+            except Exception as e:
+                if len(pending) > 1:
+                    await self._triage_each(pending)
+                elif not pending[0][1].done():
+                    pending[0][1].set_exception(e)
+                continue
+            self.batches += 1
+            offset = 0
+            for submitted, future in pending:
+                if not future.done():
+                    future.set_result(entries[offset:offset + len(submitted)])
+                offset += len(submitted)
+
+    async def _triage_each(self, pending):
+        """Retries submissions one by one, so a bad record only fails the request that sent it."""
+        loop = asyncio.get_running_loop()
+        for submitted, future in pending:
+            if future.done():
+                continue
+            try:
+                entries = await loop.run_in_executor(self.executor, self.pipeline.triage, submitted)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            if not future.done():
+                future.set_result(entries)
+
+
+def _json_response(data, status=200):
+    return web.json_response(data, status=status, dumps=lambda d: json.dumps(d, default=_json_default))
+
+
+def _parse_patients(body):
+    records = body.get("patients", [body]) if isinstance(body, dict) else body
+    if not isinstance(records, list) or not records:
+        raise ValueError("Expected a patient object, a list of them, or {\"patients\": [...]}")
+    patients = []
+    for number, record in enumerate(records, 1):
+        if not isinstance(record, dict):
+            raise ValueError(f"Patient {number} is not an object")
+        if record.get("path"):
+            raise ValueError("Server-side paths are not accepted; POST the file to /triage/document")
+        _, patient_id, features = parse_record(record, number, os.getcwd())
+        patients.append((patient_id, features))
+    return patients
+
+
+async def triage(request):
+    try:
+        patients = _parse_patients(await request.json())
+    except ValueError as e:
+        return _json_response({"error": str(e)}, status=400)
+    return await _submit(request, patients)
+
+
+async def _submit(request, patients):
+    try:
+        entries = await request.app["batcher"].submit(patients)
+    except (ValueError, TypeError) as e:
+        # The record itself is at fault (e.g. an arrival_mode the model never saw), not the service
+        return _json_response({"error": f"Could not triage: {type(e).__name__}: {e}"}, status=422)
+    return _json_response({"results": entries})
+
+
+async def triage_document(request):
+    patient_id = request.query.get("patient_id")
+    if not patient_id:
+        return _json_response({"error": "patient_id query parameter is required"}, status=400)
+    mode = request.query.get("mode")
+    if mode is not None and mode not in EXTRACTION_MODES:
+        return _json_response({"error": f"mode must be one of {EXTRACTION_MODES}"}, status=400)
+    body = await request.read()
+    if not body:
+        return _json_response({"error": "Empty request body"}, status=400)
+
+    pipeline = request.app["pipeline"]
+    upload = as_upload(body, request.query.get("filename", "document.pdf"))
+    loop = asyncio.get_running_loop()
+    _, vitals = (await loop.run_in_executor(request.app["executor"], lambda: list(pipeline.extract([upload], mode))))[0]
+    if isinstance(vitals, ExtractionError):
+        # The upload itself is at fault (corrupt or unsupported file), not the service
+        return _json_response({"error": f"Could not extract the document: {type(vitals.cause).__name__}: {vitals.cause}"},
+                              status=422)
+    return await _submit(request, [(patient_id, vitals)])
+
+
+async def healthz(request):
+    warmup = request.app["warmup"]
+    return _json_response({"status": "ok" if warmup.ready else "warming", "warmup": warmup.status(),
+                           "uptime_seconds": round(time.time() - request.app["started_at"], 1)})
+
+
+async def stats(request):
+    data = request.app["pipeline"].get_stats()
+    data["batches"] = request.app["batcher"].batches
+    return _json_response(data)
+
+
+async def metrics(request):
+    return web.Response(body=REGISTRY.export_prometheus().encode(), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+
+async def drift(request):
+    return _json_response(DRIFT.snapshot())
+
+
+async def alerts(request):
+    """Cohort query over the longitudinal engine, e.g. everyone whose SpO2 fell >3 points in the last hour."""
+    longitudinal = request.app["pipeline"].longitudinal
+    query = request.query
+    try:
+        if "news2" in query:
+            hits = longitudinal.news2_at_least(int(query["news2"]))
+            return _json_response({"patients": [{"id": p_id, "news2": score} for p_id, score in hits]})
+        vital = query.get("vital", "oxygen_saturation")
+        if vital not in longitudinal.vitals:
+            raise ValueError(f"vital must be one of {longitudinal.vitals}")
+        within = float(query.get("within", 3600))
+        if "rise" in query:
+            hits = longitudinal.rising(vital, float(query["rise"]), within)
+        else:
+            hits = longitudinal.falling(vital, float(query.get("fall", 3)), within)
+    except ValueError as e:
+        return _json_response({"error": str(e)}, status=400)
+    return _json_response({"vital": vital, "within_seconds": within,
+                           "patients": [{"id": p_id, "change": change} for p_id, change in hits]})
+
+
+async def patient_vitals(request):
+    summary = request.app["pipeline"].longitudinal.summary(request.match_info["patient_id"])
+    if summary is None:
+        return _json_response({"error": "Unknown patient"}, status=404)
+    return _json_response(summary)
+
+
+def create_app(pipeline, workers=4, batch_size=64, max_wait=0.02):
+    app = web.Application(client_max_size=50 * 1024 * 1024)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    batcher = MicroBatcher(pipeline, executor, batch_size, max_wait)
+    app["pipeline"] = pipeline
+    app["executor"] = executor
+    app["batcher"] = batcher
+    app["warmup"] = WarmUp(pipeline.warmup_steps(ocr=pipeline.mode == "hybrid"))
+    app["started_at"] = time.time()
+
+    async def on_startup(app):
+        batcher.start()
+        app["warmup"].start()
+
+    async def on_cleanup(app):
+        await batcher.stop()
+        executor.shutdown(wait=True)
+        pipeline.close()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/triage", triage)
+    app.router.add_post("/triage/document", triage_document)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/stats", stats)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/drift", drift)
+    app.router.add_get("/alerts", alerts)
+    app.router.add_get("/patients/{patient_id}/vitals", patient_vitals)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Async HTTP triage service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="Threads for extraction and triage calls")
+    parser.add_argument("--batch-size", type=int, default=64, help="Max patients per coalesced triage call")
+    parser.add_argument("--max-wait-ms", type=float, default=20, help="How long a submission waits for company")
+    parser.add_argument("--mode", choices=EXTRACTION_MODES, default="hybrid", help="Default document extraction engine")
+    parser.add_argument("--early-stop", action="store_true",
+                        help="Stop reading a document once temp, SpO2, HR, BP and age are found")
+    parser.add_argument("--max-pages", type=int, default=None, help="Pages read per document at most")
+    parser.add_argument("--page-time-budget", type=float, default=None, help="Seconds of extraction per document at most")
+    parser.add_argument("--adaptive-ocr", action="store_true",
+                        help=f"Render scans at {ADAPTIVE_OCR_DEFAULTS['base_zoom']:g}x and re-render only small or "
+                             f"low-confidence lines at {ADAPTIVE_OCR_DEFAULTS['zoom']:g}x")
+    parser.add_argument("--vitals-roi", action="store_true", help="With --adaptive-ocr, only OCR the page header")
+    parser.add_argument("--ocr-batch", type=int, default=1,
+                        help="Scanned pages or image frames recognised together (reads slightly differently from 1)")
+    parser.add_argument("--ocr-threads", type=int, default=None, help="ONNX threads per OCR engine")
+    parser.add_argument("--no-llm", action="store_true", help="Skip the LLM stage (throughput runs)")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="Concurrent LLM generations")
+    parser.add_argument("--store", default=None, help="TriageStore path (default: the app's data/triage_store.sqlite)")
+    parser.add_argument("--no-store", action="store_true", help="Do not read history or write encounters/queue")
+    args = parser.parse_args(argv)
+
+    from src.ingestion.cache import ExtractionCache
+    from src.storage.triage_store import TriageStore, DEFAULT_DB_PATH
+
+    store = None if args.no_store else TriageStore(args.store or DEFAULT_DB_PATH)
+    llm = None
+    if not args.no_llm:
+        from src.explainability.llm_cache import CachedBioMistralExplainer
+        from src.storage.cache import TieredCache
+        llm = CachedBioMistralExplainer(
+            cache=TieredCache(path="cache/llm_cache.sqlite", max_memory_items=1024, ttl=24 * 3600, name="llm"),
+            max_concurrency=args.llm_concurrency
+        )
+
+    early_stop = None
+    if args.early_stop or args.max_pages or args.page_time_budget:
+        early_stop = EarlyStop(required_fields=DEFAULT_REQUIRED_FIELDS if args.early_stop else (),
+                               max_pages=args.max_pages, time_budget=args.page_time_budget)
+    adaptive_ocr = None
+    if args.adaptive_ocr:
+        adaptive_ocr = {"roi": VITALS_HEADER_ROI} if args.vitals_roi else {}
+    pipeline = TriagePipeline(store=store, llm=llm, use_llm=not args.no_llm, mode=args.mode,
+                              early_stop=early_stop, adaptive_ocr=adaptive_ocr,
+                              ocr_batch=args.ocr_batch, ocr_threads=args.ocr_threads,
+                              extraction_cache=ExtractionCache(path="cache/extraction_cache.sqlite"),
+                              max_workers=args.workers)
+    web.run_app(create_app(pipeline, args.workers, args.batch_size, args.max_wait_ms / 1000),
+                host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
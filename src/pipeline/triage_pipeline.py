@@ -0,0 +1,303 @@
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.ingestion.parsers import DigitalPDFParser, HybridClinicalParser, pymupdf
+from src.ingestion.pipeline import ParallelIngestionPipeline, ExtractionError
+from src.ingestion.cache import CachedParser
+from src.explainability.explain import explain_batch
+from src.triage_engine.bundle import resolve_model
+from src.triage_engine.longitudinal import LongitudinalVitals
+from src.monitoring import drift
+from src.runtime.lazy import load
+
+logger = logging.getLogger(__name__)
+
+# Defaults for fields the document parsers cannot extract
+FEATURE_DEFAULTS = {'pain_level': 5, 'arrival_mode': 'walk_in', 'chronic_disease_count': 0, 'previous_er_visits': 0}
+DEFAULT_SELECTED_FEATURES = ['age', 'body_temperature', 'oxygen_saturation', 'heart_rate', 'pain_level', 'chronic_disease_count']
+# Board fields when the LLM stage is switched off (throughput runs)
+LLM_DISABLED_RESULT = {"short_synthesis": "N/A", "recommended_action": "N/A", "department_routing": "N/A"}
+EXTRACTION_MODES = ("hybrid", "digital", "ocr")
+
+
+def fill_defaults(features):
+    filled = dict(features)
+    for name, value in FEATURE_DEFAULTS.items():
+        filled.setdefault(name, value)
+    return filled
+
+
+def shap_summary(top_factors):
+    return ", ".join([f"{f['feature']} ({f['direction']})" for f in top_factors])
+
+
+def as_upload(document, name=None):
+    """Parser input (BytesIO with a .name) from an upload, raw bytes or a filesystem path."""
+    if hasattr(document, "getvalue"):
+        return document
+    if isinstance(document, (bytes, bytearray)):
+        upload = io.BytesIO(bytes(document))
+        upload.name = name or "document.pdf"
+        return upload
+    with open(document, 'rb') as f:
+        upload = io.BytesIO(f.read())
+    upload.name = name or os.path.basename(str(document))
+    return upload
+
+
+class TriagePipeline:
+    """Parse -> default-fill -> ML risk + SHAP -> LLM -> trend deltas -> queue upsert, without Streamlit.
+
+    The Streamlit app, the batch CLI (src/pipeline/cli.py) and the HTTP service
+    (src/pipeline/server.py) all run patients through this class. `store` (TriageStore)
+    and `queue` (TriageQueue) are optional; without a store every patient is treated as
+    a first visit and nothing is persisted. Trends, deltas and NEWS2 come from `longitudinal`
+    (LongitudinalVitals), an in-memory ring of each patient's recent vitals seeded from the
+    store on first sight, so no history is read back per encounter. Extracted documents and
+    incoming features are recorded in the process-wide drift monitor (monitoring.drift)
+    before defaults are filled in. With `use_llm=False` the LLM stage is skipped
+    and the board fields read "N/A". `early_stop` (parsers.EarlyStop) lets hybrid/OCR
+    extraction stop reading a document once its vitals are in, and `adaptive_ocr`
+    (AdaptiveOCRParser options) renders scans at low resolution first. `ocr_batch` pages are
+    recognised together (OCRImageParser batch_pages) and `ocr_threads` sets RapidOCR's
+    ONNX threads per engine. Stage timings and
+    rows/sec accumulate in `stats`. `warmup_steps()` feeds runtime.warmup.WarmUp, so
+    models and OCR can load in the background before the first patient arrives.
+    """
+    def __init__(self, store=None, queue=None, llm=None, use_llm=True, selected_features=None,
+                 extraction_cache=None, mode="hybrid", max_workers=None, early_stop=None, adaptive_ocr=None,
+                 longitudinal=None, ocr_batch=1, ocr_threads=None):
+        if mode not in EXTRACTION_MODES:
+            raise ValueError(f"mode must be one of {EXTRACTION_MODES}, got {mode!r}")
+        self.store = store
+        self.queue = queue
+        self.use_llm = use_llm
+        self.selected_features = list(selected_features or DEFAULT_SELECTED_FEATURES)
+        self.extraction_cache = extraction_cache
+        self.mode = mode
+        self.early_stop = early_stop
+        self.adaptive_ocr = adaptive_ocr
+        self.ocr_batch = ocr_batch
+        self.ocr_threads = ocr_threads
+        self.longitudinal = longitudinal if longitudinal is not None else LongitudinalVitals(store=store)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._llm = llm
+        self._ingestion = {}
+        self._parsers = {}
+        self._lock = threading.Lock()
+        self.stats = {"rows": 0, "documents": 0, "extract_seconds": 0.0, "ml_seconds": 0.0,
+                      "llm_seconds": 0.0, "store_seconds": 0.0}
+
+    @property
+    def llm(self):
+        with self._lock:
+            if self._llm is None:
+                from src.explainability.llm_cache import CachedBioMistralExplainer
+                self._llm = CachedBioMistralExplainer()
+            return self._llm
+
+    def _add_stats(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                self.stats[name] += value
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        busy = stats["extract_seconds"] + stats["ml_seconds"] + stats["llm_seconds"] + stats["store_seconds"]
+        stats["rows_per_sec"] = round(stats["rows"] / busy, 2) if busy else None
+        return stats
+
+    # --- Extraction ---
+
+    def _parallel_ingestion(self, mode):
+        # One pool per mode for the pipeline's lifetime; each worker warms RapidOCR once
+        with self._lock:
+            if mode not in self._ingestion:
+                self._ingestion[mode] = ParallelIngestionPipeline(
+                    mode=mode, max_workers=self.max_workers, cache=self.extraction_cache, early_stop=self.early_stop,
+                    adaptive_ocr=self.adaptive_ocr, batch_pages=self.ocr_batch, ocr_threads=self.ocr_threads or 1
+                )
+            return self._ingestion[mode]
+
+    def _document_parser(self, mode):
+        # Kept for the pipeline's lifetime, so RapidOCR is built (or warmed up) once, not per batch
+        with self._lock:
+            if mode not in self._parsers:
+                if mode == "hybrid":
+                    engine_kwargs = {"intra_op_num_threads": self.ocr_threads} if self.ocr_threads else {}
+                    parser = HybridClinicalParser(early_stop=self.early_stop, adaptive_ocr=self.adaptive_ocr,
+                                                  batch_pages=self.ocr_batch, **engine_kwargs)
+                else:
+                    parser = DigitalPDFParser()
+                if self.extraction_cache is not None:
+                    parser = CachedParser(parser, self.extraction_cache)
+                self._parsers[mode] = parser
+            return self._parsers[mode]
+
+    def extract(self, documents, mode=None):
+        """Yields (index, vitals) for documents (uploads, bytes or paths) in input order.
+
+        "ocr" fans pages out over the process pool; "hybrid" and "digital" run whole
+        documents on a thread pool (MuPDF and RapidOCR release the GIL). A document that
+        cannot be read (missing file, corrupt PDF) yields an ExtractionError in place of
+        its vitals, and the others are still extracted.
+        """
+        mode = mode or self.mode
+        documents = list(documents)
+        start = time.perf_counter()
+        if mode == "ocr":
+            # Paths are read by the pool itself, so an unreadable one fails only its own document
+            results = self._parallel_ingestion(mode).run(documents)
+        else:
+            # OCR only loads in hybrid mode if some page actually lacks a text layer
+            parser = self._document_parser(mode)
+
+            def read(item):
+                index, document = item
+                try:
+                    return parser.extract_from_file(as_upload(document))
+                except Exception as e:
+                    error = ExtractionError(index, e)
+                    logger.warning("Extraction failed: %s", error)
+                    return error
+
+            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            results = enumerate(pool.map(read, enumerate(documents)))
+        try:
+            for index, vitals in results:
+                if not isinstance(vitals, ExtractionError):
+                    drift.observe_extraction(mode, vitals)
+                yield index, vitals
+        finally:
+            if mode != "ocr":
+                pool.shutdown(cancel_futures=True)
+        self._add_stats(documents=len(documents), extract_seconds=time.perf_counter() - start)
+
+    # --- Triage ---
+
+    def _explain_llm(self, levels, shap_strings, features, on_llm_field):
+        if not self.use_llm:
+            return [dict(LLM_DISABLED_RESULT) for _ in levels]
+        llm_requests = [
+            (level, shap_str, f.get('raw_text', 'No clinical context.'))
+            for level, shap_str, f in zip(levels, shap_strings, features)
+        ]
+        bios = [None] * len(llm_requests)
+        # Requests run concurrently; each answer is handed out as soon as it streams in
+        for event in self.llm.iter_explanations(llm_requests):
+            if event[0] == "field":
+                if on_llm_field is not None:
+                    on_llm_field(*event[1:])
+            else:
+                bios[event[1]] = event[2]
+        return bios
+
+    def triage(self, patients, selected_features=None, on_llm_field=None):
+        """Triages (patient_id, features) pairs and returns their board entries in input order.
+
+        `on_llm_field(index, name, value)` receives LLM answers while they stream.
+        """
+        patients = list(patients)
+        if not patients:
+            return []
+        selected = selected_features or self.selected_features
+        ids = [patient_id for patient_id, _ in patients]
+        features = [fill_defaults(f) for _, f in patients]
+
+        # 1. ML risk level and SHAP drivers: one predict + one SHAP call per class for the batch
+        start = time.perf_counter()
+        ai_results = explain_batch(features, selected)
+        levels = [result.get('triage_level', 0) for result in ai_results]
+        shap_strings = [shap_summary(result.get('top_factors', [])) for result in ai_results]
+        ml_done = time.perf_counter()
+
+        # Sketch what arrived (before the defaults hid missing fields) only once the model accepted
+        # the batch, so a rejected batch retried patient by patient is never counted twice
+        drift.use_reference(resolve_model().reference)
+        drift.observe_batch([f for _, f in patients])
+
+        # 2. All 3 LLM outputs per patient (Delimiter Trick)
+        bios = self._explain_llm(levels, shap_strings, features, on_llm_field)
+        llm_done = time.perf_counter()
+
+        # 3. Longitudinal history and queue upsert
+        entries = []
+        for p_id, f, level, shap_str, bio in zip(ids, features, levels, shap_strings, bios):
+            recorded_at = time.time()
+            vitals = self.longitudinal.observe(p_id, f, recorded_at)
+            if self.store is not None:
+                self.store.add_encounter(p_id, f, level, recorded_at)
+
+            entry = {
+                "id": p_id, "level": level, "trend": vitals["trend"],
+                "features": f, "shap": shap_str, "deltas": vitals["deltas"],
+                "news2": vitals["news2"], "news2_delta": vitals["news2_delta"], "news2_risk": vitals["news2_risk"],
+                "bio_synthesis": bio.get('short_synthesis', 'N/A'),
+                "bio_action": bio.get('recommended_action', 'N/A'),
+                "bio_department": bio.get('department_routing', 'N/A')
+            }
+            if self.store is not None:
+                self.store.upsert_queue_entry(entry)
+            if self.queue is not None:
+                self.queue.upsert(entry)
+            entries.append(entry)
+
+        self._add_stats(rows=len(entries), ml_seconds=ml_done - start, llm_seconds=llm_done - ml_done,
+                        store_seconds=time.perf_counter() - llm_done)
+        return entries
+
+    def triage_documents(self, documents, patient_ids, mode=None, selected_features=None,
+                         on_extracted=None, on_llm_field=None):
+        """Extracts every document, then triages them as one batch. IDs pair with documents by position.
+
+        Documents that could not be read are left out of the batch; `on_extracted` still
+        receives their ExtractionError.
+        """
+        patients = []
+        for index, vitals in self.extract(documents, mode):
+            if on_extracted is not None:
+                on_extracted(index, vitals)
+            if isinstance(vitals, ExtractionError):
+                continue
+            patients.append((patient_ids[index], vitals))
+        return self.triage(patients, selected_features, on_llm_field)
+
+    # --- Warm-up ---
+
+    def _warm_model(self):
+        artifacts = resolve_model()
+        if artifacts.forest is None:
+            # Loose pickles: no compiled forest, so unpickle the sklearn model and encoder now
+            artifacts.model
+            artifacts.encoder
+
+    def _warm_ocr(self):
+        parser = self._document_parser("hybrid")
+        getattr(parser, "parser", parser).ocr.warm_up()
+
+    def warmup_steps(self, ocr=False):
+        """(name, callable) pairs that load what the first triage would otherwise wait for.
+
+        "model" opens the active bundle, "shap" imports shap and builds the per-class
+        explainers, "documents" imports MuPDF and, with `ocr`, "ocr" builds and warms the
+        in-process RapidOCR session used by hybrid extraction. ("ocr" mode runs in the
+        process pool, whose workers warm themselves when it starts.)
+        """
+        steps = [
+            ("model", self._warm_model),
+            ("shap", lambda: resolve_model().shap_engine.warm_up()),
+            ("documents", lambda: load(pymupdf)),
+        ]
+        if ocr:
+            steps.append(("ocr", self._warm_ocr))
+        return steps
+
+    def close(self):
+        for ingestion in self._ingestion.values():
+            ingestion.close()
+        self._ingestion.clear()
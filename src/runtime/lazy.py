@@ -0,0 +1,38 @@
+import importlib
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    `pymupdf = lazy_import("pymupdf")` at module level keeps the import off the startup
+    path; `pymupdf.open(...)` later imports it (thread-safe, via the import lock) and
+    caches each attribute it hands out, so repeat lookups cost a dict hit.
+    """
+    def __init__(self, name):
+        self.__dict__["_lazy_name"] = name
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(self._lazy_name)
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        value = getattr(self._load(), attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module {self._lazy_name!r} ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def load(*modules):
+    """Imports lazy modules now (warm-up threads); plain modules pass through."""
+    return [module._load() if isinstance(module, LazyModule) else module for module in modules]
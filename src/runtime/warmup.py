@@ -0,0 +1,57 @@
+import threading
+import time
+
+
+class WarmUp:
+    """Runs named loading steps on one background thread and reports their progress.
+
+    Steps run in order. A step that raises is marked "failed" and the rest still run,
+    so a missing OCR model never holds back the SHAP explainers. `start()` is
+    idempotent: the Streamlit script calls it on every rerun, after the page has
+    rendered, and only the first call spawns the thread.
+    """
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self._status = {name: {"state": "pending", "seconds": None, "error": None} for name, _ in self.steps}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._done = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+                self._thread.start()
+        return self
+
+    def _set(self, name, **values):
+        with self._lock:
+            self._status[name].update(values)
+
+    def _run(self):
+        for name, step in self.steps:
+            self._set(name, state="running")
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                self._set(name, state="failed", error=f"{type(e).__name__}: {e}")
+            else:
+                self._set(name, state="done")
+            self._set(name, seconds=round(time.perf_counter() - start, 3))
+        self._done.set()
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def status(self):
+        with self._lock:
+            return {name: dict(status) for name, status in self._status.items()}
@@ -0,0 +1,147 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from src.monitoring.metrics import inc
+
+
+class TieredCache:
+    """Two-tier key/value cache: an in-memory LRU in front of an optional SQLite file.
+
+    The memory tier is bounded by entry count and the disk tier by total payload bytes;
+    when the disk tier overflows, the least recently used rows are deleted first.
+    With `ttl` (seconds) set, entries older than that are treated as misses and dropped.
+    Values are pickled on their way to disk, so anything picklable can be stored. The
+    disk tier's byte total is kept in memory and only re-summed once it passes the limit.
+    A `name` also reports hits and misses as `triage_cache_requests_total{cache=name}`.
+    """
+    def __init__(self, path=None, max_memory_items=256, max_disk_bytes=256 * 1024 * 1024, ttl=None, name=None):
+        self.path = path
+        self.name = name
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+        self._conn = None
+        self._disk_bytes = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL, created REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(cache)")]
+            if "created" not in columns:
+                # Files written before TTL support; their rows count as created at load time
+                self._conn.execute(f"ALTER TABLE cache ADD COLUMN created REAL NOT NULL DEFAULT {time.time()}")
+            self._disk_bytes = self._stored_bytes()
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key, default=None):
+        with self._lock:
+            now = time.time()
+            if key in self._memory:
+                created, value = self._memory[key]
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    self._count("hit")
+                    return value
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute("SELECT value, created, size FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and self._expired(row[1], now):
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self._disk_bytes -= row[2]
+                    self._stats["expired"] += 1
+                elif row is not None:
+                    self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+                    value = pickle.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self._stats["disk_hits"] += 1
+                    self._count("hit")
+                    return value
+
+            self._stats["misses"] += 1
+            self._count("miss")
+            return default
+
+    def _count(self, result):
+        if self.name is not None:
+            inc("triage_cache_requests_total", cache=self.name, result=result)
+
+    def set(self, key, value):
+        with self._lock:
+            now = time.time()
+            self._remember(key, value, now)
+            self._stats["stores"] += 1
+            if self._conn is None:
+                return
+
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            replaced = self._conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, accessed, created) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now)
+            )
+            self._disk_bytes += len(blob) - (replaced[0] if replaced else 0)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _stored_bytes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def _evict_disk(self):
+        # Other processes may share the file, so trust the table over the running total here
+        total = self._disk_bytes = self._stored_bytes()
+        if total <= self.max_disk_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM cache ORDER BY accessed").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", doomed)
+        self._disk_bytes = total
+        self._stats["evictions"] += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM cache")
+                self._disk_bytes = 0
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            stats["memory_items"] = len(self._memory)
+            if self._conn is not None:
+                stats["disk_items"] = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            return stats
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,161 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_DB_PATH = "data/triage_store.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS encounters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    triage_level INTEGER NOT NULL,
+    features TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS encounters_patient_time ON encounters (patient_id, recorded_at);
+CREATE INDEX IF NOT EXISTS encounters_time ON encounters (recorded_at);
+
+CREATE TABLE IF NOT EXISTS triage_queue (
+    patient_id TEXT PRIMARY KEY,
+    level INTEGER NOT NULL,
+    worsening INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS triage_queue_priority ON triage_queue (level DESC, worsening DESC, seq);
+"""
+
+
+def _json_default(value):
+    # NumPy scalars coming out of the model/parsers
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default)
+
+
+class TriageStore:
+    """SQLite (WAL) store for encounter history and the live triage queue.
+
+    Encounters are indexed by (patient_id, recorded_at) for longitudinal lookups, and the
+    queue has a (level, worsening) priority index so the board reads its top rows
+    straight from the index instead of sorting everything on each render. Ties keep
+    the board's old order: earlier upserts first.
+    """
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # Tie-break counter for the queue; seeded once instead of a MAX(seq) scan per upsert
+        self._seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM triage_queue").fetchone()[0]
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # --- Encounter history ---
+
+    def add_encounter(self, patient_id, features, triage_level, recorded_at=None):
+        recorded_at = time.time() if recorded_at is None else recorded_at
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO encounters (patient_id, recorded_at, triage_level, features) VALUES (?, ?, ?, ?)",
+                (patient_id, recorded_at, int(triage_level), _dumps(features))
+            )
+
+    @staticmethod
+    def _encounter(row):
+        return {"recorded_at": row[0], "triage_level": row[1], "features": json.loads(row[2])}
+
+    def last_encounter(self, patient_id):
+        """Most recent encounter for the delta/trend computation, or None for a new patient."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT recorded_at, triage_level, features FROM encounters "
+                "WHERE patient_id = ? ORDER BY recorded_at DESC, id DESC LIMIT 1",
+                (patient_id,)
+            ).fetchone()
+        return self._encounter(row) if row is not None else None
+
+    def history(self, patient_id, since=None, limit=None):
+        """Encounters for one patient, oldest first, optionally bounded by time or count (latest kept)."""
+        query = "SELECT recorded_at, triage_level, features FROM encounters WHERE patient_id = ?"
+        params = [patient_id]
+        if since is not None:
+            query += " AND recorded_at >= ?"
+            params.append(since)
+        query += " ORDER BY recorded_at DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._encounter(row) for row in reversed(rows)]
+
+    def encounter_count(self, since=None):
+        with self._lock:
+            if since is None:
+                return self._conn.execute("SELECT COUNT(*) FROM encounters").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM encounters WHERE recorded_at >= ?", (since,)).fetchone()[0]
+
+    # --- Live triage queue ---
+
+    def upsert_queue_entry(self, entry):
+        """Inserts or replaces a patient's board entry; a re-triaged patient moves behind its ties."""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._conn.execute(
+                "INSERT INTO triage_queue (patient_id, level, worsening, seq, updated_at, entry) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(patient_id) DO UPDATE SET level = excluded.level, worsening = excluded.worsening, "
+                "seq = excluded.seq, updated_at = excluded.updated_at, entry = excluded.entry",
+                (entry["id"], int(entry["level"]), 1 if entry["trend"] == "worsening" else 0,
+                 seq, time.time(), _dumps(entry))
+            )
+
+    def remove_from_queue(self, patient_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM triage_queue WHERE patient_id = ?", (patient_id,))
+
+    def top_queue(self, limit=50, offset=0):
+        """Highest-priority entries (level, then worsening trend) read in index order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry FROM triage_queue ORDER BY level DESC, worsening DESC, seq LIMIT ? OFFSET ?",
+                (limit if limit is not None else -1, offset)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def queue_entries(self):
+        """Every queued entry in upsert order (used to rebuild in-memory structures at startup)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT entry FROM triage_queue ORDER BY seq").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def queue_size(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM triage_queue").fetchone()[0]
+
+    def changed_externally(self):
+        """True if another connection (batch CLI, HTTP service) committed since the last call."""
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return False
+            self._data_version = version
+            # Keep new upserts behind the other writer's ties
+            self._seq = max(self._seq, self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM triage_queue").fetchone()[0])
+            return True
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
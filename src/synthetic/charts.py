@@ -0,0 +1,71 @@
+"""Referral "charts" for synthetic rows: page texts with the vitals header, as digital or scanned PDFs or PNGs."""
+from src.runtime.lazy import lazy_import
+
+pymupdf = lazy_import("pymupdf")
+
+FILLER = [
+    "Patient was seen and examined at the bedside.", "No acute distress noted overnight.",
+    "Tolerating oral intake, ambulating with assistance.", "Family updated on plan of care.",
+    "Medications reconciled with pharmacy.", "Wound dressing clean, dry and intact.",
+]
+CHRONIC = ["hypertension", "asthma", "diabetes", "COPD", "heart failure"]
+
+
+def row_truth(row):
+    """Values the extractor should read back from a referral written for `row`."""
+    return {
+        'age': int(round(row['age'])),
+        'body_temperature': round(float(row['body_temperature']), 1),
+        'heart_rate': int(round(row['heart_rate'])),
+        'systolic_blood_pressure': int(round(row['systolic_blood_pressure'])),
+        'oxygen_saturation': int(round(row['oxygen_saturation'])),
+    }
+
+
+def referral_pages(row, rng, pages=1, lines_per_page=30):
+    """Page texts for one referral: vitals header on page 1, narrative everywhere else."""
+    truth = row_truth(row)
+    history = rng.sample(CHRONIC, min(int(row.get('chronic_disease_count', 0)), len(CHRONIC)))
+    header = [
+        "ED TRIAGE NOTE",
+        f"Patient is a {truth['age']} year old arriving by {str(row.get('arrival_mode', 'walk_in')).replace('_', ' ')}.",
+        f"Temp: {truth['body_temperature']}",
+        f"HR {truth['heart_rate']} bpm",
+        f"BP: {truth['systolic_blood_pressure']}/{rng.randint(55, 110)}",
+        f"SpO2 {truth['oxygen_saturation']}%",
+        f"History of {', '.join(history)}." if history else "No significant past medical history.",
+    ]
+    texts = []
+    for number in range(pages):
+        lines = header if number == 0 else []
+        lines = lines + [rng.choice(FILLER) for _ in range(lines_per_page - len(lines))]
+        texts.append("\n".join(lines))
+    return texts
+
+
+def digital_pdf(page_texts):
+    doc = pymupdf.open()
+    for text in page_texts:
+        doc.new_page().insert_text((72, 72), text, fontsize=10)
+    return doc.tobytes()
+
+
+def scanned_pdf(page_texts, zoom=1.5):
+    """Image-only PDF: every page is rasterised (zoom 1.5 ~ a 108 dpi scan) and re-embedded."""
+    scanned = pymupdf.open()
+    for text in page_texts:
+        source = pymupdf.open()
+        page = source.new_page()
+        page.insert_text((72, 72), text, fontsize=10)
+        pix = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom))
+        target = scanned.new_page(width=page.rect.width, height=page.rect.height)
+        target.insert_image(target.rect, stream=pix.tobytes("png"))
+    return scanned.tobytes()
+
+
+def png_chart(page_texts, zoom=1.5):
+    """First page as a PNG, like a photographed or faxed intake form."""
+    doc = pymupdf.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), page_texts[0], fontsize=10)
+    return page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom)).tobytes("png")
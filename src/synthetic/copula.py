@@ -0,0 +1,163 @@
+"""Gaussian-copula model of the triage table, fitted once and sampled at any scale.
+
+Every column gets its own marginal: continuous vitals keep a quantile grid of the
+training values, while integer scores with few levels and categoricals (pain level,
+chronic disease count, arrival mode) keep their exact frequencies. Rows are mapped to
+normal scores, and the correlation of those scores ties the columns together. With
+`by="triage_level"` one copula is fitted per level, so each level keeps its own vitals
+profile (hypoxic, tachycardic level 3s) and the level frequencies are reproduced.
+Sampling is a Cholesky product and vectorised inverse CDFs: millions of rows per
+second before formatting.
+"""
+import json
+
+import numpy as np
+from scipy.special import ndtr, ndtri
+
+COPULA_FORMAT = 1
+# Integer columns with at most this many levels get an exact frequency table
+MAX_DISCRETE_LEVELS = 32
+QUANTILE_GRID = 1001
+
+
+def _decimals(values, max_decimals=4):
+    """Fewest decimals that reproduce every value (37.12 -> 2), so samples look like the source."""
+    for decimals in range(max_decimals + 1):
+        if np.allclose(np.round(values, decimals), values, rtol=0, atol=1e-9):
+            return decimals
+    return max_decimals
+
+
+class _Marginal:
+    """One column's distribution: a quantile grid ("continuous") or a frequency table ("discrete")."""
+    def __init__(self, kind, values, probs, decimals=None, dtype="float"):
+        self.kind = kind
+        self.values = values
+        self.probs = np.asarray(probs, dtype=np.float64)
+        self.decimals = decimals
+        self.dtype = dtype
+        if kind == "discrete":
+            self.edges = np.concatenate([[0.0], np.cumsum(self.probs)])
+            self.edges[-1] = 1.0
+
+    @classmethod
+    def fit(cls, column):
+        values = np.asarray(column)
+        if values.dtype.kind in "OUSb" or (values.dtype.kind in "iu" and len(np.unique(values)) <= MAX_DISCRETE_LEVELS):
+            levels, counts = np.unique(values, return_counts=True)
+            dtype = "int" if values.dtype.kind in "iu" else "str"
+            return cls("discrete", levels.tolist(), counts / counts.sum(), dtype=dtype)
+        dtype = "int" if values.dtype.kind in "iu" else "float"
+        values = values.astype(np.float64)
+        grid = np.quantile(values, np.linspace(0.0, 1.0, QUANTILE_GRID))
+        return cls("continuous", grid, np.linspace(0.0, 1.0, QUANTILE_GRID), decimals=_decimals(values), dtype=dtype)
+
+    def to_uniform(self, column, rng):
+        """Training values -> (0, 1). Discrete levels are spread uniformly over their probability band."""
+        if self.kind == "discrete":
+            index = np.searchsorted(np.asarray(self.values), np.asarray(column))
+            return self.edges[index] + rng.random(len(index)) * (self.edges[index + 1] - self.edges[index])
+        ranks = np.empty(len(column))
+        ranks[np.argsort(np.asarray(column), kind="stable")] = np.arange(1, len(column) + 1)
+        return ranks / (len(column) + 1)
+
+    def from_uniform(self, u):
+        if self.kind == "discrete":
+            index = np.minimum(np.searchsorted(self.edges, u, side="right") - 1, len(self.values) - 1)
+            return np.asarray(self.values)[index]
+        samples = np.interp(u, self.probs, self.values)
+        if self.dtype == "int":
+            return np.round(samples).astype(np.int64)
+        return np.round(samples, self.decimals)
+
+    def to_dict(self):
+        values = self.values if self.kind == "discrete" else np.asarray(self.values).tolist()
+        return {"kind": self.kind, "values": values, "probs": self.probs.tolist(),
+                "decimals": self.decimals, "dtype": self.dtype}
+
+    @classmethod
+    def from_dict(cls, data):
+        values = data["values"] if data["kind"] == "discrete" else np.asarray(data["values"], dtype=np.float64)
+        return cls(data["kind"], values, data["probs"], data["decimals"], data["dtype"])
+
+
+def _nearest_correlation(z):
+    corr = np.corrcoef(z, rowvar=False)
+    corr = np.nan_to_num(corr, nan=0.0)
+    np.fill_diagonal(corr, 1.0)
+    # Clip negative eigenvalues (constant or perfectly collinear columns) so Cholesky succeeds
+    eigvals, eigvecs = np.linalg.eigh(corr)
+    corr = eigvecs @ np.diag(np.clip(eigvals, 1e-6, None)) @ eigvecs.T
+    scale = np.sqrt(np.diag(corr))
+    return corr / np.outer(scale, scale)
+
+
+class GaussianCopula:
+    """Fit on a DataFrame, then `sample(n, rng)` rows as a dict of column -> array (training column order)."""
+    def __init__(self, columns, components, by=None):
+        self.columns = list(columns)
+        self.by = by
+        # [(class value or None, weight, {column: _Marginal}, cholesky factor)]
+        self.components = components
+
+    @classmethod
+    def fit(cls, df, by=None, seed=0):
+        rng = np.random.default_rng(seed)
+        groups = [(None, df)] if by is None else list(df.groupby(by, sort=True))
+        features = [c for c in df.columns if c != by]
+        components = []
+        for value, group in groups:
+            marginals = {name: _Marginal.fit(group[name].to_numpy()) for name in features}
+            u = np.column_stack([marginals[name].to_uniform(group[name].to_numpy(), rng) for name in features])
+            z = ndtri(np.clip(u, 1e-9, 1 - 1e-9))
+            cholesky = np.linalg.cholesky(_nearest_correlation(z))
+            key = value.item() if hasattr(value, "item") else value
+            components.append((key, len(group) / len(df), marginals, cholesky))
+        return cls(df.columns, components, by)
+
+    def sample(self, n, rng):
+        weights = np.asarray([weight for _, weight, _, _ in self.components])
+        counts = rng.multinomial(n, weights / weights.sum())
+        parts = []
+        for (value, _, marginals, cholesky), count in zip(self.components, counts):
+            if count == 0:
+                continue
+            u = ndtr(rng.standard_normal((count, len(marginals))) @ cholesky.T)
+            part = {name: marginal.from_uniform(u[:, i]) for i, (name, marginal) in enumerate(marginals.items())}
+            if self.by is not None:
+                part[self.by] = np.full(count, value)
+            parts.append(part)
+        rows = {name: np.concatenate([part[name] for part in parts]) for name in self.columns}
+        # Classes were generated in blocks; shuffle so every chunk is a representative mix
+        order = rng.permutation(n)
+        return {name: column[order] for name, column in rows.items()}
+
+    def to_dict(self):
+        return {
+            "format": COPULA_FORMAT, "columns": self.columns, "by": self.by,
+            "components": [
+                {"value": value, "weight": weight, "cholesky": cholesky.tolist(),
+                 "marginals": {name: marginal.to_dict() for name, marginal in marginals.items()}}
+                for value, weight, marginals, cholesky in self.components
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("format") != COPULA_FORMAT:
+            raise ValueError(f"Unsupported copula format {data.get('format')!r}")
+        components = [
+            (c["value"], c["weight"], {name: _Marginal.from_dict(m) for name, m in c["marginals"].items()},
+             np.asarray(c["cholesky"], dtype=np.float64))
+            for c in data["components"]
+        ]
+        return cls(data["columns"], components, data["by"])
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
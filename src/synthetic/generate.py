@@ -0,0 +1,262 @@
+"""Streams synthetic triage rows, and optionally referral charts, from a fitted Gaussian copula.
+
+    python -m src.synthetic.generate --rows 5000000 --output data/synthetic_5m.parquet
+    python -m src.synthetic.generate --rows 100000 --output load.csv --charts charts/ --chart-count 500
+    python -m src.synthetic.generate --rows 20000 --format jsonl --ids -o - | python -m src.pipeline.cli - --no-llm
+
+The first run fits the copula on data/synthetic_medical_triage.csv and saves it as
+data/triage_copula.json; later runs load that file (--refit fits again, and so does a
+--no-condition that does not match how the saved copula was fitted). Chunk i is
+drawn from SeedSequence([seed, i]), so the output depends on --seed and --chunk-rows,
+never on --workers. Chunks are generated and formatted on a process pool and written
+in order, with at most two per worker in memory. CSV and Parquet have the training
+CSV's columns, so `train_model.py --data` reads either directly.
+
+With --charts DIR, the first --chart-count rows are also rendered as referrals (pdf,
+scanned pdf or png) and listed in DIR/manifest.jsonl with the values the extractor
+should read back, so `python -m src.pipeline.cli DIR/manifest.jsonl` triages them.
+"""
+import argparse
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.synthetic.copula import GaussianCopula
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+DEFAULT_DATA_PATH = os.path.join(PROJECT_ROOT, "data", "synthetic_medical_triage.csv")
+DEFAULT_MODEL_PATH = os.path.join(PROJECT_ROOT, "data", "triage_copula.json")
+OUTPUT_FORMATS = ("csv", "parquet", "jsonl")
+CHART_FORMATS = ("pdf", "scan", "png")
+
+# Per-worker copula, sent once through the pool initializer instead of with every chunk
+_worker_model = None
+
+
+def load_or_fit(model_path=DEFAULT_MODEL_PATH, data_path=DEFAULT_DATA_PATH, by="triage_level", refit=False):
+    """The saved copula, or one fitted on `data_path` (and saved) if there is none yet or its `by` differs."""
+    if not refit and os.path.exists(model_path):
+        model = GaussianCopula.load(model_path)
+        if model.by == by:
+            return model
+        print(f"{model_path} was fitted with by={model.by!r}, not {by!r}; fitting again", file=sys.stderr)
+    import pandas as pd
+    model = GaussianCopula.fit(pd.read_csv(data_path), by=by)
+    model.save(model_path)
+    return model
+
+
+def chunk_sizes(rows, chunk_rows):
+    return [min(chunk_rows, rows - start) for start in range(0, rows, chunk_rows)]
+
+
+def sample_chunk(model, seed, index, rows):
+    return model.sample(rows, np.random.default_rng([seed, index]))
+
+
+def iter_chunks(model, rows, seed=0, chunk_rows=100_000):
+    """In-process generator of column dicts; the same rows the pool would write for this seed."""
+    for index, size in enumerate(chunk_sizes(rows, chunk_rows)):
+        yield sample_chunk(model, seed, index, size)
+
+
+def iter_rows(model, rows, seed=0, chunk_rows=100_000):
+    """Row dicts (column -> Python scalar), e.g. for benchmarks that need patients one by one."""
+    for chunk in iter_chunks(model, rows, seed, chunk_rows):
+        columns = {name: values.tolist() for name, values in chunk.items()}
+        yield from (dict(zip(columns, values)) for values in zip(*columns.values()))
+
+
+def patient_ids(start, count):
+    return [f"SYN-{start + i:08d}" for i in range(count)]
+
+
+def render_charts(columns, start, count, directory, chart_format, seed):
+    """Writes one referral per row for the first `count` rows; returns their manifest records."""
+    from src.synthetic.charts import referral_pages, row_truth, digital_pdf, scanned_pdf, png_chart
+
+    renderers = {"pdf": (digital_pdf, ".pdf"), "scan": (scanned_pdf, ".pdf"), "png": (png_chart, ".png")}
+    render, extension = renderers[chart_format]
+    records = []
+    for i, patient_id in enumerate(patient_ids(start, count)):
+        row = {name: values[i] for name, values in columns.items()}
+        # String seeds hash deterministically, so a row's chart text never depends on the chunking
+        pages = referral_pages(row, random.Random(f"{seed}:{start + i}"))
+        name = patient_id + extension
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(render(pages))
+        records.append({"patient_id": patient_id, "path": name, "expected": row_truth(row),
+                        "triage_level": int(row["triage_level"])})
+    return records
+
+
+def format_chunk(columns, output_format, ids=None):
+    """CSV/JSONL text (formatted in the worker, where it parallelises) or the raw columns for Parquet."""
+    if ids is not None:
+        columns = {"patient_id": np.asarray(ids), **columns}
+    if output_format == "parquet":
+        return columns
+    import pandas as pd
+    df = pd.DataFrame(columns)
+    if output_format == "csv":
+        return df.to_csv(index=False, header=False)
+    buffer = io.StringIO()
+    df.to_json(buffer, orient="records", lines=True)
+    text = buffer.getvalue()
+    return text if text.endswith("\n") else text + "\n"
+
+
+def _init_worker(model_dict):
+    global _worker_model
+    _worker_model = GaussianCopula.from_dict(model_dict)
+
+
+def _generate_chunk(seed, index, start, rows, output_format, with_ids, charts):
+    """Worker task: sample, optionally render charts, format. Returns (payload, manifest records)."""
+    columns = sample_chunk(_worker_model, seed, index, rows)
+    records = []
+    if charts is not None:
+        directory, chart_format, chart_count = charts
+        if start < chart_count:
+            records = render_charts(columns, start, min(rows, chart_count - start), directory, chart_format, seed)
+    ids = patient_ids(start, rows) if with_ids else None
+    return format_chunk(columns, output_format, ids), records
+
+
+class TextSink:
+    """CSV or JSONL, to a file or stdout; CSV gets the header once."""
+    def __init__(self, path, header=None):
+        self._file = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+        if header is not None:
+            self._file.write(",".join(header) + "\n")
+
+    def write(self, payload):
+        self._file.write(payload)
+
+    def close(self):
+        if self._file is sys.stdout:
+            self._file.flush()
+        else:
+            self._file.close()
+
+
+class ParquetSink:
+    """One row group per chunk; the schema is taken from the first chunk."""
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self._pq = pq
+        self.path = path
+        self._writer = None
+
+    def write(self, columns):
+        table = self._pa.Table.from_pydict(columns)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_sink(path, output_format, columns):
+    if output_format == "parquet":
+        if path == "-":
+            raise ValueError("Parquet output needs a file path")
+        return ParquetSink(path)
+    return TextSink(path, header=columns if output_format == "csv" else None)
+
+
+def generate(model, rows, sink, output_format, seed=0, chunk_rows=100_000, workers=None, with_ids=False,
+             charts=None, log=sys.stderr):
+    """Writes `rows` rows to `sink` chunk by chunk in order; returns rows, seconds, rows/sec and chart records.
+
+    `charts` is (directory, chart_format, chart_count) or None.
+    """
+    workers = workers or os.cpu_count() or 1
+    sizes = chunk_sizes(rows, chunk_rows)
+    starts = list(itertools.accumulate(sizes[:-1], initial=0)) if sizes else []
+    records = []
+    written = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(model.to_dict(),)) as pool:
+        pending = []
+        tasks = iter(enumerate(zip(starts, sizes)))
+        while True:
+            # Bounded window: memory holds at most 2 x workers chunks however many rows are asked for
+            for index, (start, size) in tasks:
+                pending.append((size, pool.submit(_generate_chunk, seed, index, start, size, output_format,
+                                                  with_ids, charts)))
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                break
+            size, future = pending.pop(0)
+            payload, chunk_records = future.result()
+            sink.write(payload)
+            records.extend(chunk_records)
+            written += size
+            elapsed = time.perf_counter() - started
+            print(f"{written:,} rows in {elapsed:.1f}s ({written / elapsed:,.0f} rows/sec)", file=log)
+    seconds = time.perf_counter() - started
+    return {"rows": written, "seconds": round(seconds, 3), "rows_per_sec": round(written / seconds) if seconds else None,
+            "charts": records}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic triage rows (and referral charts) from a fitted copula.")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--output", "-o", required=True, help="Output path (.csv, .parquet, .jsonl); - for stdout")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=None, help="Overrides the output extension")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=100_000, help="Rows per chunk (and per Parquet row group)")
+    parser.add_argument("--workers", type=int, default=None, help="Generator processes (default: all cores)")
+    parser.add_argument("--ids", action="store_true", help="Add a patient_id column (SYN-00000000, ...)")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="CSV the copula is fitted on")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Saved copula (written on first fit)")
+    parser.add_argument("--refit", action="store_true", help="Fit the copula again even if --model exists")
+    parser.add_argument("--no-condition", action="store_true", help="One copula for all rows instead of one per triage level")
+    parser.add_argument("--charts", default=None, help="Directory for rendered referral charts and manifest.jsonl")
+    parser.add_argument("--chart-count", type=int, default=100, help="Rows (from the first) that get a chart")
+    parser.add_argument("--chart-format", choices=CHART_FORMATS, default="pdf",
+                        help="pdf: text layer; scan: image-only pdf; png: page image")
+    args = parser.parse_args(argv)
+
+    output_format = args.format or next((f for f in OUTPUT_FORMATS if args.output.endswith("." + f)), "csv")
+    model = load_or_fit(args.model, args.data, by=None if args.no_condition else "triage_level", refit=args.refit)
+    charts = None
+    if args.charts:
+        os.makedirs(args.charts, exist_ok=True)
+        charts = (os.path.abspath(args.charts), args.chart_format, args.chart_count)
+
+    columns = (["patient_id"] if args.ids else []) + model.columns
+    sink = open_sink(args.output, output_format, columns)
+    try:
+        stats = generate(model, args.rows, sink, output_format, args.seed, args.chunk_rows, args.workers,
+                         args.ids, charts)
+    finally:
+        sink.close()
+
+    if charts is not None:
+        with open(os.path.join(args.charts, "manifest.jsonl"), "w", encoding="utf-8") as f:
+            for record in stats["charts"]:
+                f.write(json.dumps(record) + "\n")
+    print(f"Done: {stats['rows']:,} rows in {stats['seconds']:.1f}s ({stats['rows_per_sec']:,} rows/sec), "
+          f"{len(stats['charts'])} charts", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Versioned model bundles: one directory per trained model, selected by a CURRENT pointer.
+
+    <models dir>/CURRENT                  version name of the active bundle
+    <models dir>/bundles/<version>/
+        manifest.json                     feature order, encoder classes, training metadata and
+                                          reference statistics (monitoring.drift), checksums
+        feature.npy threshold.npy ...     CompiledForest node tables, memory-mapped read-only
+        model.pkl                         sklearn forest, unpickled only for large batches
+
+The manifest and arrays replace the two loose pickles, so the encoder can no longer drift
+from the model. Arrays are opened with mmap_mode='r': loading is near-instant, pages are
+read on first touch, and every process serving the same bundle shares them through the
+OS page cache instead of holding its own copy.
+
+Manage bundles with `python -m src.triage_engine.bundle list|verify|activate [version]`.
+"""
+import hashlib
+import json
+import os
+import pickle
+import platform
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from src.triage_engine.registry import get_registry, models_dir, MODEL_PATH, ENCODER_PATH
+from src.triage_engine.compiled_forest import CompiledForest, ARRAY_NAMES
+
+BUNDLE_FORMAT = 1
+MANIFEST = 'manifest.json'
+MODEL_PICKLE = 'model.pkl'
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _bundle_checksum(files):
+    return hashlib.sha256("".join(f"{name}:{files[name]['sha256']}\n" for name in sorted(files)).encode()).hexdigest()
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_bundle(model, encoder, feature_names, metadata=None, directory=None, activate=True, reference=None):
+    """Writes a new bundle for a fitted forest and (by default) makes it the active one.
+
+    `reference` (drift.reference_stats of the training features) is stored in the manifest
+    for the input-drift monitor. Returns the bundle directory. The version name is the UTC timestamp plus the first
+    characters of the checksum, so re-running training never overwrites an old bundle.
+    """
+    directory = directory or models_dir()
+    bundles = os.path.join(directory, 'bundles')
+    staging = os.path.join(bundles, f".staging-{os.getpid()}-{time.time_ns()}")
+    os.makedirs(staging)
+
+    forest = CompiledForest.from_sklearn(model, encoder, feature_names)
+    for name, array in forest.arrays().items():
+        np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(staging, MODEL_PICKLE), 'wb') as f:
+        pickle.dump(model, f)
+
+    files = {}
+    for name in sorted(os.listdir(staging)):
+        path = os.path.join(staging, name)
+        files[name] = {"sha256": _sha256(path), "size": os.path.getsize(path)}
+    checksum = _bundle_checksum(files)
+    version = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime())}-{checksum[:8]}"
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": version,
+        "created_at": time.time(),
+        "feature_names": forest.feature_names,
+        "encoder_classes": list(forest.arrival_modes),
+        "classes": [int(c) for c in forest.classes_],
+        "n_trees": forest.n_trees,
+        "max_depth": forest.max_depth,
+        "training": dict(metadata or {}),
+        "reference": reference,
+        "environment": {"python": platform.python_version(), "numpy": np.__version__},
+        "files": files,
+        "checksum": checksum,
+    }
+    with open(os.path.join(staging, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+    path = os.path.join(bundles, version)
+    os.replace(staging, path)
+    if activate:
+        activate_bundle(version, directory)
+    return path
+
+
+def activate_bundle(version, directory=None):
+    """Points CURRENT at `version`; running processes pick it up on their next lookup."""
+    directory = directory or models_dir()
+    if not os.path.exists(os.path.join(directory, 'bundles', version, MANIFEST)):
+        raise FileNotFoundError(f"No model bundle {version!r} in {directory}")
+    _write_atomic(os.path.join(directory, 'CURRENT'), version + "\n")
+
+
+def list_bundles(directory=None):
+    bundles = os.path.join(directory or models_dir(), 'bundles')
+    if not os.path.isdir(bundles):
+        return []
+    return sorted(name for name in os.listdir(bundles) if os.path.exists(os.path.join(bundles, name, MANIFEST)))
+
+
+def remove_bundle(version, directory=None):
+    directory = directory or models_dir()
+    current = current_version(directory)
+    if version == current:
+        raise ValueError(f"Refusing to delete the active bundle {version!r}")
+    shutil.rmtree(os.path.join(directory, 'bundles', version))
+
+
+def current_version(directory=None):
+    try:
+        with open(os.path.join(directory or models_dir(), 'CURRENT')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class ModelBundle:
+    """One bundle directory. Only the manifest is read up front; everything else on first use."""
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self._lock = threading.Lock()
+        self._forest = None
+        self._model = None
+        self._encoder = None
+        self._shap_engine = None
+
+    @classmethod
+    def load(cls, manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported model bundle format {manifest.get('format')!r} in {manifest_path}")
+        path = os.path.dirname(manifest_path)
+        # Cheap integrity check on load; verify() does the full hash comparison
+        for name, info in manifest["files"].items():
+            size = os.path.getsize(os.path.join(path, name))
+            if size != info["size"]:
+                raise ValueError(f"Model bundle file {name} is {size} bytes, manifest says {info['size']}")
+        return cls(path, manifest)
+
+    @property
+    def version(self):
+        return self.manifest["version"]
+
+    @property
+    def feature_names(self):
+        return list(self.manifest["feature_names"])
+
+    @property
+    def reference(self):
+        """Training feature statistics for the drift monitor (None for bundles written before them)."""
+        return self.manifest.get("reference")
+
+    @property
+    def forest(self):
+        with self._lock:
+            if self._forest is None:
+                arrays = {
+                    name: np.asarray(np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r'))
+                    for name in ARRAY_NAMES
+                }
+                self._forest = CompiledForest(
+                    **arrays,
+                    feature_names=self.manifest["feature_names"],
+                    arrival_modes=self.manifest["encoder_classes"],
+                    max_depth=self.manifest["max_depth"],
+                )
+            return self._forest
+
+    @property
+    def encoder(self):
+        with self._lock:
+            if self._encoder is None:
+                from sklearn.preprocessing import LabelEncoder
+                encoder = LabelEncoder()
+                encoder.classes_ = np.asarray(self.manifest["encoder_classes"], dtype=object)
+                self._encoder = encoder
+            return self._encoder
+
+    @property
+    def model(self):
+        """The sklearn forest; only needed by batches above COMPILED_MAX_BATCH."""
+        with self._lock:
+            if self._model is None:
+                with open(os.path.join(self.path, MODEL_PICKLE), 'rb') as f:
+                    self._model = pickle.load(f)
+            return self._model
+
+    @property
+    def shap_engine(self):
+        forest = self.forest
+        with self._lock:
+            if self._shap_engine is None:
+                from src.explainability.tree_shap import TreeShapEngine
+                self._shap_engine = TreeShapEngine(forest)
+            return self._shap_engine
+
+    def verify(self):
+        """Recomputes every file hash and the bundle checksum; raises ValueError on mismatch."""
+        for name, info in self.manifest["files"].items():
+            if _sha256(os.path.join(self.path, name)) != info["sha256"]:
+                raise ValueError(f"Model bundle file {name} does not match its manifest checksum")
+        if _bundle_checksum(self.manifest["files"]) != self.manifest["checksum"]:
+            raise ValueError("Model bundle checksum does not match its files")
+        return True
+
+
+class LooseModelFiles:
+    """Same interface as ModelBundle over the pre-bundle risk_model.pkl / label_encoder.pkl pair."""
+    forest = None
+    reference = None
+
+    def __init__(self, model_path=MODEL_PATH, encoder_path=ENCODER_PATH):
+        self.model_path = model_path
+        self.encoder_path = encoder_path
+        self.version = None
+
+    @property
+    def model(self):
+        return get_registry().load(self.model_path)
+
+    @property
+    def encoder(self):
+        return get_registry().load(self.encoder_path)
+
+    @property
+    def shap_engine(self):
+        return get_registry().get_shap_engine(self.model_path)
+
+
+def get_active_bundle(directory=None):
+    """The bundle CURRENT points at (shared through the registry), or None before the first bundle."""
+    directory = directory or models_dir()
+    version = current_version(directory)
+    if version is None:
+        return None
+    return get_registry().load(os.path.join(directory, 'bundles', version, MANIFEST), loader=ModelBundle.load)
+
+
+def resolve_model(directory=None, model_path=MODEL_PATH, encoder_path=ENCODER_PATH):
+    """Active bundle if there is one, otherwise the loose pickles."""
+    bundle = get_active_bundle(directory)
+    return bundle if bundle is not None else LooseModelFiles(model_path, encoder_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect and manage model bundles.")
+    parser.add_argument("command", choices=["list", "verify", "activate"])
+    parser.add_argument("version", nargs="?")
+    parser.add_argument("--models-dir", default=None)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        active = current_version(args.models_dir)
+        for name in list_bundles(args.models_dir):
+            print(("* " if name == active else "  ") + name)
+    elif args.command == "verify":
+        directory = args.models_dir or models_dir()
+        version = args.version or current_version(directory)
+        if version is None:
+            parser.error(f"no current bundle in {directory}; pass a version to verify")
+        if version not in list_bundles(directory):
+            parser.error(f"no bundle named {version!r} in {directory}")
+        bundle = ModelBundle.load(os.path.join(directory, 'bundles', version, MANIFEST))
+        bundle.verify()
+        print(f"{version}: OK")
+    else:
+        if args.version is None:
+            parser.error("activate needs a version")
+        activate_bundle(args.version, args.models_dir)
+        print(f"Active bundle: {args.version}")
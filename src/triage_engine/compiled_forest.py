@@ -0,0 +1,140 @@
+import numpy as np
+
+# Above this many rows sklearn's C traversal overtakes the NumPy one (see benchmarks/bench_inference.py)
+COMPILED_MAX_BATCH = 512
+
+# Node/leaf tables stored as separate .npy files in a model bundle
+ARRAY_NAMES = ("feature", "threshold", "children", "values", "roots", "node_weight", "classes")
+
+
+class CompiledForest:
+    """RandomForestClassifier flattened into contiguous NumPy arrays.
+
+    All trees share one node table: feature, threshold, interleaved (right, left) children,
+    normalised class probabilities and training sample weights. Leaves point at themselves.
+    Every (row, tree) path is advanced one level per vectorised step, and the
+    arrival-mode LabelEncoder is folded into a dict lookup. Rows are cast to
+    float32 exactly like sklearn does before comparing against the float64 thresholds,
+    and per-tree probabilities are accumulated in tree order and then averaged, so
+    predict_proba is bit-for-bit identical to the pickled model. The arrays may be
+    read-only memory maps (see bundle.py); nothing here writes to them.
+    """
+    def __init__(self, feature, threshold, children, values, roots, node_weight, classes,
+                 feature_names, arrival_modes=(), max_depth=0):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.values = values
+        self.roots = roots
+        self.node_weight = node_weight
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.feature_names = [str(name) for name in feature_names]
+        self.arrival_modes = {str(label): code for code, label in enumerate(arrival_modes)}
+        self._arrival_col = self.feature_names.index('arrival_mode') if 'arrival_mode' in self.feature_names else None
+        self._is_leaf = children[1::2] == np.arange(len(feature))
+
+    @classmethod
+    def from_sklearn(cls, model, encoder=None, feature_names=None):
+        features, thresholds, children, values, weights, roots = [], [], [], [], [], []
+        offset = 0
+        n_classes = len(model.classes_)
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            # Interleaved so one gather picks the branch: index 2 * node + go_left
+            children.append(np.stack([
+                np.where(is_leaf, nodes, tree.children_right) + offset,
+                np.where(is_leaf, nodes, tree.children_left) + offset,
+            ], axis=1).ravel())
+            weights.append(tree.weighted_n_node_samples)
+
+            leaf_values = tree.value[:, 0, :n_classes].astype(np.float64)
+            # scikit-learn >= 1.4 already stores class fractions and predict_proba returns them
+            # untouched; re-dividing by their sum would change the last bit. Older versions store
+            # weighted counts and normalise in predict_proba, so do the same once per node.
+            if not np.allclose(leaf_values.sum(axis=1), 1.0):
+                normalizer = leaf_values.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                leaf_values = leaf_values / normalizer
+            values.append(leaf_values)
+            offset += tree.node_count
+
+        if feature_names is None:
+            feature_names = list(getattr(model, 'feature_names_in_', range(model.n_features_in_)))
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.concatenate(children).astype(np.intp),
+            values=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            node_weight=np.concatenate(weights).astype(np.float64),
+            classes=np.asarray(model.classes_),
+            feature_names=list(feature_names),
+            arrival_modes=np.asarray(encoder.classes_).astype(str) if encoder is not None else (),
+            max_depth=max(estimator.tree_.max_depth for estimator in model.estimators_),
+        )
+
+    def arrays(self):
+        return {name: getattr(self, 'classes_' if name == 'classes' else name) for name in ARRAY_NAMES}
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def encode(self, patients):
+        """Feature matrix (float32, training column order) from feature dicts or a columnar mapping."""
+        if isinstance(patients, dict):
+            n_rows = len(patients[self.feature_names[0]])
+            rows = ({name: patients[name][i] for name in self.feature_names} for i in range(n_rows))
+        else:
+            n_rows, rows = len(patients), patients
+
+        X = np.empty((n_rows, len(self.feature_names)), dtype=np.float32)
+        for i, row in enumerate(rows):
+            for j, name in enumerate(self.feature_names):
+                value = row[name]
+                if j == self._arrival_col:
+                    try:
+                        value = self.arrival_modes[value]
+                    except KeyError:
+                        # Same failure LabelEncoder.transform raises
+                        raise ValueError(f"y contains previously unseen labels: {value!r}")
+                X[i, j] = value
+        return X
+
+    def apply(self, X):
+        """Leaf node index per (row, tree), shape (n_rows, n_trees)."""
+        # float32 round trip as in sklearn's check_array; widening back to float64 is exact
+        X = np.asarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat = X.astype(np.float64).ravel()
+
+        # One entry per (row, tree) path; paths drop out of the active set once they hit a leaf
+        leaves = np.tile(self.roots, n_rows)
+        active = np.arange(len(leaves))
+        nodes = leaves.copy()
+        offsets = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, self.n_trees)
+        while len(active):
+            go_left = flat[self.feature[nodes] + offsets] <= self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_left]
+            leaves[active] = nodes
+            keep = ~self._is_leaf[nodes]
+            active, nodes, offsets = active[keep], nodes[keep], offsets[keep]
+        return leaves.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # Reducing over the (non-innermost) tree axis adds trees one after another, the
+        # same order RandomForestClassifier accumulates them in, so rounding matches exactly
+        proba = self.values[leaves].sum(axis=1)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
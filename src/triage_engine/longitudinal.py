@@ -0,0 +1,291 @@
+import bisect
+import math
+import threading
+import time
+
+import numpy as np
+
+TRACKED_VITALS = ("oxygen_saturation", "heart_rate", "systolic_blood_pressure", "body_temperature")
+# Board deltas keep their short names (spo2/temp/hr), as in the stored queue entries
+DELTA_NAMES = {"oxygen_saturation": "spo2", "body_temperature": "temp", "heart_rate": "hr"}
+DEFAULT_WINDOW = 32
+
+# NEWS2 bands for the parameters the charts carry (respiration rate, supplemental oxygen and
+# consciousness are never extracted, so the aggregate is a lower bound of the full score).
+# points[i] applies to edges[i-1] < value <= edges[i].
+NEWS2_BANDS = {
+    "oxygen_saturation": ((91, 93, 95), (3, 2, 1, 0)),                      # SpO2 scale 1
+    "systolic_blood_pressure": ((90, 100, 110, 219), (3, 2, 1, 0, 3)),
+    "heart_rate": ((40, 50, 90, 110, 130), (3, 1, 0, 1, 2, 3)),
+    "body_temperature": ((35.0, 36.0, 38.0, 39.0), (3, 1, 0, 1, 2)),
+}
+
+
+def news2_points(values, vitals=TRACKED_VITALS):
+    """Per-parameter NEWS2 points for an (..., len(vitals)) array; missing (NaN) values score 0."""
+    values = np.asarray(values, dtype=np.float64)
+    points = np.zeros(values.shape, dtype=np.int8)
+    for i, name in enumerate(vitals):
+        if name not in NEWS2_BANDS:
+            continue
+        edges, band_points = NEWS2_BANDS[name]
+        column = values[..., i]
+        scored = np.asarray(band_points, dtype=np.int8)[np.searchsorted(edges, column, side="left")]
+        points[..., i] = np.where(np.isnan(column), 0, scored)
+    return points
+
+
+def _row_points(row, vitals):
+    # Scalar twin of news2_points for the one-row update path (no per-call NumPy overhead)
+    points = []
+    for name, value in zip(vitals, row):
+        band = NEWS2_BANDS.get(name)
+        if band is None or math.isnan(value):
+            points.append(0)
+        else:
+            points.append(band[1][bisect.bisect_left(band[0], value)])
+    return points
+
+
+def news2_risk(score, max_points):
+    """NEWS2 clinical risk band: any single parameter at 3 is at least "low-medium"."""
+    if score >= 7:
+        return "high"
+    if score >= 5:
+        return "medium"
+    return "low-medium" if max_points >= 3 else "low"
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _tidy(delta):
+    delta = round(float(delta), 1)
+    return int(delta) if delta.is_integer() else delta
+
+
+class LongitudinalVitals:
+    """Per-patient vitals time series in fixed-size rings of preallocated NumPy columns.
+
+    Each patient owns one row: the last `window` observation times, one column per
+    tracked vital and the NEWS2 score of each observation, so memory grows with the
+    number of patients and never with the length of their history (no encounter dicts,
+    no raw text). `observe()` is O(1): it overwrites the oldest slot, adds the new point
+    to (and subtracts the evicted one from) the running sums behind each vital's
+    least-squares slope, and scores NEWS2 from the new row. Cohort queries such as
+    `falling("oxygen_saturation", 3, within=3600)` are reductions over the whole block.
+
+    With a `store` (TriageStore), a patient first seen by this process is seeded from
+    its last `window` stored encounters. A process sharing the store with other writers
+    calls `reset()` when `store.changed_externally()` so those patients are re-read.
+    """
+    def __init__(self, vitals=TRACKED_VITALS, window=DEFAULT_WINDOW, capacity=256, store=None):
+        self.vitals = tuple(vitals)
+        self.window = window
+        self.store = store
+        self._column = {name: i for i, name in enumerate(self.vitals)}
+        self._lock = threading.RLock()
+        self._capacity = capacity
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            capacity, window, v = self._capacity, self.window, len(self.vitals)
+            self._rows = {}     # patient_id -> row
+            self._ids = []      # row -> patient_id
+            self._times = np.full((capacity, window), np.nan)
+            self._values = np.full((capacity, window, v), np.nan)
+            self._scores = np.zeros((capacity, window), dtype=np.int8)
+            self._head = np.zeros(capacity, dtype=np.int64)     # slot the next observation goes to
+            self._count = np.zeros(capacity, dtype=np.int64)
+            self._origin = np.zeros(capacity)                   # slope time axis: hours since this
+            # Least-squares running sums per (patient, vital): n, sum t, sum x, sum t^2, sum t*x
+            self._sums = np.zeros((capacity, 5, v))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, patient_id):
+        return patient_id in self._rows
+
+    def _grow(self):
+        extra = len(self._times)
+        self._times = np.concatenate([self._times, np.full_like(self._times, np.nan)])
+        self._values = np.concatenate([self._values, np.full_like(self._values, np.nan)])
+        self._scores = np.concatenate([self._scores, np.zeros_like(self._scores)])
+        self._head = np.concatenate([self._head, np.zeros(extra, dtype=np.int64)])
+        self._count = np.concatenate([self._count, np.zeros(extra, dtype=np.int64)])
+        self._origin = np.concatenate([self._origin, np.zeros(extra)])
+        self._sums = np.concatenate([self._sums, np.zeros_like(self._sums)])
+
+    def _vector(self, features):
+        return np.array([_as_float(features.get(name)) for name in self.vitals])
+
+    def _row(self, patient_id):
+        row = self._rows.get(patient_id)
+        if row is not None:
+            return row
+        row = len(self._ids)
+        if row == len(self._times):
+            self._grow()
+        self._rows[patient_id] = row
+        self._ids.append(patient_id)
+        if self.store is not None:
+            for encounter in self.store.history(patient_id, limit=self.window):
+                self._push(row, encounter["recorded_at"], self._vector(encounter["features"]))
+        return row
+
+    # --- Incremental updates ---
+
+    def _accumulate(self, row, t, x, sign):
+        present = ~np.isnan(x)
+        weight = sign * present
+        x = np.where(present, x, 0.0)
+        sums = self._sums[row]
+        sums[0] += weight
+        sums[1] += weight * t
+        sums[2] += sign * x
+        sums[3] += weight * t * t
+        sums[4] += sign * t * x
+
+    def _rebuild(self, row):
+        # Once per turn of the ring: exact sums from the slots, time axis rebased to the oldest
+        # observation, so add/subtract rounding never accumulates however long the history
+        times = self._times[row]
+        self._origin[row] = np.nanmin(times)
+        self._sums[row] = 0.0
+        for slot in range(self.window):
+            self._accumulate(row, (times[slot] - self._origin[row]) / 3600.0, self._values[row, slot], 1)
+
+    def _push(self, row, recorded_at, x):
+        """Writes one observation into the ring; returns its per-parameter NEWS2 points."""
+        slot = self._head[row]
+        if self._count[row] == 0:
+            self._origin[row] = recorded_at
+        if self._count[row] == self.window:
+            evicted = (self._times[row, slot] - self._origin[row]) / 3600.0
+            self._accumulate(row, evicted, self._values[row, slot], -1)
+        else:
+            self._count[row] += 1
+        self._times[row, slot] = recorded_at
+        self._values[row, slot] = x
+        points = _row_points(x.tolist(), self.vitals)
+        self._scores[row, slot] = sum(points)
+        self._accumulate(row, (recorded_at - self._origin[row]) / 3600.0, x, 1)
+        self._head[row] = (slot + 1) % self.window
+        if self._head[row] == 0:
+            self._rebuild(row)
+        return points
+
+    def _latest_slot(self, row):
+        return (self._head[row] - 1) % self.window
+
+    def observe(self, patient_id, features, recorded_at=None):
+        """Adds one encounter; returns its trend, deltas against the previous encounter and NEWS2.
+
+        "worsening" means SpO2 fell or temperature rose since the previous encounter; it breaks
+        ties between same-level patients on the board. The NEWS2 change is reported separately
+        as `news2_delta` (None on the first encounter) and does not affect the trend.
+        """
+        recorded_at = time.time() if recorded_at is None else recorded_at
+        x = self._vector(features)
+        with self._lock:
+            row = self._row(patient_id)
+            previous = None
+            if self._count[row]:
+                slot = self._latest_slot(row)
+                previous = (self._values[row, slot].copy(), int(self._scores[row, slot]))
+            points = self._push(row, recorded_at, x)
+
+        score = sum(points)
+        deltas = {short: None for short in DELTA_NAMES.values()}
+        worsening = False
+        news2_delta = None
+        if previous is not None:
+            prev_values, prev_score = previous
+            for name, short in DELTA_NAMES.items():
+                i = self._column.get(name)
+                if i is not None and not (np.isnan(x[i]) or np.isnan(prev_values[i])):
+                    deltas[short] = _tidy(x[i] - prev_values[i])
+            worsening = (deltas["spo2"] or 0) < 0 or (deltas["temp"] or 0) > 0
+            news2_delta = score - prev_score
+        return {"trend": "worsening" if worsening else "stable", "deltas": deltas, "news2": score,
+                "news2_delta": news2_delta, "news2_risk": news2_risk(score, max(points, default=0))}
+
+    # --- Queries ---
+
+    def _slopes(self, sums):
+        n, st, sx, stt, stx = sums
+        denominator = n * stt - st * st
+        valid = (n >= 2) & (denominator > 1e-9)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(valid, (n * stx - st * sx) / np.where(valid, denominator, 1.0), np.nan)
+
+    def summary(self, patient_id):
+        """Latest values, NEWS2 and per-hour least-squares slopes over the window, or None if unseen."""
+        with self._lock:
+            row = self._rows.get(patient_id)
+            if row is None or not self._count[row]:
+                return None
+            slot = self._latest_slot(row)
+            latest = self._values[row, slot].copy()
+            slopes = self._slopes(self._sums[row])
+            count = int(self._count[row])
+            recorded_at = float(self._times[row, slot])
+        points = news2_points(latest, self.vitals)
+        score = int(points.sum())
+        return {
+            "patient_id": patient_id, "observations": count, "recorded_at": recorded_at,
+            "latest": {name: None if np.isnan(v) else float(v) for name, v in zip(self.vitals, latest)},
+            "slopes_per_hour": {name: None if np.isnan(s) else round(float(s), 4) for name, s in zip(self.vitals, slopes)},
+            "news2": score, "news2_risk": news2_risk(score, int(points.max(initial=0))),
+        }
+
+    def slopes(self, vital):
+        """{patient_id: least-squares slope per hour} for every patient with two or more readings."""
+        with self._lock:
+            n = len(self._ids)
+            values = self._slopes(self._sums[:n, :, self._column[vital]].T)
+            ids = list(self._ids)
+        return {patient_id: float(s) for patient_id, s in zip(ids, values) if not np.isnan(s)}
+
+    def _excursions(self, vital, within, now, reduce):
+        # Latest reading minus the window's peak (fmax) or trough (fmin); NaN outside the window
+        now = time.time() if now is None else now
+        with self._lock:
+            n = len(self._ids)
+            rows = np.arange(n)
+            latest_slot = (self._head[:n] - 1) % self.window
+            values = self._values[:n, :, self._column[vital]]
+            in_window = self._times[:n] >= now - within
+            reference = reduce.reduce(np.where(in_window, values, np.nan), axis=1)
+            latest = values[rows, latest_slot]
+            change = np.where(in_window[rows, latest_slot], latest - reference, np.nan)
+            ids = list(self._ids)
+        return ids, change
+
+    def falling(self, vital, by, within=3600.0, now=None):
+        """Patients whose latest `vital` is more than `by` below its highest reading of the last
+        `within` seconds, as [(patient_id, drop)] with the largest drop first."""
+        ids, change = self._excursions(vital, within, now, np.fmax)
+        hits = np.flatnonzero(change < -by)
+        return sorted(((ids[i], round(float(-change[i]), 2)) for i in hits), key=lambda hit: -hit[1])
+
+    def rising(self, vital, by, within=3600.0, now=None):
+        """Mirror of falling(): latest `vital` more than `by` above the window's lowest reading."""
+        ids, change = self._excursions(vital, within, now, np.fmin)
+        hits = np.flatnonzero(change > by)
+        return sorted(((ids[i], round(float(change[i]), 2)) for i in hits), key=lambda hit: -hit[1])
+
+    def news2_at_least(self, threshold):
+        """[(patient_id, latest NEWS2)] for patients scoring `threshold` or more, highest first."""
+        with self._lock:
+            n = len(self._ids)
+            scores = self._scores[np.arange(n), (self._head[:n] - 1) % self.window]
+            ids = list(self._ids)
+        hits = np.flatnonzero(scores >= threshold)
+        return sorted(((ids[i], int(scores[i])) for i in hits), key=lambda hit: -hit[1])
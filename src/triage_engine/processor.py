@@ -1,14 +1,60 @@
-import pickle
-import pandas as pd
 import numpy as np
 
+from src.triage_engine.registry import get_registry, MODEL_PATH, ENCODER_PATH
+from src.triage_engine.compiled_forest import COMPILED_MAX_BATCH
+from src.triage_engine.bundle import resolve_model
+from src.monitoring.metrics import timed
+from src.runtime.lazy import lazy_import
+
+# Only the large-batch fallback builds DataFrames
+pd = lazy_import("pandas")
+
+# --- CRITICAL FIX: FEATURE ORDERING ---
+# This list MUST match the EXACT order and names used during model.fit()
+MODEL_FEATURES = [
+    'age',
+    'heart_rate',
+    'systolic_blood_pressure',
+    'oxygen_saturation',
+    'body_temperature',
+    'pain_level',
+    'chronic_disease_count',
+    'previous_er_visits',
+    'arrival_mode'
+]
+
+# Columns read by the safety rules and department mapping
+RULE_FEATURES = ['oxygen_saturation', 'heart_rate', 'systolic_blood_pressure', 'pain_level']
+
 class TriageProcessor:
-    def __init__(self):
-        # Load the trained model and encoder
-        with open('models/risk_model.pkl', 'rb') as f:
-            self.model = pickle.load(f)
-        with open('models/label_encoder.pkl', 'rb') as f:
-            self.encoder = pickle.load(f)
+    def __init__(self, model_path=MODEL_PATH, encoder_path=ENCODER_PATH, models_dir=None):
+        # Artifacts come from the shared registry, so the SHAP path reuses the same objects.
+        # The active bundle in `models_dir` wins; the loose pickles are the pre-bundle fallback.
+        self.registry = get_registry()
+        self.model_path = model_path
+        self.encoder_path = encoder_path
+        self.models_dir = models_dir
+        artifacts = self.artifacts
+        if artifacts.version is None:
+            # Load eagerly so a missing artifact fails at construction, not on the first patient
+            artifacts.model
+            artifacts.encoder
+
+    @property
+    def artifacts(self):
+        return resolve_model(self.models_dir, self.model_path, self.encoder_path)
+
+    @property
+    def model(self):
+        return self.artifacts.model
+
+    @property
+    def encoder(self):
+        return self.artifacts.encoder
+
+    @property
+    def compiled(self):
+        return self.artifacts.forest
             
     def get_department(self, patient_data):
         """Step 2: Department recommendation logic (Phase 3)"""
@@ -30,43 +76,88 @@ class TriageProcessor:
             return 3, "CRITICAL: Severe Hypertension"
         return None, None
 
-    def process_patient(self, patient_data):
-        # 1. Check Safety Rules
-        rule_level, reason = self.apply_rules(patient_data)
-        
-        # 2. Prepare Data for ML Prediction
-        input_df = pd.DataFrame([patient_data])
-
-        # --- CRITICAL FIX: FEATURE ORDERING ---
-        # This list MUST match the EXACT order and names used during model.fit()
-        cols_when_model_builds = [
-            'age', 
-            'heart_rate', 
-            'systolic_blood_pressure', 
-            'oxygen_saturation', 
-            'body_temperature', 
-            'pain_level', 
-            'chronic_disease_count', 
-            'previous_er_visits', 
-            'arrival_mode'
-        ]
-        
-        # Reindex ensures columns are present and in the correct order
-        input_df = input_df[cols_when_model_builds]
+    def get_department_batch(self, df):
+        """Vectorized get_department: same precedence, evaluated as NumPy masks over the batch."""
+        spo2 = np.asarray(df['oxygen_saturation'])
+        hr = np.asarray(df['heart_rate'])
+        sbp = np.asarray(df['systolic_blood_pressure'])
+        pain = np.asarray(df['pain_level'])
+        return np.select(
+            [spo2 < 92, (hr > 120) | (sbp > 160), pain >= 8],
+            ["Pulmonology / Respiratory", "Cardiology", "Emergency / Trauma"],
+            default="General Medicine"
+        )
 
+    def apply_rules_batch(self, df):
+        """Vectorized apply_rules: returns (rule_mask, rule_levels, reasons) for the batch."""
+        low_spo2 = np.asarray(df['oxygen_saturation']) < 90
+        severe_htn = np.asarray(df['systolic_blood_pressure']) > 190
+        rule_mask = low_spo2 | severe_htn
+        rule_levels = np.where(rule_mask, 3, -1)
+        # Low SpO2 is checked first in apply_rules, so it wins when both fire
+        reasons = np.select(
+            [low_spo2, severe_htn],
+            ["CRITICAL: Low Oxygen Saturation", "CRITICAL: Severe Hypertension"],
+            default=""
+        )
+        return rule_mask, rule_levels, reasons
+
+    def encode_features(self, df):
+        """Reorders columns to the training layout and label-encodes arrival mode."""
+        # Reindex ensures columns are present and in the correct order
+        input_df = df[MODEL_FEATURES].copy()
         # Fix encoding for categorical data (performed AFTER reordering)
         input_df['arrival_mode'] = self.encoder.transform(input_df['arrival_mode'])
-        
-        # 3. Get ML Prediction
-        ml_level = self.model.predict(input_df)[0]
-        
+        return input_df
+
+    @timed("predict")
+    def process_batch(self, patients):
+        """Triage many patients with one model call.
+
+        `patients` is a list of feature dicts or a columnar mapping (column -> sequence).
+        Results are returned in input order with the same keys as process_patient.
+        """
+        n_rows = len(next(iter(patients.values()), ())) if isinstance(patients, dict) else len(patients)
+        compiled = self.compiled if n_rows <= COMPILED_MAX_BATCH else None
+        if compiled is not None:
+            # Compiled path: straight to arrays, no DataFrame or LabelEncoder round trip
+            X = compiled.encode(patients)
+            if len(X) == 0:
+                return []
+            if isinstance(patients, dict):
+                df = {name: np.asarray(patients[name]) for name in RULE_FEATURES}
+            else:
+                df = {name: np.asarray([p[name] for p in patients]) for name in RULE_FEATURES}
+            proba = compiled.predict_proba(X)
+            classes = compiled.classes_
+        else:
+            df = pd.DataFrame(patients)
+            if df.empty:
+                return []
+            model = self.model
+            proba = model.predict_proba(self.encode_features(df))
+            classes = model.classes_
+
+        # 1. Check Safety Rules for the whole batch
+        rule_mask, rule_levels, reasons = self.apply_rules_batch(df)
+
+        # 2. Single ML call for every row (done above)
+        ml_levels = classes[proba.argmax(axis=1)]
+
         # Final Decision (Rules override ML)
-        final_level = rule_level if rule_level is not None else ml_level
-        source = "Safety Rule" if rule_level is not None else "ML Model"
-        
-        return {
-            "triage_level": int(final_level),
-            "department": self.get_department(patient_data),
-            "source": source,
-            "reason": reason
-        }
\ No newline at end of file
+        final_levels = np.where(rule_mask, rule_levels, ml_levels)
+        departments = self.get_department_batch(df)
+
+        results = []
+        for i in range(len(proba)):
+            results.append({
+                "triage_level": int(final_levels[i]),
+                "department": str(departments[i]),
+                "source": "Safety Rule" if rule_mask[i] else "ML Model",
+                "reason": str(reasons[i]) if rule_mask[i] else None,
+                "ml_confidence": round(float(proba[i].max()), 3)
+            })
+        return results
+
+    def process_patient(self, patient_data):
+        return self.process_batch([patient_data])[0]
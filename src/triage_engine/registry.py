@@ -0,0 +1,115 @@
+import os
+import pickle
+import threading
+
+# Models live in the project's models/ directory unless TRIAGE_MODELS_DIR points elsewhere
+MODELS_DIR_ENV = 'TRIAGE_MODELS_DIR'
+DEFAULT_MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../models'))
+
+
+def models_dir():
+    return os.environ.get(MODELS_DIR_ENV) or DEFAULT_MODELS_DIR
+
+
+# Loose pickles from before versioned bundles; only used when no bundle is active
+MODEL_PATH = os.path.join(models_dir(), 'risk_model.pkl')
+ENCODER_PATH = os.path.join(models_dir(), 'label_encoder.pkl')
+
+
+class ModelRegistry:
+    """Process-wide cache of model artifacts so every caller shares one loaded copy.
+
+    Entries are keyed by absolute path and stamped with the file's mtime and size,
+    so retraining (which rewrites the pickle) is picked up on the next lookup
+    without restarting the app.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._artifacts = {}   # abs path -> (stamp, object)
+        self._explainers = {}  # (abs model path, kind) -> (stamp, explainer object)
+        self._stats = {
+            "loads": 0,
+            "hits": 0,
+            "reloads": 0,
+            "explainer_builds": 0,
+            "explainer_hits": 0,
+        }
+
+    @staticmethod
+    def _stamp(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self, path, loader=None):
+        """Returns the unpickled artifact at `path`, reading the file only when it changed.
+
+        `loader(path)` replaces unpickling for non-pickle artifacts (e.g. the compiled forest).
+        """
+        key = os.path.abspath(path)
+        stamp = self._stamp(key)
+        with self._lock:
+            cached = self._artifacts.get(key)
+            if cached is not None and cached[0] == stamp:
+                self._stats["hits"] += 1
+                return cached[1]
+
+            if loader is not None:
+                artifact = loader(key)
+            else:
+                with open(key, 'rb') as f:
+                    artifact = pickle.load(f)
+
+            self._stats["loads"] += 1
+            if cached is not None:
+                self._stats["reloads"] += 1
+            self._artifacts[key] = (stamp, artifact)
+            return artifact
+
+    def _derived(self, model_path, kind, build):
+        """Object built from the model by `build(model)`, rebuilt only when the model file changes."""
+        key = os.path.abspath(model_path)
+        model = self.load(key)
+        stamp = self._artifacts[key][0]
+        with self._lock:
+            cached = self._explainers.get((key, kind))
+            if cached is not None and cached[0] == stamp:
+                self._stats["explainer_hits"] += 1
+                return cached[1]
+
+            explainer = build(model)
+            self._stats["explainer_builds"] += 1
+            self._explainers[(key, kind)] = (stamp, explainer)
+            return explainer
+
+    def get_explainer(self, model_path=MODEL_PATH):
+        """Returns a TreeExplainer built once per version of the model file."""
+        def build(model):
+            import shap  # Heavy import, only paid by callers that need explanations
+            return shap.TreeExplainer(model)
+        return self._derived(model_path, "tree_explainer", build)
+
+    def get_shap_engine(self, model_path=MODEL_PATH):
+        """Returns the predicted-class TreeShapEngine for the current version of the model file."""
+        from src.triage_engine.compiled_forest import CompiledForest
+        from src.explainability.tree_shap import TreeShapEngine
+        return self._derived(model_path, "shap_engine", lambda model: TreeShapEngine(CompiledForest.from_sklearn(model)))
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_artifacts"] = len(self._artifacts)
+            stats["cached_explainers"] = len(self._explainers)
+            return stats
+
+    def clear(self):
+        with self._lock:
+            self._artifacts.clear()
+            self._explainers.clear()
+
+
+_registry = ModelRegistry()
+
+
+def get_registry():
+    """Returns the process-wide registry shared by the processor, SHAP path and UI."""
+    return _registry
@@ -0,0 +1,133 @@
+import heapq
+import itertools
+import threading
+
+
+def priority_key(entry, seq):
+    """Heap order: highest level first, worsening before stable, then earliest upsert."""
+    return (-int(entry["level"]), 0 if entry.get("trend") == "worsening" else 1, seq)
+
+
+class TriageQueue:
+    """Indexed binary min-heap of board entries keyed by patient ID.
+
+    A position map lets a patient be re-ranked or discharged in O(log n) without a scan,
+    and top_k(k) walks the heap with a small frontier heap in O(k log k), so the board
+    only ever touches the cards it is about to render. Ordering matches
+    TriageStore.top_queue: a re-triaged patient moves behind its ties.
+    """
+    def __init__(self, entries=()):
+        self._heap = []        # [key, patient_id, entry]
+        self._position = {}    # patient_id -> index in _heap
+        self._counter = itertools.count(1)
+        self._lock = threading.RLock()
+        for entry in entries:
+            self.upsert(entry)
+
+    def reload(self, entries):
+        """Replaces the contents, e.g. after another process changed the persisted queue."""
+        with self._lock:
+            self._heap = []
+            self._position = {}
+            for entry in entries:
+                self.upsert(entry)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, patient_id):
+        return patient_id in self._position
+
+    def get(self, patient_id):
+        with self._lock:
+            index = self._position.get(patient_id)
+            return None if index is None else self._heap[index][2]
+
+    def upsert(self, entry):
+        """Inserts a new patient or re-ranks an existing one (new level/trend)."""
+        with self._lock:
+            patient_id = entry["id"]
+            key = priority_key(entry, next(self._counter))
+            index = self._position.get(patient_id)
+            if index is None:
+                self._heap.append([key, patient_id, entry])
+                self._position[patient_id] = len(self._heap) - 1
+                self._sift_up(len(self._heap) - 1)
+            else:
+                self._heap[index] = [key, patient_id, entry]
+                self._restore(index)
+
+    def update_level(self, patient_id, level, trend=None):
+        with self._lock:
+            current = self.get(patient_id)
+            if current is None:
+                raise KeyError(patient_id)
+            entry = dict(current, level=level)
+            if trend is not None:
+                entry["trend"] = trend
+            self.upsert(entry)
+
+    def remove(self, patient_id):
+        """Discharges a patient; returns its entry, or None if it was not queued."""
+        with self._lock:
+            index = self._position.pop(patient_id, None)
+            if index is None:
+                return None
+            removed = self._heap[index]
+            last = self._heap.pop()
+            if index < len(self._heap):
+                self._heap[index] = last
+                self._position[last[1]] = index
+                self._restore(index)
+            return removed[2]
+
+    def top_k(self, k, offset=0):
+        """Entries ranked offset..offset+k-1 in priority order, without sorting the whole heap."""
+        with self._lock:
+            heap = self._heap
+            wanted = min(offset + k, len(heap))
+            result = []
+            frontier = [(heap[0][0], 0)] if heap else []
+            while frontier and len(result) < wanted:
+                _, index = heapq.heappop(frontier)
+                result.append(heap[index][2])
+                for child in (2 * index + 1, 2 * index + 2):
+                    if child < len(heap):
+                        heapq.heappush(frontier, (heap[child][0], child))
+            return result[offset:]
+
+    # --- Heap maintenance ---
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._position[heap[i][1]] = i
+        self._position[heap[j][1]] = j
+
+    def _sift_up(self, index):
+        heap = self._heap
+        while index > 0:
+            parent = (index - 1) // 2
+            if heap[index][0] >= heap[parent][0]:
+                break
+            self._swap(index, parent)
+            index = parent
+
+    def _sift_down(self, index):
+        heap = self._heap
+        size = len(heap)
+        while True:
+            smallest = index
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size and heap[child][0] < heap[smallest][0]:
+                    smallest = child
+            if smallest == index:
+                return
+            self._swap(index, smallest)
+            index = smallest
+
+    def _restore(self, index):
+        if index > 0 and self._heap[index][0] < self._heap[(index - 1) // 2][0]:
+            self._sift_up(index)
+        else:
+            self._sift_down(index)
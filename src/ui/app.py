@@ -4,26 +4,83 @@ import streamlit as st
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
-from src.ingestion.parsers import DigitalPDFParser, OCRImageParser
-from src.explainability.explain import process_triage_and_shap
-from src.explainability.medgemma import BioMistralExplainer
+from src.ingestion.cache import ExtractionCache
+from src.ingestion.pipeline import ExtractionError
+from src.explainability.llm_cache import CachedBioMistralExplainer
+from src.pipeline.triage_pipeline import TriagePipeline
+from src.storage.cache import TieredCache
+from src.storage.triage_store import TriageStore
+from src.triage_engine.triage_queue import TriageQueue
+from src.triage_engine.registry import get_registry
+from src.triage_engine.bundle import get_active_bundle
+from src.monitoring.metrics import REGISTRY
+from src.monitoring.drift import DRIFT
+from src.runtime.warmup import WarmUp
 
 st.set_page_config(page_title="AI Clinical Triage Engine", page_icon="🏥", layout="wide")
 
 # ==========================================
-# 1. Initialize Global State (RAM Database)
+# 1. Initialize Global State (SQLite store shared by every session, survives restarts)
 # ==========================================
-if 'history' not in st.session_state:
-    st.session_state.history = {}
-if 'triage_queue' not in st.session_state:
-    st.session_state.triage_queue = [] 
+@st.cache_resource
+def load_store():
+    return TriageStore()
+
+store = load_store()
+
+@st.cache_resource
+def load_triage_queue():
+    # In-memory indexed heap mirrored from the store; re-ranking and paging never sort the board
+    return TriageQueue(store.queue_entries())
+
+triage_queue = load_triage_queue()
 
 @st.cache_resource
 def load_llm():
-    return BioMistralExplainer()
+    # Pooled, streaming client; its event loop lives on a background thread across reruns.
+    # Answers are cached on disk for a day so identical prompts skip the 7B model entirely.
+    return CachedBioMistralExplainer(cache=TieredCache(path="cache/llm_cache.sqlite", max_memory_items=1024, ttl=24 * 3600, name="llm"))
 
 biomistral = load_llm()
 
+@st.cache_resource
+def load_extraction_cache():
+    # Re-uploaded referrals (rechecks, transfers) are served from here without re-parsing
+    return ExtractionCache(path="cache/extraction_cache.sqlite")
+
+extraction_cache = load_extraction_cache()
+
+@st.cache_resource
+def load_pipeline():
+    # Same orchestration as the CLI/HTTP service; owns the OCR process pool (one per server process)
+    return TriagePipeline(store=store, queue=triage_queue, llm=biomistral, extraction_cache=extraction_cache)
+
+pipeline = load_pipeline()
+
+@st.cache_resource
+def load_warmup():
+    # Model bundle, SHAP explainers and the hybrid parser's RapidOCR session, loaded on a
+    # background thread once the first page is on screen (TRIAGE_WARMUP_OCR=0 skips OCR)
+    return WarmUp(pipeline.warmup_steps(ocr=os.environ.get("TRIAGE_WARMUP_OCR", "1") != "0"))
+
+warmup = load_warmup()
+
+# Polls the warm-up thread until it is done; the next full rerun stops polling
+@st.fragment(run_every=None if warmup.ready else 1.0)
+def readiness_indicator():
+    status = warmup.status()
+    failed = [name for name, step in status.items() if step["state"] == "failed"]
+    if not warmup.ready:
+        steps = ", ".join(f"{name} {'✓' if step['state'] == 'done' else '…'}" for name, step in status.items())
+        st.info(f"🟡 Warming up: {steps}. Triage works now; the first one may be slower.")
+    elif failed:
+        st.warning(f"🟠 Ready, but {', '.join(failed)} failed to preload and will load on first use.")
+    else:
+        st.success("🟢 Ready: models, SHAP and OCR are loaded.")
+
+with st.sidebar:
+    readiness_indicator()
+
 st.sidebar.header("⚙️ Model Configuration")
 all_available_features = [
     'age', 'heart_rate', 'systolic_blood_pressure', 'oxygen_saturation', 
@@ -36,6 +93,38 @@ selected_features = st.sidebar.multiselect(
     default=['age', 'body_temperature', 'oxygen_saturation', 'heart_rate', 'pain_level', 'chronic_disease_count']
 )
 
+with st.sidebar.expander("📦 Model Registry"):
+    active_bundle = get_active_bundle()
+    st.caption(f"Active bundle: {active_bundle.version}" if active_bundle else "No bundle yet (using loose pickles)")
+    st.json(get_registry().get_stats())
+with st.sidebar.expander("🗂️ Extraction Cache"):
+    st.json(extraction_cache.get_stats())
+with st.sidebar.expander("💬 LLM Answer Cache"):
+    st.json(biomistral.get_stats())
+with st.sidebar.expander("⏱️ Pipeline Throughput"):
+    st.json(pipeline.get_stats())
+with st.sidebar.expander("🩺 Diagnostics"):
+    # Latency per call of each stage since the server started (pdf_text, ocr_page, parse_vitals, predict, shap, llm)
+    metrics = REGISTRY.snapshot()
+    if metrics["stages"]:
+        st.dataframe([{"stage": name, **stage} for name, stage in metrics["stages"].items()], use_container_width=True)
+    else:
+        st.caption("No stage has run yet.")
+    st.json(metrics["counters"])
+    st.download_button("Prometheus metrics", REGISTRY.export_prometheus(), file_name="triage_metrics.prom")
+    st.caption("Background warm-up")
+    st.json(warmup.status())
+    # Incoming features vs. the training data, and how often each parser misses a vital
+    st.caption("Input drift")
+    drift = DRIFT.snapshot()
+    for alert in drift["alerts"]:
+        st.warning(alert)
+    if drift["patients"]:
+        st.dataframe([{"feature": name, **stats} for name, stats in drift["features"].items()], use_container_width=True)
+        st.json(drift["extraction"])
+    else:
+        st.caption("No patient triaged yet.")
+
 st.title("🏥 Enterprise AI Clinical Triage System")
 
 # ==========================================
@@ -50,11 +139,11 @@ with tab1:
     st.header("Upload Clinical Records")
     processing_mode = st.radio(
         "Select Extraction Engine:", 
-        ["⚡ Fast Digital Extraction (Native PDFs)", "🔍 Deep Vision OCR (Scans/Images)"],
+        ["🧠 Hybrid Auto-Detect (Per-Page)", "⚡ Fast Digital Extraction (Native PDFs)", "🔍 Deep Vision OCR (Scans/Images)"],
         horizontal=True
     )
     
-    files = st.file_uploader("Upload Scanned or Digital PDFs", type=["pdf", "png", "jpg"], accept_multiple_files=True)
+    files = st.file_uploader("Upload Scanned or Digital PDFs", type=["pdf", "png", "jpg", "jpeg", "tif", "tiff"], accept_multiple_files=True)
     
     if files:
         st.subheader("Map Patient IDs to Files")
@@ -65,62 +154,35 @@ with tab1:
                 patient_map[file.name] = st.text_input(f"ID for {file.name[:15]}...", f"P-10{i+1}")
 
         if st.button("🚀 Run Batch Triage", type="primary"):
-            if "Fast Digital" in processing_mode:
-                parser = DigitalPDFParser()
+            if "Hybrid" in processing_mode:
+                mode = "hybrid"
+            elif "Fast Digital" in processing_mode:
+                mode = "digital"
             else:
-                with st.spinner("Loading Deep Vision Engine..."):
-                    parser = OCRImageParser()
-                    
-            for file in files:
-                p_id = patient_map[file.name]
-                with st.spinner(f"Analyzing {file.name}..."):
-                    features = parser.extract_from_file(file)
-                    features['pain_level'] = features.get('pain_level', 5)
-                    features['arrival_mode'] = features.get('arrival_mode', 'walk_in')
-                    features['chronic_disease_count'] = features.get('chronic_disease_count', 0)
-                    features['previous_er_visits'] = features.get('previous_er_visits', 0)
-                    
-                    # 1. Get ML Risk Level
-                    ai_result = process_triage_and_shap(features, selected_features)
-                    triage_level = ai_result.get('triage_level', 0)
-                    top_factors = ai_result.get('top_factors', [])
-                    shap_str = ", ".join([f"{f['feature']} ({f['direction']})" for f in top_factors])
-                    
-                    # 2. Get all 3 outputs from the LLM using the Delimiter Trick
-                    with st.spinner(f"Generating LLM Routing & Synthesis for {p_id}..."):
-                        bio_dict = biomistral.get_explanation(triage_level, shap_str, features.get('raw_text', 'No clinical context.'))
-                    
-                    # 3. Longitudinal History
-                    history_list = st.session_state.history.get(p_id, [])
-                    trend = "stable"
-                    deltas = {"spo2": None, "temp": None, "hr": None}
-                    
-                    if len(history_list) > 0:
-                        prev = history_list[-1]['features']
-                        if 'oxygen_saturation' in features and 'oxygen_saturation' in prev:
-                            deltas['spo2'] = features['oxygen_saturation'] - prev['oxygen_saturation']
-                        if 'body_temperature' in features and 'body_temperature' in prev:
-                            deltas['temp'] = round(features['body_temperature'] - prev['body_temperature'], 1)
-                        if 'heart_rate' in features and 'heart_rate' in prev:
-                            deltas['hr'] = features['heart_rate'] - prev['heart_rate']
-
-                        if features.get('oxygen_saturation', 100) < prev.get('oxygen_saturation', 100) or features.get('body_temperature', 37) > prev.get('body_temperature', 37):
-                            trend = "worsening"
-
-                    st.session_state.history.setdefault(p_id, []).append({"features": features, "triage_level": triage_level})
-                    
-                    # Map the Delimiter Dictionary out to the queue entry!
-                    queue_entry = {
-                        "id": p_id, "level": triage_level, "trend": trend, 
-                        "features": features, "shap": shap_str, "deltas": deltas,
-                        "bio_synthesis": bio_dict.get('short_synthesis', 'N/A'),
-                        "bio_action": bio_dict.get('recommended_action', 'N/A'),
-                        "bio_department": bio_dict.get('department_routing', 'N/A')
-                    }
-                    
-                    st.session_state.triage_queue = [q for q in st.session_state.triage_queue if q['id'] != p_id]
-                    st.session_state.triage_queue.append(queue_entry)
-                    
+                # Pages are OCR'd across worker processes; results stream back in upload order
+                mode = "ocr"
+            batch_ids = [patient_map[file.name] for file in files]
+
+            # Extract every document first so the model runs once for the whole batch
+            progress = st.progress(0.0, text="Extracting documents...")
+            def on_extracted(i, features):
+                if isinstance(features, ExtractionError):
+                    st.warning(f"Could not read {files[i].name}: {features.cause}")
+                progress.progress((i + 1) / len(files), text=f"Analyzed {files[i].name}")
+
+            # LLM answers are shown as soon as they stream in
+            live_cards = [st.empty() for _ in batch_ids]
+            partial = [{} for _ in batch_ids]
+            def on_llm_field(idx, name, value):
+                partial[idx][name] = value
+                live_cards[idx].caption(f"**{batch_ids[idx]}** — " + " | ".join(partial[idx].values()))
+
+            with st.spinner("Scoring ML risk and generating LLM Routing & Synthesis..."):
+                pipeline.triage_documents(
+                    files, batch_ids, mode=mode, selected_features=selected_features,
+                    on_extracted=on_extracted, on_llm_field=on_llm_field
+                )
+
             st.success("Batch Processed! Check the Live Triage Board.")
 
 # ------------------------------------------
@@ -156,43 +218,10 @@ with tab2:
                 'raw_text': f"Patient arrived via {arrival_mode} complaining of {pain}/10 pain. Vitals: HR {hr}, SpO2 {spo2}."
             }
             
-            with st.spinner("Processing AI Risk..."):
-                # 1. Get ML Risk Level
-                ai_result = process_triage_and_shap(manual_features, selected_features)
-                t_level = ai_result.get('triage_level', 0)
-                top_factors = ai_result.get('top_factors', [])
-                shap_str = ", ".join([f"{f['feature']} ({f['direction']})" for f in top_factors])
-                
-                # 2. Get all 3 outputs from the LLM using the Delimiter Trick
-                with st.spinner("Generating LLM Routing & Synthesis..."):
-                    bio_dict = biomistral.get_explanation(t_level, shap_str, manual_features['raw_text'])
-                
-                # 3. History Tracking
-                history_list = st.session_state.history.get(p_id_manual, [])
-                trend = "stable"
-                deltas = {"spo2": None, "temp": None, "hr": None}
-                
-                if len(history_list) > 0:
-                    prev = history_list[-1]['features']
-                    deltas['spo2'] = spo2 - prev.get('oxygen_saturation', 100)
-                    deltas['temp'] = round(temp - prev.get('body_temperature', 37.0), 1)
-                    deltas['hr'] = hr - prev.get('heart_rate', 80)
-                    if spo2 < prev.get('oxygen_saturation', 100): trend = "worsening"
-
-                st.session_state.history.setdefault(p_id_manual, []).append({"features": manual_features, "triage_level": t_level})
-                
-                # Map the Delimiter Dictionary out to the queue entry!
-                queue_entry = {
-                    "id": p_id_manual, "level": t_level, "trend": trend, 
-                    "features": manual_features, "shap": shap_str, "deltas": deltas,
-                    "bio_synthesis": bio_dict.get('short_synthesis', 'N/A'),
-                    "bio_action": bio_dict.get('recommended_action', 'N/A'),
-                    "bio_department": bio_dict.get('department_routing', 'N/A')
-                }
-                
-                st.session_state.triage_queue = [q for q in st.session_state.triage_queue if q['id'] != p_id_manual]
-                st.session_state.triage_queue.append(queue_entry)
-                
+            with st.spinner("Processing AI Risk & Generating LLM Routing & Synthesis..."):
+                # ML risk, SHAP, LLM, history and queue upsert, exactly as for uploaded documents
+                t_level = pipeline.triage([(p_id_manual, manual_features)], selected_features)[0]['level']
+
             st.success(f"Patient {p_id_manual} prioritized at Level {t_level}! Check the Live Triage Board.")
 
 # ------------------------------------------
@@ -201,14 +230,22 @@ with tab2:
 with tab3:
     st.header("🚨 Live Triage Board")
     
-    if not st.session_state.triage_queue:
+    # Patients triaged by the batch CLI or HTTP service land in the store first
+    if store.changed_externally():
+        triage_queue.reload(store.queue_entries())
+        # Their new encounters are re-read from the store the next time those patients are seen
+        pipeline.longitudinal.reset()
+    queue_size = len(triage_queue)
+    if queue_size == 0:
         st.info("No patients processed yet. Upload PDFs or use the manual intake form.")
     else:
-        sorted_queue = sorted(
-            st.session_state.triage_queue, 
-            key=lambda x: (x['level'], 1 if x['trend'] == 'worsening' else 0), 
-            reverse=True
-        )
+        # Only the visible page of cards is built; the heap hands back just that slice
+        page_col, size_col = st.columns(2)
+        page_size = size_col.selectbox("Cards per page", [10, 25, 50, 100], index=1)
+        page_count = (queue_size + page_size - 1) // page_size
+        page = page_col.number_input("Page", min_value=1, max_value=page_count, value=1)
+        st.caption(f"Page {page} of {page_count} — {queue_size} queued patients.")
+        sorted_queue = triage_queue.top_k(page_size, offset=(page - 1) * page_size)
 
         for patient in sorted_queue:
             if patient['level'] >= 2:
@@ -223,6 +260,10 @@ with tab3:
                 
                 if patient['trend'] == 'worsening':
                     st.error("⚠️ TREND ALERT: Patient condition is deteriorating compared to last visit.")
+                if patient.get('news2') is not None:
+                    news2_delta = patient.get('news2_delta')
+                    change = f" ({news2_delta:+d} since last visit)" if news2_delta else ""
+                    st.caption(f"**NEWS2 (partial):** {patient['news2']}{change} — {patient['news2_risk']} risk")
                 
                 m1, m2, m3, m4 = st.columns(4)
                 
@@ -246,4 +287,12 @@ with tab3:
                 with action_col2:
                     st.warning(f"**🏥 Route to Department:**\n\n{patient['bio_department']}")
 
-                st.markdown("---")
\ No newline at end of file
+                if st.button("✅ Discharge", key=f"discharge_{patient['id']}"):
+                    triage_queue.remove(patient['id'])
+                    store.remove_from_queue(patient['id'])
+                    st.rerun()
+
+                st.markdown("---")
+
+# Started only after everything above has rendered, so it never delays the first paint
+warmup.start()
@@ -0,0 +1,124 @@
+import asyncio
+import socket
+import threading
+import time
+
+from src.explainability.async_medgemma import AsyncBioMistralExplainer, FIELDS
+from src.explainability.medgemma import OFFLINE_RESULT, TIMEOUT_RESULT
+from src.explainability.ollama_stub import OllamaStubHandler, start_stub_server
+
+REQUEST = (2, "heart_rate (+0.31)", "chest pain")
+
+
+def _closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/api/generate"
+
+
+def test_streamed_tokens_are_assembled_and_fields_fire_early():
+    server, url = start_stub_server(response_text="Unstable vitals. ||| " + "Repeat ECG " * 15 + "||| Cardiology",
+                                    token_delay=0.01)
+    explainer = AsyncBioMistralExplainer(url=url)
+    fields = []
+
+    async def scenario():
+        try:
+            result = await explainer.get_explanation(
+                *REQUEST, on_field=lambda name, value: fields.append((name, value, time.perf_counter())))
+            return result, time.perf_counter()
+        finally:
+            await explainer.aclose()
+
+    try:
+        result, finished = asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+    assert result["short_synthesis"] == "Unstable vitals."
+    assert result["recommended_action"] == ("Repeat ECG " * 15).strip()
+    assert result["department_routing"] == "Cardiology"
+    assert [(name, value) for name, value, _ in fields] == [(name, result[name]) for name in FIELDS]
+    # The synthesis is handed out while the remaining ~30 tokens are still streaming
+    assert finished - fields[0][2] > 0.1
+
+
+def test_concurrency_is_bounded_by_the_semaphore():
+    server, url = start_stub_server(token_delay=0.01)
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0}
+
+    class CountingHandler(OllamaStubHandler):
+        def do_POST(self):
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            try:
+                super().do_POST()
+            finally:
+                with lock:
+                    active["now"] -= 1
+
+    server.RequestHandlerClass = CountingHandler
+    explainer = AsyncBioMistralExplainer(url=url, max_concurrency=2)
+    streamed = []
+
+    async def scenario():
+        try:
+            return await explainer.explain_many([REQUEST] * 6, on_field=lambda *event: streamed.append(event))
+        finally:
+            await explainer.aclose()
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+    assert active["peak"] == 2
+    assert server.request_count == 6
+    assert all(result["department_routing"] == "Emergency Medicine" for result in results)
+    assert sorted({index for index, _, _ in streamed}) == list(range(6))
+
+
+def test_slow_model_returns_the_timeout_result():
+    server, url = start_stub_server(token_delay=0.05)
+    explainer = AsyncBioMistralExplainer(url=url)
+
+    async def scenario():
+        try:
+            return await explainer.get_explanation(*REQUEST, timeout=0.1)
+        finally:
+            await explainer.aclose()
+
+    try:
+        assert asyncio.run(scenario()) == TIMEOUT_RESULT
+    finally:
+        server.shutdown()
+
+
+def test_unreachable_server_returns_the_offline_result():
+    explainer = AsyncBioMistralExplainer(url=_closed_port_url(), connect_timeout=1)
+    try:
+        assert explainer.get_explanation_sync(*REQUEST) == OFFLINE_RESULT
+    finally:
+        explainer.close()
+
+
+def test_sync_bridge_reuses_one_session_across_calls():
+    server, url = start_stub_server()
+    explainer = AsyncBioMistralExplainer(url=url)
+    try:
+        first = explainer.get_explanation_sync(*REQUEST)
+        session = explainer._session
+        second = explainer.submit(*REQUEST).result(timeout=10)
+        events = list(explainer.iter_explanations([REQUEST, REQUEST]))
+
+        assert first == second
+        assert explainer._session is session and not session.closed
+        assert sorted(event[1] for event in events if event[0] == "done") == [0, 1]
+        assert [event[2] for event in events if event[0] == "field" and event[1] == 0] == list(FIELDS)
+        assert server.request_count == 4
+    finally:
+        explainer.close()
+        server.shutdown()
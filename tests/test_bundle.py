@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _bundle_cli(*args):
+    return subprocess.run([sys.executable, "-m", "src.triage_engine.bundle", *args],
+                          cwd=ROOT, capture_output=True, text=True)
+
+
+def test_verify_without_a_current_bundle_fails_cleanly(tmp_path):
+    result = _bundle_cli("verify", "--models-dir", str(tmp_path))
+
+    assert result.returncode != 0
+    assert "no current bundle" in result.stderr
+    assert "Traceback" not in result.stderr
@@ -0,0 +1,46 @@
+import pickle
+
+from src.storage.cache import TieredCache
+
+
+def _size(value):
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _stored(cache):
+    return cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+
+def test_running_total_tracks_insert_replace_and_evict(tmp_path):
+    cache = TieredCache(path=str(tmp_path / "cache.sqlite"), max_memory_items=1, max_disk_bytes=3 * _size("x" * 100))
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+
+    cache.set("a", "x" * 100)
+    cache.set("b", "x" * 100)
+    cache.set("a", "x" * 50)
+    # Under the limit, no store re-sums the table
+    assert not any("SUM(size)" in statement for statement in statements)
+    assert cache._disk_bytes == _stored(cache) == _size("x" * 100) + _size("x" * 50)
+
+    cache.set("c", "x" * 100)
+    cache.set("d", "x" * 100)
+    assert cache._disk_bytes == _stored(cache) <= cache.max_disk_bytes
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get("b") is None and cache.get("d") == "x" * 100
+
+    total = cache._disk_bytes
+    cache.close()
+    reopened = TieredCache(path=str(tmp_path / "cache.sqlite"))
+    assert reopened._disk_bytes == total
+    reopened.clear()
+    assert reopened._disk_bytes == 0
+
+
+def test_expired_rows_leave_the_running_total(tmp_path):
+    cache = TieredCache(path=str(tmp_path / "cache.sqlite"), max_memory_items=0, ttl=60)
+    cache.set("a", "x" * 100)
+    cache._conn.execute("UPDATE cache SET created = created - 120")
+
+    assert cache.get("a") is None
+    assert cache._disk_bytes == _stored(cache) == 0
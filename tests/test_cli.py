@@ -0,0 +1,95 @@
+import io
+import json
+
+from src.ingestion.pipeline import ExtractionError
+from src.pipeline.cli import iter_inputs, run, JsonlWriter
+
+
+class FakePipeline:
+    """extract/triage with the TriagePipeline contract; unknown arrival modes fail like the encoder does."""
+    def __init__(self):
+        self.triage_calls = 0
+
+    def extract(self, documents, mode=None):
+        for index, document in enumerate(documents):
+            if document.endswith("corrupt.pdf"):
+                yield index, ExtractionError(index, ValueError("Failed to open stream"))
+            else:
+                yield index, {"heart_rate": 90}
+
+    def triage(self, patients, selected_features=None):
+        self.triage_calls += 1
+        for _, features in patients:
+            if features.get("arrival_mode") not in (None, "walk_in", "ambulance"):
+                raise ValueError(f"y contains previously unseen labels: {features['arrival_mode']!r}")
+        return [{"id": patient_id, "level": 3} for patient_id, _ in patients]
+
+
+def _run(lines, tmp_path, batch_size=256):
+    source = tmp_path / "backlog.jsonl"
+    source.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    output = tmp_path / "out.jsonl"
+    log = io.StringIO()
+    writer = JsonlWriter(str(output))
+    try:
+        counts = run(FakePipeline(), iter_inputs(str(source)), writer, batch_size, log=log)
+    finally:
+        writer.close()
+    entries = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    return counts, entries, log.getvalue()
+
+
+def test_malformed_lines_are_reported_and_skipped(tmp_path):
+    counts, entries, log = _run(['{"patient_id": "A", "heart_rate": 80}', '{"patient_id": "B", ', '[1, 2]',
+                                 '{"patient_id": "C", "heart_rate": 70}'], tmp_path)
+
+    assert counts == (4, 2)
+    assert [entry["id"] for entry in entries] == ["A", "row-2", "row-3", "C"]
+    assert entries[1]["error"].startswith("line 2: invalid record")
+    assert "line 3" in entries[2]["error"] and "JSON object" in entries[2]["error"]
+    assert "Skipped line 2 (row-2)" in log
+
+
+def test_non_object_features_are_reported_and_skipped(tmp_path):
+    counts, entries, _ = _run(['{"patient_id": "A", "features": "abc"}', '{"patient_id": "B", "features": [1, 2]}',
+                               '{"patient_id": "C", "heart_rate": 70}'], tmp_path)
+
+    assert counts == (3, 2)
+    assert [entry["id"] for entry in entries] == ["row-1", "row-2", "C"]
+    assert "record 1 (A)" in entries[0]["error"] and "got str" in entries[0]["error"]
+    assert "record 2 (B)" in entries[1]["error"] and "got list" in entries[1]["error"]
+
+
+def test_rejected_patient_does_not_fail_its_batch(tmp_path):
+    counts, entries, log = _run(['{"patient_id": "A", "arrival_mode": "walk_in"}',
+                                 '{"patient_id": "B", "arrival_mode": "hovercraft"}',
+                                 '{"patient_id": "C", "arrival_mode": "ambulance"}'], tmp_path)
+
+    assert counts == (3, 1)
+    assert [entry.get("level") for entry in entries] == [3, None, 3]
+    assert entries[1]["id"] == "B" and "unseen labels" in entries[1]["error"]
+    assert "Skipped line 2 (B): ValueError" in log
+
+
+def test_unreadable_documents_become_error_entries(tmp_path):
+    counts, entries, _ = _run(['{"patient_id": "A", "path": "good.pdf"}', '{"patient_id": "B", "path": "corrupt.pdf"}'],
+                              tmp_path)
+
+    assert counts == (2, 1)
+    assert entries[0] == {"id": "A", "level": 3}
+    assert entries[1]["id"] == "B" and "Failed to open stream" in entries[1]["error"]
+
+
+def test_input_file_is_closed_when_exhausted(tmp_path, monkeypatch):
+    source = tmp_path / "backlog.jsonl"
+    source.write_text('{"patient_id": "A"}\n', encoding="utf-8")
+    opened = []
+    real_open = open
+
+    def tracking_open(*args, **kwargs):
+        opened.append(real_open(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr("builtins.open", tracking_open)
+    assert [item[1] for item in iter_inputs(str(source))] == ["A"]
+    assert opened and all(stream.closed for stream in opened)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+from sklearn.tree import DecisionTreeClassifier
+
+from src.triage_engine.compiled_forest import CompiledForest
+from src.triage_engine.processor import MODEL_FEATURES
+
+ARRIVAL_MODES = ["ambulance", "walk_in", "wheelchair"]
+
+
+def _patients(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'age': rng.integers(1, 95, n),
+        'heart_rate': rng.normal(85, 20, n).round(1),
+        'systolic_blood_pressure': rng.normal(125, 25, n).round(),
+        'oxygen_saturation': rng.normal(95, 3, n).round(1),
+        'body_temperature': rng.normal(37.2, 0.8, n).round(2),
+        'pain_level': rng.integers(0, 11, n),
+        'chronic_disease_count': rng.integers(0, 5, n),
+        'previous_er_visits': rng.integers(0, 6, n),
+        'arrival_mode': rng.choice(ARRIVAL_MODES, n),
+    })[MODEL_FEATURES]
+
+
+def _fit(n=400, seed=0, **params):
+    patients = _patients(n, seed)
+    encoder = LabelEncoder().fit(ARRIVAL_MODES)
+    X = patients.assign(arrival_mode=encoder.transform(patients['arrival_mode']))
+    y = np.random.default_rng(seed + 1).integers(0, 4, n)
+    model = RandomForestClassifier(n_estimators=30, max_depth=6, random_state=seed, n_jobs=1, **params).fit(X, y)
+    return model, encoder, patients, X
+
+
+def test_predict_proba_matches_sklearn_bit_for_bit():
+    model, encoder, _, X = _fit()
+    compiled = CompiledForest.from_sklearn(model, encoder)
+
+    X_new = _fit(n=300, seed=5)[3]
+    assert np.array_equal(compiled.predict_proba(X_new), model.predict_proba(X_new))
+    assert np.array_equal(compiled.predict(X_new), model.predict(X_new))
+
+
+def test_single_node_tree():
+    model, encoder, _, X = _fit()
+    # A stump that never splits: min_samples_split larger than the training set
+    stump = DecisionTreeClassifier(min_samples_split=len(X) + 1, random_state=0).fit(X, model.classes_[np.arange(len(X)) % 4])
+    assert stump.tree_.node_count == 1
+    model.estimators_[0] = stump
+
+    compiled = CompiledForest.from_sklearn(model, encoder)
+    assert np.array_equal(compiled.predict_proba(X), model.predict_proba(X))
+
+
+def test_float32_threshold_ties():
+    model, encoder, _, X = _fit()
+    compiled = CompiledForest.from_sklearn(model, encoder)
+
+    # Values on, just below and just above each split threshold, given as float64:
+    # both runtimes must round them to float32 the same way before comparing
+    rows = []
+    for estimator in model.estimators_[:5]:
+        tree = estimator.tree_
+        for feature, threshold in zip(tree.feature, tree.threshold):
+            if feature < 0:
+                continue
+            for value in (threshold, np.nextafter(threshold, -np.inf), np.nextafter(threshold, np.inf),
+                          np.float32(threshold), np.nextafter(np.float32(threshold), np.float32(np.inf))):
+                row = X.iloc[len(rows) % len(X)].to_numpy(np.float64, copy=True)
+                row[feature] = value
+                rows.append(row)
+    X_ties = pd.DataFrame(rows, columns=X.columns)
+
+    assert np.array_equal(compiled.predict_proba(X_ties), model.predict_proba(X_ties))
+
+
+def test_arrival_mode_encoding_matches_label_encoder():
+    model, encoder, patients, X = _fit()
+    compiled = CompiledForest.from_sklearn(model, encoder)
+
+    records = patients.to_dict('records')
+    assert np.array_equal(compiled.encode(records), X.to_numpy(np.float32))
+    columns = {name: patients[name].tolist() for name in MODEL_FEATURES}
+    assert np.array_equal(compiled.predict_proba(compiled.encode(columns)), model.predict_proba(X))
+
+    with pytest.raises(ValueError, match="previously unseen labels"):
+        compiled.encode([{**records[0], 'arrival_mode': 'helicopter'}])
@@ -0,0 +1,39 @@
+from src.monitoring.drift import DriftMonitor, reference_stats
+
+
+def _gauge(monitor, name):
+    for metric, _, samples in monitor.collect():
+        if metric == name:
+            return {labels["feature"]: value for labels, value in samples}
+    raise KeyError(name)
+
+
+def test_categorical_without_reference_is_not_defaulted():
+    monitor = DriftMonitor(features=("arrival_mode", "heart_rate"))
+    monitor.observe_batch([{"arrival_mode": "walk_in", "heart_rate": 88}] * 3)
+
+    arrival = monitor.snapshot()["features"]["arrival_mode"]
+    assert arrival["defaulted_rate"] == 0
+    assert arrival["count"] == 0 and arrival["mean"] is None
+    assert _gauge(monitor, "triage_feature_defaulted_ratio")["arrival_mode"] == 0
+
+
+def test_missing_categorical_is_still_defaulted():
+    monitor = DriftMonitor(features=("arrival_mode",))
+    monitor.observe_batch([{"arrival_mode": "ambulance"}, {}])
+
+    assert monitor.snapshot()["features"]["arrival_mode"]["defaulted_rate"] == 0.5
+
+
+def test_categorical_with_reference_bins_unseen_levels_separately():
+    import pandas as pd
+
+    reference = reference_stats(pd.DataFrame({"arrival_mode": ["walk_in", "ambulance", "walk_in"]}))
+    monitor = DriftMonitor(features=("arrival_mode",), min_count=1)
+    monitor.use_reference(reference)
+    monitor.observe_batch([{"arrival_mode": "helicopter"}] * 4)
+
+    arrival = monitor.snapshot()["features"]["arrival_mode"]
+    assert arrival["defaulted_rate"] == 0
+    assert arrival["recent"] == 4
+    assert arrival["psi"] > 0.25
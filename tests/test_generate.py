@@ -0,0 +1,17 @@
+import pandas as pd
+
+from src.synthetic.generate import DEFAULT_DATA_PATH, load_or_fit
+
+
+def test_saved_copula_is_refitted_when_conditioning_changes(tmp_path, capsys):
+    data_path = tmp_path / "triage.csv"
+    pd.read_csv(DEFAULT_DATA_PATH, nrows=400).to_csv(data_path, index=False)
+    model_path = str(tmp_path / "copula.json")
+
+    assert load_or_fit(model_path, data_path, by="triage_level").by == "triage_level"
+    assert load_or_fit(model_path, data_path, by="triage_level").by == "triage_level"
+    assert capsys.readouterr().err == ""
+
+    assert load_or_fit(model_path, data_path, by=None).by is None
+    assert "fitting again" in capsys.readouterr().err
+    assert load_or_fit(model_path, data_path, by=None).by is None
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from src.ingestion.pipeline import ParallelIngestionPipeline, ExtractionError
+from src.synthetic.charts import referral_pages, digital_pdf
+
+ROW = {"age": 61, "heart_rate": 104, "oxygen_saturation": 93, "body_temperature": 38.2,
+       "systolic_blood_pressure": 141, "diastolic_blood_pressure": 88, "chronic_disease_count": 1,
+       "arrival_mode": "ambulance", "pain_level": 6, "previous_er_visits": 0, "triage_level": 2}
+
+
+@pytest.fixture(scope="module")
+def ingestion():
+    with ParallelIngestionPipeline(mode="digital", max_workers=1) as pipeline:
+        yield pipeline
+
+
+def test_bad_documents_fail_alone(ingestion, tmp_path):
+    good = digital_pdf(referral_pages(ROW, random.Random(1)))
+    files = [good, b"%PDF-1.7 truncated", str(tmp_path / "missing.pdf"), good]
+
+    results = list(ingestion.run(files))
+
+    assert [index for index, _ in results] == [0, 1, 2, 3]
+    assert results[0][1]["heart_rate"] == 104 and results[3][1] == results[0][1]
+    for index in (1, 2):
+        error = results[index][1]
+        assert isinstance(error, ExtractionError) and error.index == index
+    assert isinstance(results[2][1].cause, FileNotFoundError)
+
+
+def test_workers_do_not_reuse_another_batchs_document(ingestion):
+    first = digital_pdf(referral_pages(ROW, random.Random(4)))
+    second = digital_pdf(referral_pages(dict(ROW, age=45), random.Random(4)))
+    assert ingestion.extract_many([first])[0]["age"] == 61
+    assert ingestion.extract_many([second])[0]["age"] == 45
+
+
+def test_pool_is_reusable_after_a_failure(ingestion):
+    list(ingestion.run([b"not a document"]))
+    good = digital_pdf(referral_pages(ROW, random.Random(2)))
+    assert ingestion.extract_many([good])[0]["age"] == 61
+
+
+def test_closing_the_generator_cancels_queued_chunks(ingestion):
+    good = digital_pdf(referral_pages(ROW, random.Random(3)))
+    results = ingestion.run([good] * 8)
+    next(results)
+    results.close()
+    assert ingestion.extract_many([good])[0]["age"] == 61
@@ -0,0 +1,24 @@
+from src.triage_engine.longitudinal import LongitudinalVitals
+
+BASELINE = {"oxygen_saturation": 97, "heart_rate": 80, "systolic_blood_pressure": 125, "body_temperature": 37.0}
+
+
+def test_news2_rise_alone_is_reported_but_not_worsening():
+    engine = LongitudinalVitals()
+    first = engine.observe("P1", BASELINE, recorded_at=0)
+    assert first["trend"] == "stable" and first["news2_delta"] is None
+
+    # Tachycardia and hypotension raise NEWS2 while SpO2 and temperature hold steady
+    update = engine.observe("P1", dict(BASELINE, heart_rate=135, systolic_blood_pressure=95), recorded_at=600)
+    assert update["news2"] == 5 and update["news2_delta"] == 5
+    assert update["trend"] == "stable"
+
+
+def test_falling_spo2_or_rising_temperature_is_worsening():
+    engine = LongitudinalVitals()
+    engine.observe("P1", BASELINE, recorded_at=0)
+    assert engine.observe("P1", dict(BASELINE, oxygen_saturation=95), recorded_at=600)["trend"] == "worsening"
+
+    engine.observe("P2", BASELINE, recorded_at=0)
+    update = engine.observe("P2", dict(BASELINE, body_temperature=37.4), recorded_at=600)
+    assert update["trend"] == "worsening" and update["news2_delta"] == 0
@@ -0,0 +1,69 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.pipeline.server import create_app
+from src.pipeline.triage_pipeline import TriagePipeline
+
+
+class FakePipeline:
+    """Just enough of TriagePipeline for the server; unknown arrival modes fail like the encoder does."""
+    mode = "digital"
+
+    def __init__(self):
+        self.triage_calls = []
+
+    def warmup_steps(self, ocr=False):
+        return []
+
+    def triage(self, patients):
+        self.triage_calls.append([patient_id for patient_id, _ in patients])
+        for _, features in patients:
+            if features.get("arrival_mode") not in (None, "walk_in", "ambulance"):
+                raise ValueError(f"y contains previously unseen labels: {features['arrival_mode']!r}")
+        return [{"id": patient_id, "level": 3} for patient_id, _ in patients]
+
+    def close(self):
+        pass
+
+
+def test_non_object_features_are_a_400():
+    async def scenario():
+        pipeline = TriagePipeline(use_llm=False, mode="digital", max_workers=1)
+        async with TestClient(TestServer(create_app(pipeline, workers=1))) as client:
+            response = await client.post("/triage", json={"patient_id": "P1", "features": [1, 2]})
+            return response.status, await response.json()
+
+    status, body = asyncio.run(scenario())
+    assert status == 400
+    assert "record 1 (P1)" in body["error"] and "must be an object" in body["error"]
+
+
+def test_bad_record_only_fails_its_own_request():
+    pipeline = FakePipeline()
+
+    async def scenario():
+        # A long window so both requests land in the same coalesced batch
+        async with TestClient(TestServer(create_app(pipeline, workers=1, max_wait=0.5))) as client:
+            good, bad = await asyncio.gather(
+                client.post("/triage", json={"patient_id": "P1", "arrival_mode": "walk_in"}),
+                client.post("/triage", json={"patient_id": "P2", "arrival_mode": "hovercraft"}),
+            )
+            return good.status, await good.json(), bad.status, await bad.json()
+
+    good_status, good_body, bad_status, bad_body = asyncio.run(scenario())
+    assert good_status == 200 and good_body["results"] == [{"id": "P1", "level": 3}]
+    assert bad_status == 422 and "unseen labels" in bad_body["error"]
+    assert sorted(sorted(call) for call in pipeline.triage_calls) == [["P1"], ["P1", "P2"], ["P2"]]
+
+
+def test_unreadable_document_is_a_422():
+    async def scenario():
+        pipeline = TriagePipeline(use_llm=False, mode="digital", max_workers=1)
+        async with TestClient(TestServer(create_app(pipeline, workers=1))) as client:
+            response = await client.post("/triage/document?patient_id=P1&filename=scan.pdf", data=b"%PDF-1.7 garbage")
+            return response.status, await response.json()
+
+    status, body = asyncio.run(scenario())
+    assert status == 422
+    assert body["error"].startswith("Could not extract the document")
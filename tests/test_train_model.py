@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+from src.triage_engine.train_model import SWEEP_GRID, hyperparameter_sweep, pick_fastest, sweep_candidates
+
+
+def test_zero_time_budget_still_evaluates_the_cheapest_candidate():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({'heart_rate': rng.normal(85, 20, 60), 'arrival_mode': rng.integers(0, 3, 60)}).astype(np.float32)
+    y = rng.integers(0, 3, 60)
+    encoder = LabelEncoder().fit(["ambulance", "walk_in", "wheelchair"])
+
+    results = hyperparameter_sweep(X, y, encoder, cv=2, time_budget=0, n_jobs=1)
+
+    assert len(results) == 1
+    best = pick_fastest(results, min_accuracy=1.1)
+    assert {name: best[name] for name in SWEEP_GRID} == sweep_candidates()[0]
@@ -0,0 +1,28 @@
+import io
+
+from src.pipeline import triage_pipeline
+from src.pipeline.cli import _triage_isolated
+from src.pipeline.triage_pipeline import TriagePipeline
+
+
+def _fake_explain_batch(features, selected_features):
+    for f in features:
+        if f["arrival_mode"] not in ("walk_in", "ambulance"):
+            raise ValueError(f"y contains previously unseen labels: {f['arrival_mode']!r}")
+    return [{"triage_level": 2, "top_factors": []} for _ in features]
+
+
+def test_retried_batch_is_sketched_once_per_accepted_patient(monkeypatch):
+    observed = []
+    monkeypatch.setattr(triage_pipeline, "explain_batch", _fake_explain_batch)
+    monkeypatch.setattr(triage_pipeline.drift, "observe_batch", observed.extend)
+    pipeline = TriagePipeline(use_llm=False, mode="digital", max_workers=1)
+    patients = {0: ("A", {"arrival_mode": "walk_in", "heart_rate": 80}),
+                1: ("B", {"arrival_mode": "hovercraft", "heart_rate": 90}),
+                2: ("C", {"heart_rate": 100})}
+    batch = [("features", patient_id, features, f"line {i + 1}") for i, (patient_id, features) in patients.items()]
+
+    entries = _triage_isolated(pipeline, batch, patients, None, io.StringIO())
+
+    assert "error" in entries[1] and entries[0]["level"] == entries[2]["level"] == 2
+    assert observed == [patients[0][1], patients[2][1]]
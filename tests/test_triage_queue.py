@@ -0,0 +1,81 @@
+import random
+
+from src.triage_engine.triage_queue import TriageQueue
+
+
+def _patient(patient_id, level, trend="stable"):
+    return {"id": patient_id, "level": level, "trend": trend}
+
+
+def _ids(entries):
+    return [entry["id"] for entry in entries]
+
+
+def _check_invariants(queue):
+    heap = queue._heap
+    for index in range(1, len(heap)):
+        assert heap[(index - 1) // 2][0] <= heap[index][0]
+    assert queue._position == {item[1]: index for index, item in enumerate(heap)}
+
+
+def test_ties_keep_arrival_order():
+    queue = TriageQueue(_patient(f"P{i}", 2) for i in range(6))
+    queue.upsert(_patient("W", 2, trend="worsening"))
+
+    assert _ids(queue.top_k(7)) == ["W", "P0", "P1", "P2", "P3", "P4", "P5"]
+
+
+def test_upsert_reprioritises_and_moves_behind_ties():
+    queue = TriageQueue([_patient("A", 3), _patient("B", 2), _patient("C", 2), _patient("D", 1)])
+
+    queue.update_level("D", 3)
+    _check_invariants(queue)
+    assert _ids(queue.top_k(4)) == ["A", "D", "B", "C"]
+
+    # Re-triaged at the same level: now the latest arrival among its ties
+    queue.upsert(_patient("B", 2))
+    queue.update_level("A", 1)
+    _check_invariants(queue)
+    assert _ids(queue.top_k(4)) == ["D", "C", "B", "A"]
+
+
+def test_remove_from_the_middle():
+    queue = TriageQueue(_patient(f"P{i}", i % 4) for i in range(15))
+    ranked = _ids(queue.top_k(15))
+
+    middle = ranked[7]
+    assert queue.remove(middle)["id"] == middle
+    assert queue.remove(middle) is None
+    assert middle not in queue and len(queue) == 14
+    _check_invariants(queue)
+    assert _ids(queue.top_k(14)) == [patient_id for patient_id in ranked if patient_id != middle]
+
+
+def test_top_k_pages_through_the_frontier():
+    rng = random.Random(3)
+    queue = TriageQueue(_patient(f"P{i}", rng.randint(0, 3), rng.choice(["stable", "worsening"])) for i in range(40))
+    ranked = _ids(queue.top_k(40))
+
+    assert _ids(queue.top_k(5, offset=10)) == ranked[10:15]
+    assert _ids(queue.top_k(10, offset=35)) == ranked[35:]
+    assert queue.top_k(5, offset=40) == []
+
+
+def test_random_operations_match_a_sorted_reference():
+    rng = random.Random(11)
+    queue = TriageQueue()
+    reference = {}    # patient_id -> (sort key, entry)
+    for step in range(400):
+        patient_id = f"P{rng.randrange(30)}"
+        if rng.random() < 0.25:
+            assert (queue.remove(patient_id) is None) == (reference.pop(patient_id, None) is None)
+        else:
+            entry = _patient(patient_id, rng.randint(0, 3), rng.choice(["stable", "worsening"]))
+            queue.upsert(entry)
+            trend = 0 if entry["trend"] == "worsening" else 1
+            reference[patient_id] = ((-entry["level"], trend, step), entry)
+        _check_invariants(queue)
+
+    expected = [entry["id"] for _, entry in sorted(reference.values(), key=lambda item: item[0])]
+    assert _ids(queue.top_k(len(queue))) == expected
+    assert _ids(queue.top_k(4, offset=3)) == expected[3:7]